@@ -1,29 +1,38 @@
 # app.py
+import io
 import os
+import time
+import zipfile
 from datetime import date
-from flask import Flask, render_template, request, redirect, jsonify
+from decimal import Decimal
+from flask import Flask, render_template, request, redirect, jsonify, send_file, abort, url_for, g, Response
 from flask_mail import Mail
 from dotenv import load_dotenv          # ← nieuw
-from supabase import create_client, Client
 from flask import request, jsonify, render_template
 from math import ceil
+from itertools import islice
 
 # ---------- LAAD .ENV BESTAND ----------
 # zoekt naar .env in dezelfde map als dit script
 load_dotenv()
 
 # ---------- IMPORTEER JE EIGEN MODULES ----------
-from facturenaanmaken import facturenaanmaken
-from facturenprinten import facturenprinten
-from overzichtaanmaken import overzichtaanmaken
+# de factuur- en overzichtmodules (en daarmee WeasyPrint) worden pas in de
+# PDF-routes geïmporteerd, de Supabase-client bij de eerste query
+from jobs import start_job, job_status
+from db import sb, bulk_mutatie, lees_tabel
+import referentie
+import replica
+import historie
+import omzet
+import snelinvoer
+import metrics
 
 # ---------- FLASK APP ----------
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "dev")
 
 # ---------- CONFIG UIT .ENV ----------
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 MAIL_SERVER = "smtp.gmail.com"
 MAIL_PORT = 587
 MAIL_USE_TLS = True
@@ -34,7 +43,33 @@ MAIL_DEFAULT_SENDER = MAIL_USERNAME
 PER_PAGE = 50
 
 mail = Mail(app)
-sb: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# ---------- METRICS ----------
+@app.before_request
+def _start_meting():
+    route = request.url_rule.rule if request.url_rule else "onbekend"
+    g.metrics_scope, g.metrics_token = metrics.start_scope(f"{request.method} {route}")
+
+@app.after_request
+def _einde_meting(response):
+    s = g.pop("metrics_scope", None)
+    if s is not None:
+        route = request.url_rule.rule if request.url_rule else "onbekend"
+        metrics.observeer("http_request_duration_seconds", time.perf_counter() - s.start,
+                          route=route, methode=request.method, status=response.status_code)
+        if metrics.METRICS_HEADERS or request.args.get("timing") == "1":
+            response.headers.update(metrics.timing_headers(s))
+    return response
+
+@app.teardown_request
+def _sluit_meting(exc):
+    token = g.pop("metrics_token", None)
+    if token is not None:
+        metrics.einde_scope(token)
+
+@app.get("/metrics")
+def metrics_export():
+    return Response(metrics.exporteer(), mimetype="text/plain; version=0.0.4")
 
 # ---------- HOME ----------
 @app.route("/")
@@ -43,60 +78,115 @@ def index():
 
 # ---------- SNELINVOEREN ----------
 @app.route("/snelinvoeren")
-def snelinvoeren():
-    clients = sb.table("clienten").select("naam_client").execute().data
-    tarieven = sb.table("tarieven").select("*").execute().data
-    return render_template("snelinvoeren.html", clients=clients, tarieven=tarieven)
+def snelinvoeren(fout=None, invoer=None):
+    clients = referentie.client_namen(sb)
+    tarieven = referentie.tarieven(sb)
+    return render_template("snelinvoeren.html", clients=clients, tarieven=tarieven, fout=fout, invoer=invoer or {})
 
 @app.post("/api/snelinvoeren")
 def api_snelinvoeren():
-    from decimal import Decimal
     data = request.form
-    btw_pct = Decimal(data["btw_incl_pct"] or 21)
-    bedrag_incl = Decimal(data["bedrag_incl"] or 0)
-    bedrag_ex = bedrag_incl / (100 + btw_pct) * 100
-    btw = bedrag_incl - bedrag_ex
-
-    sb.table("overzicht").insert({
-        "datum_dienst": data["datum"],
-        "naam": data["naam"],
-        "tijd": data["tijd"],
-        "contant": data.get("contant") == "on",
-        "te_ontvangen": data["te_ontvangen"],
-        "opmerking": data["opmerking"],
-        "bedrag": bedrag_incl,
-        "ex_btw": bedrag_ex,
-        "btw_21_pct": btw,
-        "factuurbedrag": bedrag_incl,
-        "factuurnummer": data["factuurnummer"],
-        "datum_factuur": date.today(),
-        "deb_nr": data["deb_nr"]
-    }).execute()
+    try:
+        velden = {
+            "datum": snelinvoer.parse_datum(data["datum"]),
+            "naam": data["naam"],
+            "tijd": snelinvoer.parse_tijd(data["tijd"]),
+            "contant": data.get("contant") == "on",
+            "te_ontvangen": snelinvoer.parse_bedrag(data["te_ontvangen"]),
+            "opmerking": data["opmerking"],
+            "bedrag": snelinvoer.parse_bedrag(data["bedrag_incl"]) or Decimal(0),
+            "factuurnummer": data["factuurnummer"] or None,
+            "deb_nr": data["deb_nr"] or None,
+        }
+        btw_pct = snelinvoer.parse_bedrag(data["btw_incl_pct"])
+    except ValueError as e:
+        # formulier opnieuw tonen met de melding en de ingevulde waarden
+        return snelinvoeren(fout=str(e), invoer=data), 400
+    if btw_pct is None:
+        btw_pct = snelinvoer.STANDAARD_BTW
+    [(bedrag_ex, btw)] = snelinvoer.btw_splitsing([velden["bedrag"]], [btw_pct])
+    sb.table("overzicht").insert(snelinvoer.overzicht_rij(velden, bedrag_ex, btw)).execute()
+    omzet.bijgewerkt("overzicht")
     return redirect("/")
 
+@app.post("/api/snelinvoeren/bulk")
+def api_snelinvoeren_bulk():
+    """Meerdere sessies: geplakte regels (veld "regels") of een agenda-CSV (bestand "bestand")."""
+    bestand = request.files.get("bestand")
+    tekst = bestand.read().decode("utf-8-sig") if bestand else request.form.get("regels", "")
+    resultaat = snelinvoer.bulk_invoeren(sb, tekst, alleen_controleren=request.form.get("controleren") == "1")
+    if resultaat["opgeslagen"]:
+        omzet.bijgewerkt("overzicht")
+    return jsonify(resultaat), 422 if resultaat["fouten"] else 200
+
+# ---------- BATCHES (ACHTERGROND-JOBS) ----------
+def _job_gestart(job_id):
+    # 202 + Location: API-clients pollen de status, de browser krijgt een voortgangspagina
+    resp = app.make_response((render_template("job.html", job_id=job_id), 202))
+    resp.headers["Location"] = url_for("api_job", job_id=job_id)
+    resp.headers["X-Job-Id"] = job_id
+    return resp
+
 # ---------- FACTUREN AANMAKEN ----------
 @app.route("/facturen/aanmaken")
 def facturen_aanmaken():
-    facturenaanmaken()
-    return "Facturen aangemaakt (PDF gegenereerd)", 200
+    from facturenaanmaken import facturenaanmaken
+    volledig = request.args.get("volledig") == "1"
+    return _job_gestart(start_job("facturen_aanmaken", facturenaanmaken, volledig=volledig))
 
 # ---------- FACTUREN PRINTEN ----------
 @app.route("/facturen/printen")
 def facturen_printen():
-    facturenprinten()
-    return "Facturen geprint (PDF gegenereerd)", 200
+    from facturenprinten import facturenprinten
+    return _job_gestart(start_job("facturen_printen", facturenprinten))
 
 # ---------- OVERZICHT AANMAKEN ----------
 @app.route("/overzicht/aanmaken")
 def overzicht_aanmaken():
-    overzichtaanmaken()
-    return "Overzicht aangemaakt (PDF gegenereerd)", 200
+    from overzichtaanmaken import overzichtaanmaken
+    return _job_gestart(start_job("overzicht_aanmaken", overzichtaanmaken))
+
+# ---------- JOB STATUS + DOWNLOAD ----------
+@app.get("/jobs/<job_id>")
+def api_job(job_id):
+    job = job_status(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+@app.get("/jobs/<job_id>/download")
+def job_download(job_id):
+    job = job_status(job_id)
+    if job is None:
+        abort(404)
+    if job["status"] != "klaar":
+        return jsonify({"status": job["status"], "fout": job["fout"]}), 409
+    pdfs = [os.path.abspath(p) for p in job["resultaat"]["pdfs"] if os.path.exists(p)]
+    if not pdfs:
+        abort(404)
+    if len(pdfs) == 1:
+        return send_file(pdfs[0], as_attachment=True)
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for p in pdfs:
+            zf.write(p, os.path.basename(p))
+    buffer.seek(0)
+    return send_file(buffer, mimetype="application/zip", as_attachment=True,
+                     download_name=f"{job['soort']}_{job_id[:8]}.zip")
 
 # ---------- API HELPERS ----------
 @app.get("/api/client/<naam>")
 def api_client(naam):
-    c = sb.table("clienten").select("*").ilike("naam_client", naam).execute().data
-    return jsonify(c[0] if c else {})
+    c = referentie.client_op_naam(sb, naam)
+    if c is None and replica.actief():
+        # de replica kan nieuwer zijn dan de index in de cache
+        c = replica.client_op_naam(sb, naam)
+    if c is None:
+        # niet in de cache (bv. net in een andere worker aangemaakt): rechtstreeks zoeken
+        rows = sb.table("clienten").select("*").ilike("naam_client", naam).execute().data
+        c = rows[0] if rows else {}
+    return jsonify(c)
 
 # ---------- CRUD BEWERKEN ----------
 @app.route("/clientenbewerken")
@@ -135,6 +225,48 @@ def overzichtbewerken():
         return render_template("overzichtform.html", mode="table", records=records, page=page, pages=pages)
     return render_template("overzichtform.html", mode="form")
 
+# ---------- API: HISTORIE ----------
+@app.get("/api/historie")
+def api_historie():
+    """Gearchiveerde (en met ?live=1 ook nog niet geprinte) overzicht-regels.
+
+    Filters: naam, factuurnummer, van, tot (datum_dienst, ISO); ?limit= max 5000.
+    """
+    a = request.args
+    limit = a.get("limit", "500")
+    if not limit.isdigit() or int(limit) < 1:
+        return jsonify({"fout": f"ongeldige limit '{limit}', verwacht een heel getal ≥ 1"}), 400
+    try:
+        van, tot = (date.fromisoformat(d).isoformat() if d else None for d in (a.get("van"), a.get("tot")))
+    except ValueError:
+        return jsonify({"fout": "van/tot moeten datums zijn als JJJJ-MM-DD"}), 400
+    rows = historie.regels(sb, naam=a.get("naam"), factuurnummer=a.get("factuurnummer"), van=van, tot=tot,
+                           met_live=a.get("live") == "1")
+    return jsonify(list(islice(rows, min(int(limit), 5000))))
+
+# ---------- API: OMZET / BTW ----------
+@app.get("/api/omzet")
+def api_omzet():
+    """Omzet ex/incl BTW per ?per=jaar|kwartaal|maand|client|tarief over ?van=&tot=.
+
+    ?formaat=csv of pdf geeft een download in plaats van JSON.
+    """
+    a = request.args
+    try:
+        uitkomst = omzet.rapport(sb, a.get("per", "kwartaal"), a.get("van") or None, a.get("tot") or None)
+    except ValueError as e:
+        return jsonify({"fout": str(e)}), 400
+    naam = f"omzet_{uitkomst['per']}_{uitkomst['van'] or 'begin'}_{uitkomst['tot'] or 'heden'}"
+    formaat = a.get("formaat", "json")
+    if formaat == "csv":
+        # BOM: Excel herkent dan UTF-8 (accenten in namen)
+        return Response("\ufeff" + omzet.als_csv(uitkomst), mimetype="text/csv",
+                        headers={"Content-Disposition": f"attachment; filename={naam}.csv"})
+    if formaat == "pdf":
+        pdf_path = omzet.als_pdf(uitkomst, os.path.join("output", f"{naam}.pdf"))
+        return send_file(os.path.abspath(pdf_path), as_attachment=True)
+    return jsonify(uitkomst)
+
 # ---------- API: ZOEKEN ----------
 @app.post("/api/zoek/<tabel>")
 def api_zoek(tabel):
@@ -144,6 +276,15 @@ def api_zoek(tabel):
     resp = sb.table(tabel).select("*").ilike(veld, f"%{waarde}%").execute()
     return jsonify(resp.data)
 
+# ---------- API: AUTOCOMPLETE CLIENTEN ----------
+@app.get("/api/autocomplete/clienten")
+def api_autocomplete_clienten():
+    q = request.args.get("q", "")
+    limit = request.args.get("limit", "10")
+    if not limit.isdigit() or int(limit) < 1:
+        return jsonify({"fout": f"ongeldige limit '{limit}', verwacht een heel getal ≥ 1"}), 400
+    return jsonify(referentie.zoek_clienten(sb, q, min(int(limit), 50)))
+
 # ---------- API: OPSLAAN ----------
 @app.post("/api/opslaan/<tabel>")
 def api_opslaan(tabel):
@@ -154,6 +295,8 @@ def api_opslaan(tabel):
     else:
         resp = sb.table(tabel).insert(data).execute()
         data["id"] = resp.data[0]["id"]
+    referentie.bijwerken(tabel, data)
+    omzet.bijgewerkt(tabel)
     return jsonify(data)
 
 # ---------- API: VERWIJDEREN ----------
@@ -161,8 +304,26 @@ def api_opslaan(tabel):
 def api_verwijder(tabel):
     data = request.json
     sb.table(tabel).delete().eq("id", data["id"]).execute()
+    referentie.verwijder(tabel, data["id"])
+    omzet.bijgewerkt(tabel)
     return jsonify({"status": "ok"})
 
+# ---------- API: BULK OPSLAAN/VERWIJDEREN ----------
+@app.post("/api/bulk/<tabel>")
+def api_bulk(tabel):
+    """Verzamelde wijzigingen uit de tabel-editors: {"upserts": [...], "deletes": [ids]}."""
+    data = request.json or {}
+    resultaat = bulk_mutatie(sb, tabel, data.get("upserts", []), data.get("deletes", []))
+    for r in resultaat["upserts"]:
+        if r["status"] == "ok":
+            referentie.bijwerken(tabel, r["rij"])
+    for r in resultaat["deletes"]:
+        if r["status"] == "ok":
+            referentie.verwijder(tabel, r["id"])
+    omzet.bijgewerkt(tabel)
+    resultaat["fouten"] = sum(r["status"] == "fout" for r in resultaat["upserts"] + resultaat["deletes"])
+    return jsonify(resultaat)
+
 # ---------- API: RECORDS + NAVIGATIE ----------
 @app.get("/api/records/<tabel>")
 def api_records(tabel):
@@ -171,10 +332,40 @@ def api_records(tabel):
 
 @app.get("/api/record/<tabel>/<int:index>")
 def api_record(tabel, index):
-    resp = sb.table(tabel).select("*").order("id").execute()
-    if 0 <= index < len(resp.data):
-        return jsonify(resp.data[index])
-    return jsonify({})
+    # range() van deze postgrest-versie is exclusief het eind: precies één rij
+    rows = sb.table(tabel).select("*").order("id").range(index, index + 1).execute().data
+    return jsonify(rows[0] if rows else {})
+
+@app.get("/api/nav/<tabel>/<richting>")
+def api_nav(tabel, richting):
+    """Keyset-navigatie: eerste/vorige/volgende/laatste record t.o.v. ?id=."""
+    huidig_id = request.args.get("id")
+    q = sb.table(tabel).select("*")
+    if richting == "eerste" or (richting == "volgende" and not huidig_id):
+        q = q.order("id")
+    elif richting == "laatste" or (richting == "vorige" and not huidig_id):
+        q = q.order("id", desc=True)
+    elif richting == "volgende":
+        q = q.gt("id", huidig_id).order("id")
+    elif richting == "vorige":
+        q = q.lt("id", huidig_id).order("id", desc=True)
+    else:
+        abort(404)
+    rows = q.limit(1).execute().data
+    return jsonify(rows[0] if rows else {})
+
+@app.get("/api/telling/<tabel>")
+def api_telling(tabel):
+    resp = sb.table(tabel).select("id", count="exact").limit(1).execute()
+    return jsonify({"totaal": resp.count or 0})
+
+@app.get("/api/clienten/nieuw_klant_id")
+def api_nieuw_klant_id():
+    # klant_id is tekst (order by sorteert "99" na "1000"): alles lezen, met paginering
+    # zodat db-max-rows van PostgREST de lijst niet afkapt
+    rows = lees_tabel(sb, "clienten", "klant_id")
+    max_id = max((int(r["klant_id"]) for r in rows if str(r["klant_id"]).isdigit()), default=0)
+    return jsonify({"klant_id": max_id + 1})
 
 # ---------- START FLASK ----------
 if __name__ == "__main__":
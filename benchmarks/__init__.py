@@ -0,0 +1,5 @@
+# benchmarks
+"""
+Metingen die los van de echte database en mailserver draaien.
+Elke module is uit te voeren met `python -m benchmarks.<naam>` vanuit de projectmap.
+"""
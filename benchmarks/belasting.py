@@ -0,0 +1,255 @@
+# benchmarks/belasting.py
+"""
+Belastingstest van de admin-UI: app:app onder gunicorn, tegen de NepSupabase
+HTTP-server (benchmarks.nepserver), met een gesimuleerd aantal gelijktijdige
+gebruikers die een realistische mix van verzoeken afspelen.
+
+    python -m benchmarks.belasting                             # 1x1, 2x4, 4x8 met 10 en 50 gebruikers
+    python -m benchmarks.belasting --configs 2x4 --gebruikers 25 --duur 30
+    python -m benchmarks.belasting --klein --latentie 20 --mix lezen
+
+Een config "WxT" is W gunicorn-workers met elk T threads (T > 1 → gthread).
+Per config wordt de backend opnieuw gestart, zodat elke meting met dezelfde
+data begint. Gebruikers draaien in een gesloten lus (volgend verzoek zodra
+het vorige klaar is) met een vaste seed. Resultaat: doorvoer (verzoeken/s)
+en p50/p95/p99 per route en totaal, bewaard in output/benchmarks/.
+De backend is één Python-proces: loopt de doorvoer bij meer workers niet
+meer op, kijk dan eerst of die niet de bottleneck is (--latentie hoger en
+dezelfde doorvoer = de app; CPU van nepserver op 100% = de stand-in).
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import threading
+import subprocess
+from datetime import datetime, date, timedelta
+
+import httpx
+
+from benchmarks import generator
+from benchmarks.nepserver import NEP_KEY, NEP_SERVICE_KEY
+from benchmarks.run import PROJECT_DIR, RESULTATEN_DIR, _commit
+
+# ---------- MIXEN ----------
+# (gewicht, naam, functie(rnd, data) → (methode, pad, kwargs voor httpx))
+def _client_opzoeken(rnd, data):
+    return "GET", f"/api/client/{rnd.choice(data['namen'])}", {}
+
+def _zoek_clienten(rnd, data):
+    fragment = rnd.choice(data["namen"]).split()[1][:4]
+    return "POST", "/api/zoek/clienten", {"json": {"veld": "naam_client", "waarde": fragment}}
+
+def _clienten_tabel(rnd, data):
+    return "GET", f"/clientenbewerken?mode=table&page={rnd.randint(1, data['paginas'])}", {}
+
+def _records_tarieven(rnd, data):
+    return "GET", "/api/records/tarieven", {}
+
+def _records_clienten(rnd, data):
+    return "GET", "/api/records/clienten", {}
+
+def _snelinvoeren(rnd, data):
+    tarief = rnd.choice(data["tarieven"])
+    return "POST", "/api/snelinvoeren", {"data": {
+        "datum": (date(2026, 1, 1) + timedelta(days=rnd.randrange(365))).isoformat(),
+        "naam": rnd.choice(data["namen"]),
+        "tijd": "10:00",
+        "te_ontvangen": "",
+        "opmerking": tarief["item"],
+        "bedrag_incl": str(tarief["bedrag"]),
+        "btw_incl_pct": str(tarief["btw_incl_pct"]),
+        "factuurnummer": "",
+        "deb_nr": "",
+    }}
+
+MIXEN = {
+    # een dag op kantoor: vooral opzoeken en bladeren, af en toe een sessie invoeren
+    "standaard": [(30, "GET /api/client/<naam>", _client_opzoeken),
+                  (20, "POST /api/zoek/clienten", _zoek_clienten),
+                  (20, "GET /clientenbewerken?mode=table", _clienten_tabel),
+                  (12, "GET /api/records/tarieven", _records_tarieven),
+                  (3, "GET /api/records/clienten", _records_clienten),
+                  (15, "POST /api/snelinvoeren", _snelinvoeren)],
+    "lezen": [(35, "GET /api/client/<naam>", _client_opzoeken),
+              (25, "POST /api/zoek/clienten", _zoek_clienten),
+              (25, "GET /clientenbewerken?mode=table", _clienten_tabel),
+              (12, "GET /api/records/tarieven", _records_tarieven),
+              (3, "GET /api/records/clienten", _records_clienten)],
+}
+
+# ---------- PROCESSEN ----------
+def _vrije_poort() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wacht_op(url: str, proces: subprocess.Popen, timeout: float = 120):
+    einde = time.monotonic() + timeout
+    while time.monotonic() < einde:
+        if proces.poll() is not None:
+            raise RuntimeError(f"{proces.args[2:4]} stopte met code {proces.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise TimeoutError(f"{url} niet bereikbaar na {timeout}s")
+
+def _stop(proces: subprocess.Popen):
+    proces.terminate()
+    try:
+        proces.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proces.kill()
+
+def start_backend(schaal: dict, latentie: float) -> tuple:
+    poort = _vrije_poort()
+    proces = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.nepserver", "--poort", str(poort),
+         "--clienten", str(schaal["clienten"]), "--overzicht", str(schaal["overzicht"]),
+         "--seed", str(schaal["seed"]), "--latentie", str(latentie)],
+        cwd=PROJECT_DIR, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{poort}"
+    _wacht_op(f"{url}/rest/v1/tarieven?limit=1", proces)
+    return proces, url
+
+def start_gunicorn(workers: int, threads: int, backend_url: str) -> tuple:
+    poort = _vrije_poort()
+    env = dict(os.environ, SUPABASE_URL=backend_url, SUPABASE_KEY=NEP_KEY, SUPABASE_SERVICE_KEY=NEP_SERVICE_KEY,
+               MAIL_VERSTUREN="0", DB_MAX_VERBINDINGEN=str(max(threads, 2)))
+    proces = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app:app", "--workers", str(workers), "--threads", str(threads),
+         "--bind", f"127.0.0.1:{poort}", "--log-level", "warning"],
+        cwd=PROJECT_DIR, env=env)
+    url = f"http://127.0.0.1:{poort}"
+    _wacht_op(f"{url}/", proces)
+    return proces, url
+
+# ---------- BELASTING ----------
+def _percentiel(tijden: list, q: float) -> float:
+    return round(tijden[min(len(tijden) - 1, int(q * len(tijden)))] * 1000, 1)
+
+def samenvatting(metingen: list, duur: float) -> dict:
+    """metingen: (route, seconden, status) → doorvoer, fouten en percentielen."""
+    tijden = sorted(m[1] for m in metingen)
+    if not tijden:
+        return {"verzoeken": 0}
+    return {
+        "verzoeken": len(tijden),
+        "fouten": sum(1 for m in metingen if m[2] is None or m[2] >= 500),
+        "per_seconde": round(len(tijden) / duur, 1),
+        "p50_ms": _percentiel(tijden, 0.50),
+        "p95_ms": _percentiel(tijden, 0.95),
+        "p99_ms": _percentiel(tijden, 0.99),
+        "max_ms": round(tijden[-1] * 1000, 1),
+    }
+
+def belast(app_url: str, mix: list, gebruikers: int, duur: float, data: dict, seed: int = 1) -> dict:
+    """gebruikers threads die `duur` seconden lang verzoeken uit de mix afspelen."""
+    gewichten = [m[0] for m in mix]
+    metingen = []
+    lock = threading.Lock()
+    start = threading.Event()
+    einde = [0.0]
+
+    def gebruiker(nr: int):
+        rnd = random.Random(seed * 1000 + nr)
+        eigen = []
+        with httpx.Client(base_url=app_url, timeout=60) as client:
+            start.wait()
+            while time.monotonic() < einde[0]:
+                _, route, maak = rnd.choices(mix, gewichten)[0]
+                methode, pad, kwargs = maak(rnd, data)
+                t0 = time.perf_counter()
+                try:
+                    status = client.request(methode, pad, **kwargs).status_code
+                except httpx.HTTPError:
+                    status = None
+                eigen.append((route, time.perf_counter() - t0, status))
+        with lock:
+            metingen.extend(eigen)
+
+    threads = [threading.Thread(target=gebruiker, args=(i,)) for i in range(gebruikers)]
+    for t in threads:
+        t.start()
+    begin = time.monotonic()
+    einde[0] = begin + duur
+    start.set()
+    for t in threads:
+        t.join()
+    werkelijk = time.monotonic() - begin
+
+    routes = {}
+    for m in metingen:
+        routes.setdefault(m[0], []).append(m)
+    return {"totaal": samenvatting(metingen, werkelijk),
+            "routes": {r: samenvatting(ms, werkelijk) for r, ms in sorted(routes.items())}}
+
+# ---------- MAIN ----------
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", default="1x1,2x4,4x8", help="komma-gescheiden WORKERSxTHREADS")
+    parser.add_argument("--gebruikers", default="10,50", help="komma-gescheiden aantallen gelijktijdige gebruikers")
+    parser.add_argument("--duur", type=float, default=20, help="seconden per meting")
+    parser.add_argument("--opwarmen", type=float, default=3, help="seconden belasting vóór elke config (niet gemeten)")
+    parser.add_argument("--mix", choices=list(MIXEN), default="standaard")
+    parser.add_argument("--latentie", type=float, default=10, help="gesimuleerde ms per query naar de database")
+    parser.add_argument("--klein", action="store_true", help="1k clienten / 10k overzicht-regels")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--uit", help="pad voor het resultaat (standaard output/benchmarks/belasting-<tijd>.json)")
+    args = parser.parse_args(argv)
+
+    schaal = {"clienten": 1_000 if args.klein else 10_000,
+              "overzicht": 10_000 if args.klein else 100_000, "seed": args.seed}
+    configs = [tuple(int(x) for x in c.lower().split("x")) for c in args.configs.split(",")]
+    gebruikers = [int(g) for g in args.gebruikers.split(",")]
+    mix = MIXEN[args.mix]
+
+    clienten = generator.clienten_rows(schaal["clienten"], args.seed)
+    data = {"namen": [c["naam_client"] for c in clienten],
+            "paginas": max(1, schaal["clienten"] // 50),
+            "tarieven": generator.tarieven_rows()}
+
+    metingen = []
+    for workers, threads in configs:
+        backend, backend_url = start_backend(schaal, args.latentie)
+        app, app_url = None, None
+        try:
+            app, app_url = start_gunicorn(workers, threads, backend_url)
+            if args.opwarmen:
+                belast(app_url, mix, max(gebruikers), args.opwarmen, data, seed=0)
+            for n in gebruikers:
+                r = belast(app_url, mix, n, args.duur, data, args.seed)
+                t = r["totaal"]
+                print(f"{workers}x{threads:<3} {n:>4} gebruikers: {t['per_seconde']:>7} req/s  "
+                      f"p50 {t['p50_ms']:>7} ms  p95 {t['p95_ms']:>7} ms  p99 {t['p99_ms']:>7} ms  "
+                      f"fouten {t['fouten']}", flush=True)
+                metingen.append(dict(r, workers=workers, threads=threads, gebruikers=n))
+        finally:
+            if app:
+                _stop(app)
+            _stop(backend)
+
+    uitkomst = {
+        "tijdstip": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "schaal": schaal,
+        "mix": args.mix,
+        "latentie_ms": args.latentie,
+        "duur_s": args.duur,
+        "metingen": metingen,
+    }
+    pad = args.uit or os.path.join(RESULTATEN_DIR, f"belasting-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(pad) or ".", exist_ok=True)
+    with open(pad, "w", encoding="utf-8") as f:
+        json.dump(uitkomst, f, indent=2)
+    print(f"Resultaat bewaard in {pad}")
+    return 1 if any(m["totaal"].get("fouten") for m in metingen) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
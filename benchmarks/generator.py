@@ -0,0 +1,145 @@
+# benchmarks/generator.py
+"""
+Synthetische testdata op basis van data/clienten.csv en data/tarieven.csv.
+De echte regels dienen als sjabloon; namen, adressen en klant-ID's worden
+met een vaste seed gevarieerd, zodat elke run exact dezelfde data oplevert.
+
+    python -m benchmarks.generator --clienten 10000 --overzicht 100000 --uit /tmp/bench
+"""
+
+import os
+import csv
+import random
+import argparse
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(PROJECT_DIR, "data")
+
+VOORNAMEN = ["Anna", "Bram", "Carla", "Daan", "Eva", "Fleur", "Gijs", "Hanna", "Ivo", "Julia",
+             "Kees", "Lotte", "Milan", "Noor", "Olaf", "Pien", "Ruben", "Sara", "Thijs", "Vera"]
+ACHTERNAMEN = ["de Vries", "Jansen", "Bakker", "Visser", "Smit", "Meijer", "Mulder", "de Boer",
+               "Bos", "Peters", "Hendriks", "Dekker", "Brouwer", "Dijkstra", "Vermeulen", "Willems"]
+CENT = Decimal("0.01")
+
+# ---------- CSV ----------
+def lees_csv(naam: str):
+    with open(os.path.join(DATA_DIR, naam), newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f, delimiter=";")
+        return reader.fieldnames, list(reader)
+
+def schrijf_csv(pad: str, kolommen: list, rows: list):
+    os.makedirs(os.path.dirname(pad) or ".", exist_ok=True)
+    with open(pad, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=kolommen, delimiter=";")
+        writer.writeheader()
+        writer.writerows(rows)
+
+# ---------- GENERATOR ----------
+def _naam(rnd: random.Random, i: int) -> str:
+    # volgnummer erbij houdt namen uniek, zoals in de echte clientenlijst
+    return f"{rnd.choice(VOORNAMEN)} {rnd.choice(ACHTERNAMEN)} {i:05d}"
+
+def clienten_csv(aantal: int, seed: int = 1):
+    """(kolommen, regels) in het formaat van data/clienten.csv, geschaald naar `aantal`."""
+    rnd = random.Random(seed)
+    kolommen, sjablonen = lees_csv("clienten.csv")
+    rows = []
+    for i in range(aantal):
+        rec = dict(sjablonen[i % len(sjablonen)])
+        rec["naam client"] = _naam(rnd, i)
+        rec["Klant-ID"] = str(1000 + i)
+        rec["BSN.nr."] = ""
+        rec["Straatnaam"] = f"{rnd.choice(ACHTERNAMEN).split()[-1]}straat {rnd.randint(1, 200)}"
+        rec["Emailadres"] = f"client{i}@example.nl"
+        rows.append(rec)
+    return kolommen, rows
+
+def tarieven_rows():
+    """Tarieven zoals ze na import in de database staan."""
+    _, rows = lees_csv("tarieven.csv")
+    uit = []
+    for i, r in enumerate(rows):
+        uit.append({
+            "id": f"t{i:04d}",
+            "item": r["item"],
+            "bedrag": float(Decimal(r["bedrag"].replace(".", "").replace(",", ".") or "0")),
+            "btw_incl_pct": float(Decimal((r["BTW (incl) in %"] or "0").replace(",", "."))),
+            "omschrijving_op_factuur": r["omschrijving op factuur"],
+            "gewijzigd_op": "2025-01-01T00:00:00+00:00",
+        })
+    return uit
+
+def clienten_rows(aantal: int, seed: int = 1):
+    """Clienten zoals ze na import in de database staan."""
+    _, rows = clienten_csv(aantal, seed)
+    return [{
+        "id": f"c{i:06d}",
+        "naam_client": r["naam client"],
+        "straatnaam": r["Straatnaam"],
+        "postcode": r["Postcode"],
+        "woonplaats": r["Woonplaats"],
+        "land": r["Land"] or "Nederland",
+        "geboorte_datum": None,
+        "bsn_nr": None,
+        "verzekeraar": r["verzekeraar"],
+        "polis_nr": r["polis.nr."],
+        "emailadres": r["Emailadres"],
+        "klant_id": r["Klant-ID"],
+        "laatste_factuurnr": None,
+        "gewijzigd_op": "2025-01-01T00:00:00+00:00",
+    } for i, r in enumerate(rows)]
+
+def overzicht_rows(aantal: int, clienten: list, tarieven: list, seed: int = 2, begin: date = date(2025, 1, 1)):
+    """Sessies verdeeld over alle clienten, ongeveer een jaar aan datums."""
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(aantal):
+        c = rnd.randrange(len(clienten))
+        client = clienten[c]
+        tarief = tarieven[rnd.randrange(len(tarieven))]
+        incl = Decimal(str(tarief["bedrag"])).quantize(CENT)
+        pct = Decimal(str(tarief["btw_incl_pct"]))
+        ex = (incl / (100 + pct) * 100).quantize(CENT, ROUND_HALF_UP)
+        rows.append({
+            "id": f"o{i:07d}",
+            "datum_dienst": (begin + timedelta(days=rnd.randrange(365))).isoformat(),
+            "naam": client["naam_client"],
+            "tijd": f"{rnd.randint(8, 19):02d}:{rnd.choice(['00', '30'])}:00",
+            "contant": rnd.random() < 0.1,
+            "te_ontvangen": float(incl),
+            "opmerking": tarief["item"],
+            "bedrag": float(incl),
+            "ex_btw": float(ex),
+            "btw_21_pct": float(incl - ex),
+            "factuurbedrag": float(incl),
+            "factuurnummer": f"{begin.year}{c + 1:05d}",   # één factuur per client
+            "datum_factuur": None,
+            "ontvangst": False,
+            "deb_nr": client["klant_id"],
+            "gewijzigd_op": "2025-12-31T00:00:00+00:00",
+        })
+    return rows
+
+def dataset(clienten: int = 10_000, overzicht: int = 100_000, seed: int = 1) -> dict:
+    """Alle tabellen, klaar voor NepSupabase."""
+    tarieven = tarieven_rows()
+    cl = clienten_rows(clienten, seed)
+    return {"tarieven": tarieven, "clienten": cl, "overzicht": overzicht_rows(overzicht, cl, tarieven, seed + 1),
+            "factuurruns": []}
+
+# ---------- DIRECT UITVOEREN ----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clienten", type=int, default=10_000)
+    parser.add_argument("--overzicht", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--uit", default="output/benchmark-data")
+    args = parser.parse_args()
+
+    kolommen, rows = clienten_csv(args.clienten, args.seed)
+    schrijf_csv(os.path.join(args.uit, "clienten.csv"), kolommen, rows)
+    data = dataset(args.clienten, args.overzicht, args.seed)
+    schrijf_csv(os.path.join(args.uit, "overzicht.csv"), list(data["overzicht"][0]), data["overzicht"])
+    print(f"{len(rows)} clienten en {len(data['overzicht'])} overzicht-regels geschreven naar {args.uit}")
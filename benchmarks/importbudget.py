@@ -0,0 +1,66 @@
+# benchmarks/importbudget.py
+"""
+Import-tijdbudget voor app.py (opstarttijd van een gunicorn-worker).
+Importeert app in een verse interpreter, een paar keer, en faalt (exit 1) als
+de mediaan boven IMPORT_BUDGET_MS ligt of als er bij het opstarten al zware
+modules geladen worden die pas bij de eerste query of PDF nodig zijn.
+
+    python -m benchmarks.importbudget
+"""
+
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+# ---------- CONFIG ----------
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "600"))
+IMPORT_METINGEN = int(os.getenv("IMPORT_METINGEN", "5"))
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# mogen pas geladen worden als een route ze echt nodig heeft
+NIET_BIJ_OPSTARTEN = ["supabase", "postgrest", "weasyprint", "numpy",
+                      "facturenaanmaken", "facturenprinten", "overzichtaanmaken"]
+
+METING = f"""
+import sys, time, json
+t = time.perf_counter()
+import app
+ms = (time.perf_counter() - t) * 1000
+print(json.dumps({{"ms": ms, "geladen": [m for m in {NIET_BIJ_OPSTARTEN!r} if m in sys.modules]}}))
+"""
+
+# ---------- METEN ----------
+def meet_een() -> dict:
+    uit = subprocess.run([sys.executable, "-c", METING], cwd=PROJECT_DIR,
+                         capture_output=True, text=True, check=True)
+    return json.loads(uit.stdout.strip().splitlines()[-1])
+
+def meet(metingen: int = None) -> dict:
+    resultaten = [meet_een() for _ in range(metingen or IMPORT_METINGEN)]
+    tijden = [r["ms"] for r in resultaten]
+    return {
+        "mediaan_ms": round(statistics.median(tijden), 1),
+        "min_ms": round(min(tijden), 1),
+        "max_ms": round(max(tijden), 1),
+        "budget_ms": IMPORT_BUDGET_MS,
+        "te_vroeg_geladen": sorted({m for r in resultaten for m in r["geladen"]}),
+    }
+
+def main() -> int:
+    resultaat = meet()
+    print(json.dumps(resultaat, indent=2))
+    fouten = []
+    if resultaat["mediaan_ms"] > IMPORT_BUDGET_MS:
+        fouten.append(f"import app duurt {resultaat['mediaan_ms']} ms, budget is {IMPORT_BUDGET_MS} ms")
+    if resultaat["te_vroeg_geladen"]:
+        fouten.append(f"al bij het opstarten geladen: {', '.join(resultaat['te_vroeg_geladen'])}")
+    for fout in fouten:
+        print(f"❌ {fout}")
+    if not fouten:
+        print("✅ binnen het import-budget")
+    return 1 if fouten else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
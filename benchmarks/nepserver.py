@@ -0,0 +1,191 @@
+# benchmarks/nepserver.py
+"""
+NepSupabase achter een HTTP-server die het PostgREST-protocol spreekt, voor
+zover supabase-py (postgrest 0.11) dat gebruikt. De app kan er zonder
+aanpassingen tegen draaien: SUPABASE_URL=http://127.0.0.1:<poort>,
+SUPABASE_KEY=NEP_KEY (rol anon) en SUPABASE_SERVICE_KEY=NEP_SERVICE_KEY
+(rol service_role). Zo lopen ook de verbindingspool,
+retries en metrics uit dbpool mee in een meting.
+
+    python -m benchmarks.nepserver --poort 54321 --klein --latentie 10
+
+Zoals bij Supabase levert een select zonder limit hoogstens --max-rijen
+rijen (db-max-rows, standaard 1000).
+"""
+
+import json
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qsl
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from benchmarks import generator
+from benchmarks.nepsupabase import NepSupabase
+
+NEP_KEY = "nep.nep.nep"   # voldoet aan de JWT-check van supabase-py
+NEP_SERVICE_KEY = "nep.service.nep"
+MAX_RIJEN = 1000
+
+# ---------- VERTALEN ----------
+def _waarde(tekst: str) -> str:
+    # sanitize_param zet waarden met ,:() tussen aanhalingstekens
+    return tekst[1:-1] if len(tekst) > 1 and tekst[0] == tekst[-1] == '"' else tekst
+
+def _lijst(tekst: str) -> list:
+    """'(a,"b,c",d)' → ['a', 'b,c', 'd']"""
+    delen, huidig, quote = [], "", False
+    for teken in tekst.strip("()"):
+        if teken == '"':
+            quote = not quote
+        elif teken == "," and not quote:
+            delen.append(huidig)
+            huidig = ""
+        else:
+            huidig += teken
+    return delen + [huidig] if huidig or delen else []
+
+def _filter(q, kolom: str, waarde: str):
+    operator, _, criterium = waarde.partition(".")
+    if operator == "not":
+        q = q.not_
+        operator, _, criterium = criterium.partition(".")
+    if operator == "in":
+        return q.in_(kolom, _lijst(criterium))
+    if operator in ("ilike", "like"):
+        return q.ilike(kolom, _waarde(criterium).replace("*", "%"))
+    if operator == "is":
+        return q.is_(kolom, criterium)
+    return getattr(q, operator)(kolom, _waarde(criterium))
+
+def _prefer(headers) -> dict:
+    return dict(d.strip().partition("=")[::2] for d in headers.get("Prefer", "").split(",") if d.strip())
+
+# ---------- HANDLER ----------
+class PostgrestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, zoals PostgREST
+    disable_nagle_algorithm = True  # headers en body zijn aparte writes: anders 40 ms delayed-ACK per query
+    nep: NepSupabase = None
+    max_rijen = MAX_RIJEN
+
+    def log_message(self, *args):
+        pass
+
+    def _antwoord(self, status: int, data=None, headers: dict = None):
+        body = b"" if data is None else json.dumps(data, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _verwerk(self, methode: str):
+        from postgrest.exceptions import APIError
+        url = urlsplit(self.path)
+        lengte = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(lengte) or "null") if lengte else None
+        if not url.path.startswith("/rest/v1/"):
+            return self._antwoord(404, {"message": f"onbekend pad {url.path}"})
+        if url.path.startswith("/rest/v1/rpc/") and methode == "POST":
+            rol = "service_role" if self.headers.get("apikey") == NEP_SERVICE_KEY else "anon"
+            try:
+                data = self.nep.met_rol(rol).rpc(url.path.rsplit("/", 1)[-1], body).execute().data
+            except APIError as e:
+                return self._antwoord(409, {"message": e.message, "code": e.code, "details": None, "hint": None})
+            return self._antwoord(200, data)
+        tabel = url.path.rsplit("/", 1)[-1]
+        prefer = _prefer(self.headers)
+        params = parse_qsl(url.query, keep_blank_values=True)
+
+        q = self.nep.table(tabel)
+        instellingen = {k: v for k, v in params if k in ("select", "order", "limit", "offset", "on_conflict", "columns")}
+        if methode == "GET":
+            q = q.select(instellingen.get("select", "*"), count=prefer.get("count"))
+        elif methode == "POST":
+            if "resolution" in prefer:
+                q = q.upsert(body, on_conflict=instellingen.get("on_conflict", ""))
+            else:
+                q = q.insert(body)
+        elif methode == "PATCH":
+            q = q.update(body)
+        elif methode == "DELETE":
+            q = q.delete()
+
+        for kolom, waarde in params:
+            if kolom not in instellingen:
+                q = _filter(q, kolom, waarde)
+        for kolom, waarde in params:
+            if kolom == "order":
+                q = q.order(waarde)
+
+        begin, aantal = int(instellingen.get("offset", 0)), None
+        if "limit" in instellingen:
+            aantal = int(instellingen["limit"])
+        if self.headers.get("Range"):
+            van, _, tot = self.headers["Range"].partition("-")
+            begin, aantal = int(van), min(aantal or 10**12, int(tot) - int(van) + 1)
+        if methode == "GET":
+            aantal = min(aantal if aantal is not None else self.max_rijen, self.max_rijen)
+            q = q.range(begin, begin + aantal)
+
+        try:
+            antwoord = q.execute()
+        except APIError as e:
+            return self._antwoord(409, {"message": e.message, "code": e.code, "details": None, "hint": None})
+
+        if methode == "GET":
+            totaal = "*" if antwoord.count is None else antwoord.count
+            eind = begin + len(antwoord.data) - 1
+            bereik = f"{begin}-{eind}/{totaal}" if antwoord.data else f"*/{totaal}"
+            return self._antwoord(200, antwoord.data, {"Content-Range": bereik})
+        status = 201 if methode == "POST" else 200
+        if prefer.get("return") == "minimal":
+            return self._antwoord(204 if methode != "POST" else 201)
+        return self._antwoord(status, antwoord.data, {"Content-Range": f"*/{len(antwoord.data)}"})
+
+    def do_GET(self):
+        self._verwerk("GET")
+
+    def do_POST(self):
+        self._verwerk("POST")
+
+    def do_PATCH(self):
+        self._verwerk("PATCH")
+
+    def do_DELETE(self):
+        self._verwerk("DELETE")
+
+# ---------- SERVER ----------
+def maak_server(nep: NepSupabase, poort: int = 0, max_rijen: int = MAX_RIJEN) -> ThreadingHTTPServer:
+    """Server op 127.0.0.1; poort 0 kiest een vrije poort (server.server_port)."""
+    handler = type("Handler", (PostgrestHandler,), {"nep": nep, "max_rijen": max_rijen})
+    server = ThreadingHTTPServer(("127.0.0.1", poort), handler)
+    server.daemon_threads = True
+    return server
+
+def start_op_achtergrond(nep: NepSupabase, poort: int = 0, max_rijen: int = MAX_RIJEN) -> ThreadingHTTPServer:
+    server = maak_server(nep, poort, max_rijen)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# ---------- DIRECT UITVOEREN ----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--poort", type=int, default=54321)
+    parser.add_argument("--klein", action="store_true", help="1k clienten / 10k overzicht-regels")
+    parser.add_argument("--clienten", type=int)
+    parser.add_argument("--overzicht", type=int)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--latentie", type=float, default=0, help="extra milliseconden per query (netwerk)")
+    parser.add_argument("--max-rijen", type=int, default=MAX_RIJEN)
+    args = parser.parse_args()
+
+    data = generator.dataset(args.clienten or (1_000 if args.klein else 10_000),
+                             args.overzicht or (10_000 if args.klein else 100_000), args.seed)
+    server = maak_server(NepSupabase(data, vertraging=args.latentie / 1000), args.poort, args.max_rijen)
+    print(f"NepSupabase luistert op http://127.0.0.1:{server.server_port} (key: {NEP_KEY})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
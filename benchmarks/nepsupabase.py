@@ -0,0 +1,574 @@
+# benchmarks/nepsupabase.py
+"""
+In-memory stand-in voor het deel van de Supabase/PostgREST-client dat de app
+gebruikt: select (met kolommen en count="exact"), eq/neq/gt/gte/lt/lte,
+ilike, in_, is_, not_, order, limit, range, insert, upsert, update, delete,
+plus de views en functies (rpc) uit schema.sql.
+Semantiek volgt PostgREST waar het uitmaakt voor de code: range() is (zoals
+in postgrest 0.11) exclusief het eind, order("a,b", desc=True) sorteert alleen
+de laatste kolom aflopend, NULL's komen oplopend achteraan.
+Elke execute() wordt als query aan metrics gemeld, zodat ook offline de
+query-tellingen en N+1-detectie werken.
+Net als de echte database gebruikt de stand-in indexen (hash op eq/in,
+gesorteerde volgorde per order), anders meet een benchmark vooral de
+lineaire scans van de stand-in zelf in plaats van de app.
+"""
+
+import re
+import copy
+import time
+import uuid
+import threading
+from bisect import bisect_right
+from datetime import datetime, timezone
+from decimal import Decimal, ROUND_HALF_UP
+
+import metrics
+from db import als_decimal
+
+# ---------- HELPERS ----------
+def _zelfde_type(kolomwaarde, waarde):
+    """Filterwaarde omzetten naar het type van de kolom (PostgREST vergelijkt getypeerd)."""
+    if isinstance(kolomwaarde, bool):
+        return str(waarde).lower() == "true" if not isinstance(waarde, bool) else waarde
+    if isinstance(kolomwaarde, (int, float)):
+        try:
+            return float(waarde)
+        except (TypeError, ValueError):
+            return waarde
+    return str(waarde)
+
+def _vergelijk(op):
+    def filter_(kolomwaarde, waarde):
+        if kolomwaarde is None:
+            return False
+        w = _zelfde_type(kolomwaarde, waarde)
+        try:
+            return op(kolomwaarde, w)
+        except TypeError:
+            return op(str(kolomwaarde), str(w))
+    return filter_
+
+OPERATOREN = {
+    "eq": _vergelijk(lambda a, b: a == b),
+    "neq": _vergelijk(lambda a, b: a != b),
+    "gt": _vergelijk(lambda a, b: a > b),
+    "gte": _vergelijk(lambda a, b: a >= b),
+    "lt": _vergelijk(lambda a, b: a < b),
+    "lte": _vergelijk(lambda a, b: a <= b),
+}
+
+def _ilike(patroon: str):
+    delen = [re.escape(d) for d in patroon.split("%")]
+    regex = re.compile("^" + ".*".join(d.replace("_", ".") for d in delen) + "$", re.IGNORECASE | re.DOTALL)
+    return lambda v: v is not None and bool(regex.match(str(v)))
+
+def _index_sleutels(waarde):
+    """Mogelijke indexsleutels voor een filterwaarde (type van de kolom is onbekend)."""
+    sleutels = {str(waarde)}
+    try:
+        sleutels.add(float(waarde))
+    except (TypeError, ValueError):
+        pass
+    return sleutels
+
+def _index_sleutel(kolomwaarde):
+    if isinstance(kolomwaarde, bool):
+        return str(kolomwaarde).lower()
+    if isinstance(kolomwaarde, (int, float)):
+        return float(kolomwaarde)
+    return str(kolomwaarde)
+
+def _sorteer(rows, order: str):
+    # van de laatste sorteersleutel naar de eerste (stabiele sort)
+    for deel in reversed([d.strip() for d in order.split(",") if d.strip()]):
+        kolom, *opties = deel.split(".")
+        desc = "desc" in opties
+        nulls_first = "nullsfirst" in opties or (desc and "nullslast" not in opties)
+        gevuld = [r for r in rows if r.get(kolom) is not None]
+        leeg = [r for r in rows if r.get(kolom) is None]
+        gevuld.sort(key=lambda r: r[kolom], reverse=desc)
+        rows = leeg + gevuld if nulls_first else gevuld + leeg
+    return rows
+
+# ---------- QUERY ----------
+class Antwoord:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+class Query:
+    def __init__(self, db, tabel: str):
+        self.db = db
+        self.tabel = tabel
+        self.operatie = "select"
+        self.kolommen = "*"
+        self.count = None
+        self.filters = []
+        self.vorm = []
+        self.volgorde = None
+        self.aantal = None
+        self.begin = 0
+        self.payload = None
+        self.on_conflict = None
+        self._negeer = False
+        self._opzoeken = []   # (kolom, waarden) van eq/in_-filters, voor de hash-index
+
+    # --- operaties ---
+    def select(self, kolommen: str = "*", count: str = None):
+        self.operatie, self.kolommen, self.count = "select", kolommen, count
+        return self
+
+    def insert(self, rows, upsert: bool = False, returning: str = None, count: str = None):
+        self.operatie, self.payload = ("upsert" if upsert else "insert"), rows
+        self.on_conflict = "id"
+        return self
+
+    def upsert(self, rows, on_conflict: str = "", ignore_duplicates: bool = False,
+               returning: str = None, count: str = None):
+        self.operatie, self.payload, self.on_conflict = "upsert", rows, on_conflict or "id"
+        return self
+
+    def update(self, waarden: dict, returning: str = None, count: str = None):
+        self.operatie, self.payload = "update", waarden
+        return self
+
+    def delete(self, returning: str = None, count: str = None):
+        self.operatie = "delete"
+        return self
+
+    # --- filters ---
+    def _filter(self, kolom, naam, test):
+        if self._negeer:
+            self._negeer = False
+            self.filters.append(lambda r: not test(r))
+            naam = f"not.{naam}"
+        else:
+            self.filters.append(test)
+        self.vorm.append(f"{kolom}={naam}")
+        return self
+
+    @property
+    def not_(self):
+        self._negeer = True
+        return self
+
+    def __getattr__(self, naam):
+        if naam in OPERATOREN:
+            op = OPERATOREN[naam]
+            def filter_(kolom, waarde):
+                if naam == "eq" and not self._negeer:
+                    self._opzoeken.append((kolom, [waarde]))
+                return self._filter(kolom, naam, lambda r: op(r.get(kolom), waarde))
+            return filter_
+        raise AttributeError(naam)
+
+    def ilike(self, kolom, patroon):
+        test = _ilike(patroon)
+        return self._filter(kolom, "ilike", lambda r: test(r.get(kolom)))
+
+    def in_(self, kolom, waarden):
+        waarden = list(waarden)
+        if not self._negeer:
+            self._opzoeken.append((kolom, waarden))
+        return self._filter(kolom, "in", lambda r: any(OPERATOREN["eq"](r.get(kolom), w) for w in waarden))
+
+    def is_(self, kolom, waarde):
+        verwacht = None if waarde in (None, "null") else str(waarde).lower() == "true"
+        return self._filter(kolom, "is", lambda r: r.get(kolom) is verwacht
+                            if verwacht is None else r.get(kolom) == verwacht)
+
+    # --- modifiers ---
+    def order(self, kolom: str, desc: bool = False, nullsfirst: bool = False):
+        deel = kolom + (".desc" if desc else "") + (".nullsfirst" if nullsfirst else "")
+        self.volgorde = f"{self.volgorde},{deel}" if self.volgorde else deel
+        return self
+
+    def limit(self, aantal: int):
+        self.aantal = aantal
+        return self
+
+    def range(self, begin: int, eind: int):
+        # postgrest 0.11: Range "begin-(eind-1)"
+        self.begin, self.aantal = begin, max(0, eind - begin)
+        return self
+
+    # --- uitvoeren ---
+    def _projecteer(self, row):
+        if self.kolommen.strip() == "*":
+            return dict(row)
+        return {k: row.get(k) for k in (c.strip() for c in self.kolommen.split(",")) if k}
+
+    def _kandidaten(self):
+        """Rijen die de filters kunnen halen: via een hash-index als er een eq/in_ is."""
+        if not self._opzoeken:
+            return self.db.tabel(self.tabel)
+        kolom, waarden = self._opzoeken[0]
+        index = self.db.index(self.tabel, kolom)
+        gezien, rows = set(), []
+        for waarde in waarden:
+            for sleutel in _index_sleutels(waarde):
+                for r in index.get(sleutel, ()):
+                    if id(r) not in gezien:
+                        gezien.add(id(r))
+                        rows.append(r)
+        return rows
+
+    def _treffers(self, rows=None, maximum=None):
+        uit = []
+        for r in self._kandidaten() if rows is None else rows:
+            if all(f(r) for f in self.filters):
+                uit.append(r)
+                if maximum is not None and len(uit) >= maximum:
+                    break
+        return uit
+
+    def execute(self):
+        start = time.perf_counter()
+        with self.db.lock:
+            antwoord = getattr(self, f"_{self.operatie}")()
+        if self.db.vertraging:
+            time.sleep(self.db.vertraging)
+        vorm = f"{self.operatie} {self.tabel} {'&'.join(sorted(self.vorm))}".strip()
+        rijen = len(antwoord.data) if self.operatie == "select" else None
+        metrics.query(self.tabel, self.operatie, vorm, time.perf_counter() - start, rijen)
+        self.db.queries += 1
+        return antwoord
+
+    def _select(self):
+        eind = None if self.aantal is None else self.begin + self.aantal
+        if self.volgorde and not self._opzoeken and self.count != "exact":
+            # gesorteerde index: stoppen zodra de pagina vol is
+            rows = self._treffers(self.db.gesorteerd(self.tabel, self.volgorde), eind)
+            totaal = None
+        else:
+            rows = self._treffers()
+            totaal = len(rows) if self.count == "exact" else None
+            if self.volgorde:
+                rows = _sorteer(rows, self.volgorde)
+        return Antwoord([self._projecteer(r) for r in rows[self.begin:eind]], totaal)
+
+    def _nieuw(self, row):
+        row = dict(row)
+        if not row.get("id"):
+            row["id"] = str(uuid.uuid4())
+        for kolom, standaard in self.db.standaardwaarden.get(self.tabel, {}).items():
+            row.setdefault(kolom, standaard() if callable(standaard) else standaard)
+        return row
+
+    def _insert(self):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        tabel = self.db.tabel(self.tabel)
+        nieuw = [self._nieuw(r) for r in rows]
+        self.db.controleer_uniek(self.tabel, nieuw)
+        tabel.extend(nieuw)
+        self.db.gewijzigd(self.tabel)
+        return Antwoord([dict(r) for r in nieuw])
+
+    def _upsert(self):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        tabel = self.db.tabel(self.tabel)
+        sleutel = self.on_conflict
+        index = {k: r[0] for k, r in self.db.index(self.tabel, sleutel).items() if k != "None"}
+        uit, nieuw = [], []
+        for row in rows:
+            waarde = row.get(sleutel)
+            bestaand = index.get(_index_sleutel(waarde)) if waarde is not None else None
+            if bestaand is None:
+                bestaand = self._nieuw(row)
+                index[_index_sleutel(bestaand.get(sleutel))] = bestaand
+                nieuw.append(bestaand)
+            else:
+                bestaand.update(row)
+                self.db.bijgewerkt(self.tabel, bestaand)
+            uit.append(bestaand)
+        self.db.controleer_uniek(self.tabel, nieuw)
+        tabel.extend(nieuw)
+        uit = [dict(r) for r in uit]
+        # zonder nieuwe rijen blijft de index op de conflictkolom geldig
+        geraakt = None if nieuw else [k for row in rows for k in row if k != sleutel] + ["gewijzigd_op"]
+        self.db.gewijzigd(self.tabel, geraakt)
+        return Antwoord(uit)
+
+    def _update(self):
+        rows = self._treffers()
+        for r in rows:
+            r.update(self.payload)
+            self.db.bijgewerkt(self.tabel, r)
+        self.db.gewijzigd(self.tabel, list(self.payload) + ["gewijzigd_op"])
+        return Antwoord([dict(r) for r in rows])
+
+    def _delete(self):
+        tabel = self.db.tabel(self.tabel)
+        weg = self._treffers()
+        ids = {id(r) for r in weg}
+        tabel[:] = [r for r in tabel if id(r) not in ids]
+        self.db.gewijzigd(self.tabel)
+        self.db.verwijderd(self.tabel, weg)
+        return Antwoord([dict(r) for r in weg])
+
+class Rpc:
+    def __init__(self, db, naam: str, params: dict):
+        self.db = db
+        self.naam = naam
+        self.params = params or {}
+
+    def execute(self):
+        from postgrest.exceptions import APIError
+        rollen = self.db.RPC_ROLLEN.get(self.naam)
+        if rollen and self.db.rol not in rollen:
+            # revoke/grant execute uit schema.sql
+            raise APIError({"message": f"permission denied for function {self.naam}", "code": "42501"})
+        start = time.perf_counter()
+        with self.db.lock:
+            data = self.db.RPCS[self.naam](self.db, **self.params)
+        if self.db.vertraging:
+            time.sleep(self.db.vertraging)
+        metrics.query(self.naam, "rpc", f"rpc {self.naam}", time.perf_counter() - start)
+        self.db.queries += 1
+        return Antwoord(data)
+
+# ---------- VIEWS ----------
+CENT = Decimal("0.01")
+
+def _json(waarde):
+    # PostgREST levert numeric als JSON-getal
+    return None if waarde is None else float(waarde)
+
+def _btw_pcts(db) -> dict:
+    return {t["item"]: t.get("btw_incl_pct") for t in db.tabel("tarieven")}
+
+def _ex(incl: Decimal, pct) -> Decimal:
+    pct = als_decimal(pct)
+    pct = Decimal(21) if pct is None else pct   # coalesce(btw_incl_pct, 21)
+    return (incl / (100 + pct) * 100).quantize(CENT, ROUND_HALF_UP)
+
+def _view_overzicht_regels(db):
+    pcts = _btw_pcts(db)
+    uit = []
+    for r in db.tabel("overzicht"):
+        r = dict(r, bedrag_exbtw=None, btw=None)
+        incl = als_decimal(r.get("bedrag"))
+        if incl is not None:
+            ex = _ex(incl, pcts.get(r.get("opmerking")))
+            r["bedrag_exbtw"], r["btw"] = _json(ex), _json(incl - ex)
+        uit.append(r)
+    return uit
+
+def _met_naam(db):
+    return [r for r in db.tabel("overzicht_regels") if (r.get("naam") or "").strip()]
+
+def _sommen(rows) -> dict:
+    som = lambda k: sum((als_decimal(r[k]) for r in rows if r[k] is not None), Decimal(0))
+    return {"aantal": len(rows), "totaal_ex": _json(som("bedrag_exbtw")), "totaal_btw": _json(som("btw")),
+            "totaal_inc": _json(som("bedrag"))}
+
+def _view_overzicht_totalen(db):
+    groepen = {}
+    for r in _met_naam(db):
+        groepen.setdefault(r["naam"], []).append(r)
+    return [dict(naam=naam, **_sommen(rows)) for naam, rows in groepen.items()]
+
+def _view_overzicht_eindtotaal(db):
+    return [_sommen(_met_naam(db))]
+
+def _view_overzicht_met_historie(db):
+    return [dict(r, gearchiveerd_op=None) for r in db.tabel("overzicht")] + list(db.tabel("overzicht_historie"))
+
+def _view_omzet_maand(db):
+    # de rollup-tabel: hier niet via triggers bijgehouden maar uit alle regels berekend
+    pcts = _btw_pcts(db)
+    groepen = {}
+    for r in db.tabel("overzicht_met_historie"):
+        if not r.get("datum_dienst") or not (r.get("naam") or "").strip():
+            continue
+        incl = als_decimal(r.get("bedrag"))
+        incl = Decimal(0) if incl is None else incl
+        # opgeslagen ex_btw/btw_21_pct per regel; alleen zonder ex_btw het huidige percentage
+        ex = als_decimal(r.get("ex_btw"))
+        ex = _ex(incl, pcts.get(r.get("opmerking"))) if ex is None else ex
+        btw = als_decimal(r.get("btw_21_pct"))
+        btw = incl - ex if btw is None else btw
+        g = groepen.setdefault((r["datum_dienst"][:7] + "-01", r["naam"], r.get("opmerking") or ""),
+                               [0, Decimal(0), Decimal(0), Decimal(0)])
+        g[0] += 1
+        g[1] += ex
+        g[2] += btw
+        g[3] += incl
+    return [{"maand": maand, "naam": naam, "opmerking": opmerking, "aantal": g[0],
+             "totaal_ex": _json(g[1]), "totaal_btw": _json(g[2]), "totaal_inc": _json(g[3])}
+            for (maand, naam, opmerking), g in groepen.items()]
+
+# ---------- FUNCTIES ----------
+def _rpc_archiveer_overzicht(db, regels):
+    # één partitie-loze tabel: voor de app maakt de indeling per jaar niet uit
+    geprint = {(g["id"], datetime.fromisoformat(g["gewijzigd_op"])) for g in regels}
+    overzicht = db.tabel("overzicht")
+    weg = [r for r in overzicht if (r["id"], datetime.fromisoformat(r["gewijzigd_op"])) in geprint]
+    ids = {id(r) for r in weg}
+    overzicht[:] = [r for r in overzicht if id(r) not in ids]
+    nu = _nu()
+    db.tabel("overzicht_historie").extend(dict(r, gearchiveerd_op=nu) for r in weg)
+    db.gewijzigd("overzicht")
+    db.gewijzigd("overzicht_historie")
+    # zoals returns table (aantal integer) in Postgres: één rij
+    return [{"aantal": len(weg)}]
+
+def _rpc_registreer_factuurnummers(db, facturen):
+    nummers = {f["naam"]: f["factuurnummer"] for f in facturen}
+    aantal = 0
+    for r in db.tabel("clienten"):
+        if r.get("naam_client") in nummers:
+            r["laatste_factuurnr"] = nummers[r["naam_client"]]
+            db.bijgewerkt("clienten", r)
+            aantal += 1
+    db.gewijzigd("clienten", ["laatste_factuurnr"])
+    return [{"aantal": aantal}]
+
+OMZET_SLEUTELS = {
+    "jaar": lambda m: m["maand"][:4],
+    "kwartaal": lambda m: f"{m['maand'][:4]}-K{(int(m['maand'][5:7]) + 2) // 3}",
+    "maand": lambda m: m["maand"][:7],
+    "client": lambda m: m["naam"],
+    "tarief": lambda m: m["opmerking"],
+}
+
+def _rpc_omzet(db, per, van=None, tot=None, na=None, aantal_max=1000):
+    # volledige uitkomst bewaren zolang de rollup niet wijzigt: de pagina's
+    # daarna kosten (zoals in Postgres via de index op naam) weinig
+    rollup = db.tabel("omzet_maand")
+    if db._omzet[0] is not rollup:
+        db._omzet = (rollup, {})
+    uit = db._omzet[1].get((per, van, tot))
+    if uit is None:
+        groepen = {}
+        for m in rollup:
+            if (van and m["maand"] < van[:7] + "-01") or (tot and m["maand"] > tot):
+                continue
+            g = groepen.setdefault(OMZET_SLEUTELS[per](m), [0, Decimal(0), Decimal(0), Decimal(0)])
+            g[0] += m["aantal"]
+            for k, kolom in enumerate(("totaal_ex", "totaal_btw", "totaal_inc"), start=1):
+                g[k] += als_decimal(m[kolom])
+        uit = db._omzet[1][(per, van, tot)] = [
+            {"sleutel": sleutel, "aantal": g[0], "totaal_ex": _json(g[1]), "totaal_btw": _json(g[2]),
+             "totaal_inc": _json(g[3])} for sleutel, g in sorted(groepen.items()) if g[0]]
+    if na is not None:
+        uit = uit[bisect_right([r["sleutel"] for r in uit], na):]
+    return uit[:aantal_max]
+
+# ---------- CLIENT ----------
+def _nu():
+    return datetime.now(timezone.utc).isoformat()
+
+class NepSupabase:
+    """Tabellen als lijsten van dicts; thread-safe via één lock."""
+
+    # unieke kolommen uit schema.sql; overzicht.factuurnummer niet: facturatie
+    # groepeert juist op een factuurnummer dat over meerdere regels gedeeld wordt
+    UNIEK = {"tarieven": ["item"], "clienten": ["bsn_nr", "klant_id"]}
+    # view -> (brontabellen, functie(db) → rijen)
+    VIEWS = {
+        "overzicht_regels": (("overzicht", "tarieven"), _view_overzicht_regels),
+        "overzicht_totalen": (("overzicht_regels",), _view_overzicht_totalen),
+        "overzicht_eindtotaal": (("overzicht_regels",), _view_overzicht_eindtotaal),
+        "overzicht_met_historie": (("overzicht", "overzicht_historie"), _view_overzicht_met_historie),
+        "omzet_maand": (("overzicht_met_historie", "tarieven"), _view_omzet_maand),
+    }
+    RPCS = {"archiveer_overzicht": _rpc_archiveer_overzicht, "registreer_factuurnummers": _rpc_registreer_factuurnummers,
+            "omzet": _rpc_omzet}
+    # functies met execute alleen voor bepaalde rollen (grant in schema.sql)
+    RPC_ROLLEN = {"archiveer_overzicht": ("service_role",)}
+
+    def __init__(self, tabellen: dict = None, vertraging: float = 0.0):
+        self.tabellen = {naam: [dict(r) for r in rows] for naam, rows in (tabellen or {}).items()}
+        self.vertraging = vertraging   # gesimuleerde netwerk-latency per query (seconden)
+        self.lock = threading.RLock()
+        self.queries = 0
+        self.standaardwaarden = {"overzicht": {"gewijzigd_op": _nu, "contant": False, "ontvangst": False},
+                                 "clienten": {"gewijzigd_op": _nu}, "tarieven": {"gewijzigd_op": _nu}}
+        self._indexen = {}      # (tabel, kolom) -> {sleutel: [rijen]}
+        self._volgordes = {}    # (tabel, order) -> gesorteerde rijen
+        self._views = {}        # view -> berekende rijen, tot een brontabel wijzigt
+        self._omzet = (None, {})  # (rollup, {(per, van, tot): uitkomst van omzet()})
+        self.rol = "anon"       # rol van de key waarmee de client verbindt
+
+    def met_rol(self, rol: str) -> "NepSupabase":
+        """Dezelfde database, bekeken met de key van een andere rol (bv. service_role)."""
+        ander = copy.copy(self)
+        ander.rol = rol
+        return ander
+
+    def tabel(self, naam: str) -> list:
+        if naam in self.VIEWS:
+            if naam not in self._views:
+                self._views[naam] = self.VIEWS[naam][1](self)
+            return self._views[naam]
+        return self.tabellen.setdefault(naam, [])
+
+    def index(self, tabel: str, kolom: str) -> dict:
+        index = self._indexen.get((tabel, kolom))
+        if index is None:
+            index = {}
+            for r in self.tabel(tabel):
+                index.setdefault(_index_sleutel(r.get(kolom)), []).append(r)
+            self._indexen[(tabel, kolom)] = index
+        return index
+
+    def gesorteerd(self, tabel: str, order: str) -> list:
+        rows = self._volgordes.get((tabel, order))
+        if rows is None:
+            rows = self._volgordes[(tabel, order)] = _sorteer(list(self.tabel(tabel)), order)
+        return rows
+
+    def gewijzigd(self, tabel: str, kolommen: list = None):
+        """Indexen van een tabel vervallen na een mutatie (bij update alleen de geraakte kolommen)."""
+        for sleutel in [k for k in self._indexen if k[0] == tabel and (kolommen is None or k[1] in kolommen)]:
+            del self._indexen[sleutel]
+        for sleutel in [k for k in self._volgordes if k[0] == tabel and (
+                kolommen is None or any(d.split(".")[0].strip() in kolommen for d in k[1].split(",")))]:
+            del self._volgordes[sleutel]
+        for view, (bronnen, _) in self.VIEWS.items():
+            if tabel in bronnen and view in self._views:
+                del self._views[view]
+                self.gewijzigd(view)
+
+    def table(self, naam: str) -> Query:
+        return Query(self, naam)
+
+    from_ = table
+
+    def rpc(self, naam: str, params: dict = None) -> Rpc:
+        return Rpc(self, naam, params)
+
+    # tabellen met de triggers uit schema.sql
+    GEWIJZIGD_OP = ("overzicht", "clienten", "tarieven")
+    VERWIJDERINGEN = ("clienten", "tarieven")
+
+    def bijgewerkt(self, tabel: str, row: dict):
+        # trigger trg_<tabel>_gewijzigd_op
+        if tabel in self.GEWIJZIGD_OP:
+            row["gewijzigd_op"] = _nu()
+            self.gewijzigd(tabel, ["gewijzigd_op"])
+
+    def verwijderd(self, tabel: str, rows: list):
+        # trigger trg_<tabel>_verwijderd
+        if tabel not in self.VERWIJDERINGEN or not rows:
+            return
+        log = self.tabel("verwijderingen")
+        for r in rows:
+            log.append({"id": len(log) + 1, "tabel": tabel, "rij_id": r["id"], "verwijderd_op": _nu()})
+        self.gewijzigd("verwijderingen")
+
+    def controleer_uniek(self, tabel: str, nieuw: list):
+        from postgrest.exceptions import APIError
+        for kolom in self.UNIEK.get(tabel, []):
+            bestaand = set(self.index(tabel, kolom)) - {"None"}
+            for r in nieuw:
+                waarde = r.get(kolom)
+                if waarde is None:
+                    continue
+                waarde = _index_sleutel(waarde)
+                if waarde in bestaand:
+                    raise APIError({"message": f'duplicate key value violates unique constraint "{tabel}_{kolom}_key"',
+                                    "code": "23505"})
+                bestaand.add(waarde)
@@ -0,0 +1,319 @@
+# benchmarks/run.py
+"""
+Reproduceerbare offline benchmarks van de hot paths, tegen NepSupabase met
+synthetische data (standaard 10k clienten, 100k overzicht-regels).
+
+    python -m benchmarks.run                       # alles, volledige schaal
+    python -m benchmarks.run --klein               # 1k / 10k, snel
+    python -m benchmarks.run --alleen api,overzichtaanmaken
+    python -m benchmarks.run --vergelijk output/benchmarks/vorige.json
+    python -m benchmarks.run --latentie 5 --replica  # clienten/tarieven uit de lokale replica
+
+Elke benchmark krijgt verse data; tijden zijn de mediaan over --herhalingen.
+Het resultaat (met commit, schaal en PDF-modus) wordt als JSON bewaard in
+output/benchmarks/, zodat runs met elkaar vergeleken kunnen worden. Is
+WeasyPrint niet bruikbaar, dan wordt de PDF-stap vervangen door het
+wegschrijven van de HTML ("pdf": "stub" in het resultaat).
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+
+from benchmarks import generator
+from benchmarks.nepsupabase import NepSupabase
+
+PROJECT_DIR = generator.PROJECT_DIR
+RESULTATEN_DIR = os.path.join(PROJECT_DIR, "output", "benchmarks")
+REGRESSIE_DREMPEL = float(os.getenv("BENCH_REGRESSIE_DREMPEL", "0.20"))   # 20% trager = regressie
+
+# ---------- OMGEVING ----------
+def _pdf_modus() -> str:
+    try:
+        import weasyprint  # noqa: F401
+        return "weasyprint"
+    except Exception:
+        return "stub"
+
+def _stub_pdf(html_out: str, pdf_path: str) -> str:
+    os.makedirs(os.path.dirname(pdf_path) or ".", exist_ok=True)
+    with open(pdf_path, "w", encoding="utf-8") as f:
+        f.write(html_out)
+    return pdf_path
+
+# gezet vanuit main(): gesimuleerde latency per query (seconden)
+LATENTIE = 0.0
+
+def _installeer(data: dict) -> NepSupabase:
+    """Zet een verse NepSupabase als gedeelde client en leegt de in-process caches.
+
+    Staat de lokale replica aan (--replica), dan wordt die hier opnieuw
+    opgebouwd, zoals een replica die al bijgehouden wordt.
+    """
+    import db
+    import referentie
+    import replica
+    nep = NepSupabase(data, vertraging=LATENTIE)
+    db._client = nep
+    db._service_client = nep.met_rol("service_role")
+    referentie.leeg()
+    if replica.actief():
+        replica.sync(nep, volledig=True)
+    return nep
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+# ---------- METEN ----------
+def _meet(functie, herhalingen: int, voorbereiding=None) -> dict:
+    """Roept voorbereiding() en dan functie(context) aan; alleen functie wordt gemeten."""
+    tijden, queries, extra = [], [], {}
+    for _ in range(herhalingen):
+        context = voorbereiding() if voorbereiding else None
+        nep = context["nep"] if context else None
+        voor = nep.queries if nep else 0
+        start = time.perf_counter()
+        extra = functie(context) or {}
+        tijden.append(time.perf_counter() - start)
+        if nep:
+            queries.append(nep.queries - voor)
+    resultaat = {
+        "mediaan_s": round(statistics.median(tijden), 4),
+        "min_s": round(min(tijden), 4),
+        "max_s": round(max(tijden), 4),
+        "herhalingen": herhalingen,
+    }
+    if queries:
+        resultaat["queries"] = queries[-1]
+    resultaat.update(extra)
+    return resultaat
+
+# ---------- BENCHMARKS ----------
+def bench_facturenaanmaken(schaal, herhalingen):
+    from facturenaanmaken import facturenaanmaken
+
+    def voorbereiding():
+        shutil.rmtree("output", ignore_errors=True)
+        return {"nep": _installeer(generator.dataset(**schaal))}
+
+    def volledig(ctx):
+        r = facturenaanmaken(volledig=True)
+        return {"facturen": len(r["pdfs"]), "fouten": len(r["fouten"])}
+
+    def incrementeel(ctx):
+        return {"facturen": len(facturenaanmaken()["pdfs"])}
+
+    def na_volledige_run():
+        ctx = voorbereiding()
+        facturenaanmaken(volledig=True)
+        # 1% van de regels wijzigen, daarna alleen de incrementele run meten
+        for r in ctx["nep"].tabel("overzicht")[::100]:
+            r["tijd"] = "12:00:00"
+            ctx["nep"].bijgewerkt("overzicht", r)
+        ctx["nep"].gewijzigd("overzicht")
+        return ctx
+
+    return {
+        "facturenaanmaken_volledig": _meet(volledig, herhalingen, voorbereiding),
+        "facturenaanmaken_incrementeel_1pct": _meet(incrementeel, herhalingen, na_volledige_run),
+    }
+
+def bench_overzichtaanmaken(schaal, herhalingen):
+    from overzichtaanmaken import overzichtaanmaken
+
+    def voorbereiding():
+        return {"nep": _installeer(generator.dataset(**schaal))}
+
+    return {"overzichtaanmaken": _meet(lambda ctx: {"pdfs": len(overzichtaanmaken()["pdfs"])},
+                                       herhalingen, voorbereiding)}
+
+def bench_import_clienten(schaal, herhalingen):
+    import importdata
+    kolommen, rows = generator.clienten_csv(schaal["clienten"], schaal["seed"])
+    generator.schrijf_csv("import/clienten.csv", kolommen, rows)
+    importdata.CLIENTEN_CSV = importdata.Path("import/clienten.csv")
+    importdata.IMPORT_SNAPSHOT = importdata.Path("import/.import_snapshot.json")
+
+    def leeg():
+        if importdata.IMPORT_SNAPSHOT.exists():
+            importdata.IMPORT_SNAPSHOT.unlink()
+        return {"nep": _installeer({"clienten": []})}
+
+    def na_import():
+        ctx = leeg()
+        importdata.import_clienten(delta=True)
+        return ctx
+
+    return {
+        "import_clienten": _meet(lambda ctx: importdata.import_clienten(), herhalingen, leeg),
+        "import_clienten_delta_ongewijzigd": _meet(lambda ctx: importdata.import_clienten(delta=True),
+                                                   herhalingen, na_import),
+    }
+
+def _percentielen(tijden: list) -> dict:
+    tijden = sorted(tijden)
+    def p(q):
+        return round(tijden[min(len(tijden) - 1, int(q * len(tijden)))] * 1000, 2)
+    return {"p50_ms": p(0.50), "p95_ms": p(0.95), "max_ms": round(tijden[-1] * 1000, 2)}
+
+def bench_api(schaal, herhalingen, verzoeken: int = 50):
+    import app as webapp
+    nep = _installeer(generator.dataset(**schaal))
+    client = webapp.app.test_client()
+    clienten = nep.tabel("clienten")
+    overzicht = nep.tabel("overzicht")
+    naam = clienten[len(clienten) // 2]["naam_client"]
+    midden_id = overzicht[len(overzicht) // 2]["id"]
+    tarief = nep.tabel("tarieven")[0]["item"]
+    plakregels = "\n".join(f"2026-01-{1 + i % 28:02d}\t{c['naam_client']}\t10:00\t{tarief}\t"
+                           for i, c in enumerate(clienten[: min(50, len(clienten))]))
+    bulk = {"upserts": [dict(r, opmerking="bench") for r in overzicht[:40]], "deletes": []}
+
+    routes = {
+        "GET /": lambda: client.get("/"),
+        "GET /api/autocomplete/clienten": lambda: client.get("/api/autocomplete/clienten?q=jans"),
+        "GET /api/client/<naam>": lambda: client.get(f"/api/client/{naam}"),
+        "GET /api/nav/overzicht/volgende": lambda: client.get(f"/api/nav/overzicht/volgende?id={midden_id}"),
+        "GET /api/telling/overzicht": lambda: client.get("/api/telling/overzicht"),
+        "GET /overzichtbewerken?mode=table": lambda: client.get("/overzichtbewerken?mode=table&page=100"),
+        "POST /api/bulk/overzicht": lambda: client.post("/api/bulk/overzicht", json=bulk),
+        "POST /api/snelinvoeren/bulk": lambda: client.post("/api/snelinvoeren/bulk",
+                                                           data={"regels": plakregels, "controleren": "1"}),
+    }
+    resultaten = {}
+    for naam_route, verzoek in routes.items():
+        verzoek()  # opwarmen (client-index, tarieven-cache)
+        tijden = []
+        voor = nep.queries
+        for _ in range(verzoeken * herhalingen):
+            start = time.perf_counter()
+            resp = verzoek()
+            tijden.append(time.perf_counter() - start)
+            assert resp.status_code < 500, f"{naam_route}: status {resp.status_code}"
+        resultaten[f"api {naam_route}"] = dict(
+            _percentielen(tijden), mediaan_s=round(statistics.median(tijden), 5),
+            verzoeken=len(tijden), queries_per_verzoek=round((nep.queries - voor) / len(tijden), 2))
+    return resultaten
+
+def bench_omzet(schaal, herhalingen):
+    import omzet
+    nep = _installeer(generator.dataset(**schaal))
+    nep.tabel("omzet_maand")   # de rollup wordt in de database door triggers bijgehouden
+
+    def rapport(per):
+        def meting(ctx):
+            omzet.leeg()
+            return {"regels": len(omzet.rapport(nep, per)["regels"])}
+        return meting
+
+    return {f"omzet_{per}": _meet(rapport(per), herhalingen) for per in omzet.PER}
+
+BENCHMARKS = {
+    "facturenaanmaken": bench_facturenaanmaken,
+    "overzichtaanmaken": bench_overzichtaanmaken,
+    "import_clienten": bench_import_clienten,
+    "api": bench_api,
+    "omzet": bench_omzet,
+}
+
+# ---------- VERGELIJKEN ----------
+def vergelijk(huidig: dict, vorig: dict) -> list:
+    """Regressies t.o.v. een eerder resultaat (mediaan > REGRESSIE_DREMPEL trager)."""
+    regressies = []
+    for naam, r in huidig["resultaten"].items():
+        oud = vorig.get("resultaten", {}).get(naam)
+        if not oud or not oud.get("mediaan_s"):
+            continue
+        factor = r["mediaan_s"] / oud["mediaan_s"]
+        teken = "⚠️ " if factor > 1 + REGRESSIE_DREMPEL else "   "
+        print(f"{teken}{naam:45s} {oud['mediaan_s']:>9.4f}s → {r['mediaan_s']:>9.4f}s  ({factor:.2f}x)")
+        if factor > 1 + REGRESSIE_DREMPEL:
+            regressies.append(naam)
+    return regressies
+
+# ---------- MAIN ----------
+def main(argv=None) -> int:
+    global LATENTIE
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--klein", action="store_true", help="1k clienten / 10k overzicht-regels")
+    parser.add_argument("--clienten", type=int)
+    parser.add_argument("--overzicht", type=int)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--herhalingen", type=int, default=3)
+    parser.add_argument("--alleen", help=f"komma-gescheiden selectie uit: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--vergelijk", help="eerder resultaat (JSON) om tegen te vergelijken")
+    parser.add_argument("--uit", help="pad voor het resultaat (standaard output/benchmarks/<tijd>.json)")
+    parser.add_argument("--latentie", type=float, default=0.0, help="gesimuleerde latency per query (ms)")
+    parser.add_argument("--replica", action="store_true", help="clienten/tarieven uit een lokale SQLite-replica")
+    args = parser.parse_args(argv)
+
+    schaal = {"clienten": args.clienten or (1_000 if args.klein else 10_000),
+              "overzicht": args.overzicht or (10_000 if args.klein else 100_000),
+              "seed": args.seed}
+    gekozen = args.alleen.split(",") if args.alleen else list(BENCHMARKS)
+    pdf = _pdf_modus()
+
+    os.environ.setdefault("MAIL_VERSTUREN", "0")
+    sys.path.insert(0, PROJECT_DIR)
+    werkmap = tempfile.mkdtemp(prefix="bench-")
+    oude_map = os.getcwd()
+    os.chdir(werkmap)
+    LATENTIE = args.latentie / 1000
+    try:
+        if args.replica:
+            import replica
+            replica.REPLICA_PAD = os.path.join(werkmap, "replica.sqlite")
+        if pdf == "stub":
+            import pdfrender
+            import facturatie
+            import overzichtaanmaken
+            pdfrender.schrijf_pdf = facturatie.schrijf_pdf = overzichtaanmaken.schrijf_pdf = _stub_pdf
+        resultaten = {}
+        for naam in gekozen:
+            print(f"▶ {naam} ({schaal['clienten']} clienten, {schaal['overzicht']} overzicht-regels)")
+            resultaten.update(BENCHMARKS[naam](schaal, args.herhalingen))
+    finally:
+        os.chdir(oude_map)
+        shutil.rmtree(werkmap, ignore_errors=True)
+
+    uitkomst = {
+        "tijdstip": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "schaal": schaal,
+        "pdf": pdf,
+        "latentie_ms": args.latentie,
+        "replica": args.replica,
+        "resultaten": resultaten,
+    }
+    pad = args.uit or os.path.join(RESULTATEN_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(pad) or ".", exist_ok=True)
+    with open(pad, "w", encoding="utf-8") as f:
+        json.dump(uitkomst, f, indent=2)
+    print(json.dumps(resultaten, indent=2))
+    print(f"Resultaat bewaard in {pad}")
+
+    if args.vergelijk:
+        with open(args.vergelijk, encoding="utf-8") as f:
+            vorig = json.load(f)
+        if (vorig.get("schaal"), vorig.get("pdf"), vorig.get("latentie_ms", 0.0), vorig.get("replica", False)) != \
+                (schaal, pdf, args.latentie, args.replica):
+            print("Let op: andere schaal, PDF-modus, latency of replica dan het vorige resultaat")
+        if vergelijk(uitkomst, vorig):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+# db.py
+"""
+Gedeelde database-helpers voor de rapport-modules.
+"""
+
+import os
+import threading
+from decimal import Decimal
+
+# ---------- CONFIG ----------
+# rijen per pagina; blijft onder de max-rows van PostgREST (standaard 1000)
+PAGINA_GROOTTE = 1000
+# rijen per bulk-insert/upsert en ids per bulk-delete (ids gaan in de URL)
+BULK_CHUNK = 500
+BULK_DELETE_CHUNK = 100
+
+_client = None
+_service_client = None
+_client_lock = threading.Lock()
+
+# ---------- SUPABASE-CLIENT ----------
+def _maak_client(key: str):
+    from supabase import create_client
+    import dbpool
+    client = create_client(os.getenv("SUPABASE_URL"), key)
+    # ook een later opnieuw aangemaakte postgrest-client krijgt de pool
+    maak_postgrest = client._init_postgrest_client
+    client._init_postgrest_client = lambda **kw: dbpool.koppel(maak_postgrest(**kw))
+    return client
+
+def supabase_client():
+    """Gedeelde Supabase-client, pas bij het eerste gebruik aangemaakt.
+
+    Ook de import van supabase (httpx, postgrest, gotrue, ...) gebeurt dan pas,
+    zodat een worker snel opstart en .env al geladen is. Alle PostgREST-
+    verzoeken lopen via de verbindingspool uit dbpool.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _maak_client(os.getenv("SUPABASE_KEY"))
+    return _client
+
+def service_client():
+    """Client met de service-role key (SUPABASE_SERVICE_KEY), lui aangemaakt.
+
+    Alleen voor server-stappen die de anon-key niet mag uitvoeren, zoals het
+    archiveren van geprinte regels (archiveer_overzicht, zie schema.sql).
+    """
+    global _service_client
+    if _service_client is None:
+        with _client_lock:
+            if _service_client is None:
+                key = os.getenv("SUPABASE_SERVICE_KEY")
+                if not key:
+                    raise RuntimeError("SUPABASE_SERVICE_KEY ontbreekt (nodig om geprinte regels te archiveren)")
+                _service_client = _maak_client(key)
+    return _service_client
+
+class _LuieClient:
+    """Doorgeefluik naar een lui aangemaakte client, bruikbaar als module-global."""
+
+    def __init__(self, maak=supabase_client):
+        self._maak = maak
+
+    def __getattr__(self, naam):
+        return getattr(self._maak(), naam)
+
+sb = _LuieClient()
+sb_service = _LuieClient(service_client)
+
+# ---------- NUMERIC ----------
+def als_decimal(waarde, standaard=None):
+    """numeric-kolom uit PostgREST → exacte Decimal; None → `standaard`.
+
+    PostgREST levert numeric als JSON-getal (float na json.loads); via str
+    blijft de waarde exact ("0.1", niet 0.1000000000000000055...).
+    """
+    return standaard if waarde is None else Decimal(str(waarde))
+
+# ---------- TABEL LEZEN ----------
+def lees_tabel(sb, tabel: str, kolommen: str = "*", pagina: int = PAGINA_GROOTTE, sleutel: str = "id", filters=None):
+    """Generator over alle rijen van een tabel of view, met keyset-paginering.
+
+    `sleutel` is een unieke, niet-lege kolom (voor views zonder id een
+    andere unieke kolom, bijvoorbeeld "naam"). `filters` is een optionele
+    functie die extra filters op de query zet.
+    """
+    if kolommen.strip() != "*" and sleutel not in [k.strip() for k in kolommen.split(",")]:
+        kolommen = f"{kolommen},{sleutel}"
+    laatste = None
+    while True:
+        q = sb.table(tabel).select(kolommen)
+        if filters:
+            q = filters(q)
+        if laatste is not None:
+            q = q.gt(sleutel, laatste)
+        rows = q.order(sleutel).limit(pagina).execute().data
+        yield from rows
+        if len(rows) < pagina:
+            break
+        laatste = rows[-1][sleutel]
+
+def _kolommen_met_sleutel(kolommen: str, *sleutels) -> str:
+    if kolommen.strip() == "*":
+        return "*"
+    namen = [k.strip() for k in kolommen.split(",") if k.strip()]
+    for sleutel in sleutels:
+        if sleutel not in namen:
+            namen.append(sleutel)
+    return ",".join(namen)
+
+def lees_op_volgorde(sb, tabel: str, kolom: str, kolommen: str = "*", filters=None, pagina: int = PAGINA_GROOTTE):
+    """Generator over de rijen waarin `kolom` niet leeg is, gesorteerd op (kolom, id).
+
+    Keyset-paginering op (kolom, id), ook als veel rijen dezelfde waarde in
+    `kolom` hebben: elke pagina gaat verder na de laatste (kolom, id), zodat
+    er nooit stilzwijgend rijen wegvallen door de max-rows van PostgREST.
+    `filters` is een optionele functie die extra filters op de query zet.
+    """
+    kolommen = _kolommen_met_sleutel(kolommen, kolom, "id")
+
+    def query():
+        q = sb.table(tabel).select(kolommen)
+        return filters(q) if filters else q
+
+    cursor = None
+    while True:
+        if cursor is None:
+            rows = query().not_.is_(kolom, "null").order(f"{kolom},id").limit(pagina).execute().data
+        else:
+            waarde, laatste_id = cursor
+            # eerst de rest van dezelfde waarde, daarna de volgende waarden
+            rows = query().eq(kolom, waarde).gt("id", laatste_id).order("id").limit(pagina).execute().data
+            if len(rows) < pagina:
+                rows += (query().gt(kolom, waarde).order(f"{kolom},id")
+                         .limit(pagina - len(rows)).execute().data)
+        yield from rows
+        if len(rows) < pagina:
+            break
+        cursor = (rows[-1][kolom], rows[-1]["id"])
+
+# ---------- OVERZICHT LEZEN ----------
+def lees_overzicht(sb, kolommen: str = "*", filters=None, pagina: int = PAGINA_GROOTTE, tabel: str = "overzicht"):
+    """Generator over alle overzicht-rijen, gesorteerd op (datum_dienst, id).
+
+    Leest met keyset-paginering (zie lees_op_volgorde), zodat er nooit rijen
+    wegvallen en er nooit de hele tabel in het geheugen staat.
+    `filters` is een optionele functie die extra filters op de query zet.
+    Rijen zonder datum komen (zoals bij "order by datum_dienst") als laatste.
+    Met `tabel` kan in plaats van de tabel een view erop gelezen worden
+    (bijvoorbeeld overzicht_regels).
+    """
+    # 1. rijen met een datum, keyset op (datum_dienst, id)
+    yield from lees_op_volgorde(sb, tabel, "datum_dienst", kolommen, filters, pagina)
+
+    # 2. rijen zonder datum, keyset op id
+    def zonder_datum(q):
+        q = q.is_("datum_dienst", "null")
+        return filters(q) if filters else q
+
+    yield from lees_tabel(sb, tabel, _kolommen_met_sleutel(kolommen, "datum_dienst"), pagina, filters=zonder_datum)
+
+# ---------- BULK MUTATIES ----------
+def _per_kolommen(items):
+    """PostgREST wil in één bulk-request bij elke rij dezelfde kolommen."""
+    groepen = {}
+    for i, row in items:
+        groepen.setdefault(tuple(sorted(row)), []).append((i, row))
+    return groepen.values()
+
+def _in_delen(items, grootte: int):
+    for start in range(0, len(items), grootte):
+        yield items[start:start + grootte]
+
+def _schrijf(query, deel, resultaten):
+    """Eén bulk-call; mislukt die, dan rij voor rij zodat de fout bij de juiste rij komt."""
+    from postgrest.exceptions import APIError
+    try:
+        data = query([row for _, row in deel]).execute().data
+    except APIError as e:
+        if len(deel) == 1:
+            resultaten[deel[0][0]] = {"status": "fout", "fout": e.message or str(e)}
+        else:
+            for item in deel:
+                _schrijf(query, [item], resultaten)
+        return
+    for (i, _), row in zip(deel, data):
+        resultaten[i] = {"status": "ok", "rij": row}
+
+def _verwijder(sb, tabel, ids, resultaten):
+    from postgrest.exceptions import APIError
+    try:
+        weg = {r["id"] for r in sb.table(tabel).delete().in_("id", ids).execute().data}
+    except APIError as e:
+        if len(ids) == 1:
+            resultaten[ids[0]] = {"id": ids[0], "status": "fout", "fout": e.message or str(e)}
+        else:
+            for id_ in ids:
+                _verwijder(sb, tabel, [id_], resultaten)
+        return
+    for id_ in ids:
+        resultaten[id_] = {"id": id_, "status": "ok" if id_ in weg else "niet_gevonden"}
+
+def bulk_mutatie(sb, tabel: str, upserts=(), deletes=()) -> dict:
+    """Past een batch upserts en deletes op één tabel toe in zo min mogelijk calls.
+
+    Rijen met een id worden bijgewerkt (upsert op id), rijen zonder id
+    ingevoegd: één call per BULK_CHUNK rijen met dezelfde kolommen. De deletes
+    gaan met een in-filter per BULK_DELETE_CHUNK ids. Geeft per rij een
+    resultaat terug, in de volgorde van de invoer: status "ok" (met de
+    opgeslagen rij), "fout" (met melding) of bij deletes "niet_gevonden".
+    """
+    resultaten = [None] * len(upserts)
+    bijwerken, invoegen = [], []
+    for i, row in enumerate(upserts):
+        if row.get("id"):
+            bijwerken.append((i, row))
+        else:
+            invoegen.append((i, {k: v for k, v in row.items() if k != "id"}))
+
+    for groep in _per_kolommen(bijwerken):
+        for deel in _in_delen(groep, BULK_CHUNK):
+            _schrijf(lambda rows: sb.table(tabel).upsert(rows, on_conflict="id"), deel, resultaten)
+    for groep in _per_kolommen(invoegen):
+        for deel in _in_delen(groep, BULK_CHUNK):
+            _schrijf(lambda rows: sb.table(tabel).insert(rows), deel, resultaten)
+
+    ids = list(dict.fromkeys(d for d in deletes if d))
+    verwijderd = {}
+    for deel in _in_delen(ids, BULK_DELETE_CHUNK):
+        _verwijder(sb, tabel, deel, verwijderd)
+
+    return {"upserts": resultaten, "deletes": [verwijderd[id_] for id_ in ids]}
@@ -0,0 +1,131 @@
+# dbpool.py
+"""
+HTTP-verbindingspool voor PostgREST (de database achter Supabase).
+Eén thread-safe httpx-client per proces met keep-alive, begrensde pool en
+time-outs uit de omgeving. Tijdelijke fouten worden met exponentiële backoff
+opnieuw geprobeerd: verbindingsfouten altijd (het verzoek is dan niet
+aangekomen), time-outs en 429/502/503/504 alleen bij idempotente verzoeken.
+Wordt lui geladen door db.supabase_client(); onder gunicorn krijgt elke
+worker dus na de fork zijn eigen pool.
+"""
+
+import os
+import time
+import random
+import threading
+
+import httpx
+from postgrest.utils import SyncClient
+
+import metrics
+
+# ---------- CONFIG ----------
+DB_MAX_VERBINDINGEN = int(os.getenv("DB_MAX_VERBINDINGEN", "10"))
+DB_KEEPALIVE = int(os.getenv("DB_KEEPALIVE", str(DB_MAX_VERBINDINGEN)))   # open gehouden verbindingen
+DB_KEEPALIVE_EXPIRY = float(os.getenv("DB_KEEPALIVE_EXPIRY", "30"))       # seconden ongebruikt
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "30"))
+DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))               # wachten op een vrije verbinding
+DB_MAX_POGINGEN = int(os.getenv("DB_MAX_POGINGEN", "3"))
+DB_RETRY_WACHT = float(os.getenv("DB_RETRY_WACHT", "0.25"))               # seconden, verdubbelt per poging
+
+HERHAALBARE_STATUS = {429, 502, 503, 504}
+IDEMPOTENT = {"GET", "HEAD", "OPTIONS", "PUT", "PATCH", "DELETE"}
+
+_lock = threading.Lock()
+_tellers = {"verzoeken": 0, "herhaald": 0, "mislukt": 0}
+
+# ---------- RETRY ----------
+def _idempotent(request: httpx.Request) -> bool:
+    # een upsert (POST met resolution=merge/ignore-duplicates) mag ook opnieuw
+    return request.method in IDEMPOTENT or "resolution=" in request.headers.get("prefer", "")
+
+def _tel(teller: str):
+    with _lock:
+        _tellers[teller] += 1
+
+# ---------- INSTRUMENTATIE ----------
+OPERATIES = {"GET": "select", "HEAD": "count", "PATCH": "update", "DELETE": "delete", "PUT": "upsert"}
+
+def _operatie(request: httpx.Request) -> str:
+    if request.method == "POST":
+        return "upsert" if "resolution=" in request.headers.get("prefer", "") else "insert"
+    return OPERATIES.get(request.method, request.method.lower())
+
+def _tabel(request: httpx.Request) -> str:
+    pad = request.url.path.rstrip("/").split("/")
+    return "/".join(pad[-2:]) if len(pad) > 1 and pad[-2] == "rpc" else pad[-1]
+
+def _vorm(request: httpx.Request, operatie: str, tabel: str) -> str:
+    """Query zonder waarden: operatie, tabel en filterkolommen met operator."""
+    filters = sorted(f"{k}={v.split('.', 1)[0]}" for k, v in request.url.params.multi_items()
+                     if k not in ("select", "order", "limit", "offset", "on_conflict", "columns"))
+    return f"{operatie} {tabel} {'&'.join(filters)}".strip()
+
+def _rijen(response: httpx.Response):
+    # PostgREST: Content-Range "0-24/*" → 25 rijen
+    bereik = response.headers.get("content-range", "").split("/")[0]
+    if "-" not in bereik:
+        return None
+    van, tot = bereik.split("-")
+    return int(tot) - int(van) + 1
+
+class RetryTransport(httpx.HTTPTransport):
+    """HTTPTransport die tijdelijke fouten met backoff herhaalt en elke query meet."""
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self._met_retry(request)
+            return response
+        finally:
+            operatie, tabel = _operatie(request), _tabel(request)
+            metrics.query(tabel, operatie, _vorm(request, operatie, tabel), time.perf_counter() - start,
+                          _rijen(response) if response is not None else None)
+
+    def _met_retry(self, request: httpx.Request) -> httpx.Response:
+        _tel("verzoeken")
+        for poging in range(1, DB_MAX_POGINGEN + 1):
+            laatste = poging == DB_MAX_POGINGEN
+            try:
+                response = super().handle_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if laatste:
+                    _tel("mislukt")
+                    raise
+            except (httpx.ReadTimeout, httpx.ReadError, httpx.RemoteProtocolError):
+                if laatste or not _idempotent(request):
+                    _tel("mislukt")
+                    raise
+            else:
+                if response.status_code not in HERHAALBARE_STATUS or laatste or not _idempotent(request):
+                    return response
+                response.close()
+            _tel("herhaald")
+            time.sleep(DB_RETRY_WACHT * 2 ** (poging - 1) * random.uniform(1, 1.5))
+
+# ---------- SESSIE ----------
+def maak_sessie(base_url, headers) -> SyncClient:
+    limits = httpx.Limits(max_connections=DB_MAX_VERBINDINGEN,
+                          max_keepalive_connections=DB_KEEPALIVE,
+                          keepalive_expiry=DB_KEEPALIVE_EXPIRY)
+    return SyncClient(
+        base_url=base_url,
+        headers=headers,
+        timeout=httpx.Timeout(DB_TIMEOUT, connect=DB_CONNECT_TIMEOUT, pool=DB_POOL_TIMEOUT),
+        transport=RetryTransport(limits=limits),
+    )
+
+def koppel(postgrest_client):
+    """Vervangt de standaard httpx-sessie van een PostgREST-client door de pool."""
+    oud = postgrest_client.session
+    postgrest_client.session = maak_sessie(oud.base_url, oud.headers)
+    oud.close()
+    return postgrest_client
+
+def statistieken() -> dict:
+    with _lock:
+        return dict(_tellers)
+
+metrics.registreer_collector(lambda: ((f"db_http_{k}", {}, v) for k, v in statistieken().items()))
@@ -0,0 +1,303 @@
+# facturatie.py
+"""
+Gedeelde factuur-engine voor facturenaanmaken en facturenprinten.
+Groepeert de overzicht-rijen één keer per naam en levert per factuur een plan
+(client-blok, regels en totalen) op, zonder de rijen opnieuw te doorzoeken.
+Haalt ook tarieven en NAW-gegevens op en mailt de facturen (alleen
+facturenprinten; per factuurnummer wordt de verzendstatus bewaard, zodat een
+factuur nooit twee keer verstuurd wordt).
+"""
+
+import os
+from datetime import date, timedelta
+
+from jinja2 import Environment, FileSystemLoader
+
+import pdfcache
+import referentie
+import replica
+import mailer
+from db import sb, BULK_CHUNK
+from zoekindex import normaliseer
+from pdfrender import schrijf_pdf, schrijf_pdfs
+
+# Jinja2 omgeving voor templates
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "facturen_templates")
+jinja_env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+FACTUUR_TEMPLATE = "factuur.html"
+# overzicht-kolommen die de engine nodig heeft
+FACTUUR_KOLOMMEN = "naam,datum_dienst,opmerking,bedrag,btw_21_pct,factuurnummer,deb_nr"
+LOGO_PATH = "static/images/logo.png"
+# NAW-opvraag: aantal namen per bulk-query (houdt de URL kort genoeg)
+NAW_CHUNK = 50
+NAW_KOLOMMEN = ("naam_client,straatnaam,postcode,woonplaats,land,geboorte_datum,"
+                "bsn_nr,verzekeraar,polis_nr,emailadres,klant_id")
+
+# verzendstatus per factuurnummer
+MAIL_TABEL = "factuur_mails"
+
+PERSOONLIJKE_BEGELEIDING = "persoonlijke begeleiding"
+PGB_UREN = {"PGB2": 2, "PGB3": 3}
+
+# ---------- HELPERS ----------
+def als_datum(d):
+    """PostgREST levert datums als ISO-string; zet die om naar een date."""
+    return date.fromisoformat(d) if isinstance(d, str) else d
+
+def get_adres(naam: str, adres_index: dict):
+    return adres_index.get(normaliseer(naam), [""] * 30)
+
+def voornaam(naam: str):
+    return naam.split()[0] if " " in naam else naam
+
+def tarief_index(tarieven: list) -> dict:
+    """item -> tariefregel; bij dubbele items wint de eerste (zoals get_tarief_naam)."""
+    index = {}
+    for t in tarieven:
+        index.setdefault(t[0], t)
+    return index
+
+# ---------- OPHALEN ----------
+def get_tarieven():
+    rows = referentie.tarieven(sb)
+    return [[r["item"], float(r["bedrag"]), float(r["btw_incl_pct"]), r["omschrijving_op_factuur"]] for r in rows]
+
+def get_naw_data(namen: list):
+    """Haalt de NAW-gegevens van alle namen in bulk op (één query per NAW_CHUNK namen,
+    of uit de lokale replica als die aan staat).
+
+    Geeft een dict terug met de genormaliseerde naam als sleutel.
+    """
+    namen = sorted({n for n in namen if n and n.strip()})
+    if replica.actief():
+        rows = replica.clienten_op_namen(sb, namen)
+    else:
+        rows = [c for i in range(0, len(namen), NAW_CHUNK)
+                for c in sb.table("clienten").select(NAW_KOLOMMEN).in_("naam_client", namen[i:i + NAW_CHUNK])
+                .execute().data]
+    adres_index = {}
+    for c in rows:
+        sleutel = normaliseer(c["naam_client"])
+        if sleutel in adres_index:
+            continue
+        adres_index[sleutel] = [
+            c["naam_client"], c["straatnaam"], c["postcode"], c["woonplaats"], c["land"],
+            c["geboorte_datum"], c["bsn_nr"], c["verzekeraar"], c["polis_nr"], "", "",
+            c["emailadres"], c["klant_id"]
+        ]
+    return adres_index
+
+# ---------- GROEPEREN ----------
+def groepeer_per_naam(rows) -> dict:
+    """Eén pass over de rijen: naam -> rijen in de oorspronkelijke (datum)volgorde.
+
+    Lege namen worden overgeslagen; de volgorde van de namen is die van het
+    eerste voorkomen.
+    """
+    groepen = {}
+    for r in rows:
+        naam = r["naam"]
+        if not naam or not naam.strip():
+            continue
+        groepen.setdefault(naam, []).append(r)
+    return groepen
+
+def _bouw_regels(naam_rows: list, omschrijving: str, pgb_tarief: float):
+    regels = []
+    totaal_btw = 0.0
+    totaal_bedrag = 0.0
+    for r in naam_rows:
+        aantaluren = 1
+        if omschrijving == PERSOONLIJKE_BEGELEIDING:
+            aantaluren = PGB_UREN.get(r["opmerking"], 1)
+        regels.append({
+            "datum": als_datum(r["datum_dienst"]).strftime("%d-%m-%Y"),
+            "omschrijving": omschrijving,
+            "uren": aantaluren,
+            "tarief": pgb_tarief,
+            "bedrag": float(r["bedrag"])
+        })
+        totaal_btw += float(r["btw_21_pct"])
+        totaal_bedrag += float(r["bedrag"])
+    return regels, totaal_btw, totaal_bedrag
+
+# ---------- FACTUURPLANNEN ----------
+def factuurplannen(groepen: dict, tarieven: list, adres_index: dict):
+    """Levert per factuur een dict met client, regels, totaal_btw, totaal_bedrag en email.
+
+    `groepen` is de uitkomst van groepeer_per_naam.
+
+    Een nieuwe factuur begint bij elk nieuw factuurnummer, en bij persoonlijke
+    begeleiding ook bij elke nieuwe naam. Een factuur bevat alle regels van de
+    naam. Regels en totalen worden per (naam, omschrijving) maar één keer berekend.
+    """
+    index = tarief_index(tarieven)
+    pgb_tarief = float(index["PGB1"][1]) if "PGB1" in index else 0.0
+
+    huidigenaam = huidigefacnr = huidigtarief = ""
+    for naam, naam_rows in groepen.items():
+        berekend = {}
+        huidigadres = get_adres(naam, adres_index)
+        for rec in naam_rows:
+            if not ((huidigtarief == PERSOONLIJKE_BEGELEIDING and huidigenaam != naam)
+                    or huidigefacnr != rec["factuurnummer"]):
+                continue
+            huidigefacnr = rec["factuurnummer"]
+            tarief = index.get(rec["opmerking"])
+            huidigtarief = tarief[3] if tarief else ""
+            huidigenaam = naam
+
+            if huidigtarief not in berekend:
+                berekend[huidigtarief] = _bouw_regels(naam_rows, huidigtarief, pgb_tarief)
+            regels, totaal_btw, totaal_bedrag = berekend[huidigtarief]
+
+            yield {
+                "client": {
+                    "naam": naam,
+                    "straat": huidigadres[1],
+                    "postcode": huidigadres[2],
+                    "woonplaats": huidigadres[3],
+                    "land": huidigadres[4],
+                    "factuurnummer": rec["factuurnummer"],
+                    "deb_nr": rec["deb_nr"]
+                },
+                "regels": regels,
+                "totaal_btw": totaal_btw,
+                "totaal_bedrag": totaal_bedrag,
+                "email": huidigadres[11] if len(huidigadres) > 11 else ""
+            }
+
+# ---------- PDF GENERATOR ----------
+def render_invoice_html(client, regels, totaal_btw, totaal_bedrag, contant=0, logo_path=LOGO_PATH):
+    template = jinja_env.get_template(FACTUUR_TEMPLATE)
+    return template.render(
+        logo=logo_path,
+        naam_client=client["naam"],
+        straat=client["straat"],
+        postcode=client["postcode"],
+        woonplaats=client["woonplaats"],
+        land=client["land"],
+        factuurnummer=client["factuurnummer"],
+        deb_nr=client["deb_nr"],
+        datum_vandaag=date.today().strftime("%d-%m-%Y"),
+        regels=regels,
+        totaal_btw=totaal_btw,
+        totaal_bedrag=totaal_bedrag,
+        contant=contant,
+        nog_te_voldoen=totaal_bedrag - contant,
+        betaaldatum=(date.today() + timedelta(days=14)).strftime("%d-%m-%Y")
+    )
+
+def invoice_pdf_path(client):
+    return f"output/factuur_{client['factuurnummer']}.pdf"
+
+def generate_invoice_pdf(client, regels, totaal_btw, totaal_bedrag, contant=0, logo_path=LOGO_PATH):
+    html_out = render_invoice_html(client, regels, totaal_btw, totaal_bedrag, contant, logo_path)
+    return schrijf_pdf(html_out, invoice_pdf_path(client))
+
+def invoice_cache_sleutel(html_out: str, logo_path=LOGO_PATH) -> str:
+    # over de gerenderde HTML: daarin staan ook de template, datum_vandaag en betaaldatum
+    return pdfcache.sleutel(html_out, logo_path)
+
+def maak_factuur_pdfs(plannen: list, workers: int = None, voortgang=None) -> list:
+    """Zet de factuurplannen om naar PDF's; geeft per plan {pdf_path, fout} terug.
+
+    Elke factuur wordt als HTML gerenderd; een factuur met precies dezelfde
+    HTML (dus ook dezelfde datums) komt uit de PDF-cache, de rest wordt
+    (eventueel parallel) naar PDF omgezet.
+    """
+    resultaten = [None] * len(plannen)
+    taken = []
+    openstaand = []
+    for i, plan in enumerate(plannen):
+        pdf_path = invoice_pdf_path(plan["client"])
+        html_out = render_invoice_html(
+            client=plan["client"],
+            regels=plan["regels"],
+            totaal_btw=plan["totaal_btw"],
+            totaal_bedrag=plan["totaal_bedrag"],
+            contant=0
+        )
+        key = invoice_cache_sleutel(html_out)
+        if pdfcache.haal_op(key, pdf_path):
+            resultaten[i] = {"pdf_path": pdf_path, "fout": None}
+            continue
+        taken.append((html_out, pdf_path))
+        openstaand.append((i, key))
+
+    gedaan = len(plannen) - len(taken)
+    if voortgang:
+        voortgang(gedaan, len(plannen))
+    for (i, key), resultaat in zip(openstaand, schrijf_pdfs(taken, workers)):
+        if not resultaat["fout"]:
+            pdfcache.bewaar(key, resultaat["pdf_path"])
+        resultaten[i] = resultaat
+        gedaan += 1
+        if voortgang:
+            voortgang(gedaan, len(plannen))
+
+    pdfcache.opruimen()
+    return resultaten
+
+def verzamel_facturen(plannen: list, resultaten: list):
+    """Splitst de PDF-resultaten van maak_factuur_pdfs in (facturen, fouten).
+
+    facturen: [{naam, factuurnummer, email, pdf_path}] van de gelukte PDF's,
+    fouten: [{factuurnummer, fout}]; elke mislukte factuur wordt gemeld.
+    """
+    facturen, fouten = [], []
+    for plan, resultaat in zip(plannen, resultaten):
+        client = plan["client"]
+        if resultaat["fout"]:
+            fouten.append({"factuurnummer": client["factuurnummer"], "fout": resultaat["fout"]})
+            print(f"Factuur {client['factuurnummer']} ({client['naam']}) mislukt: {resultaat['fout']}")
+            continue
+        facturen.append({
+            "naam": client["naam"],
+            "factuurnummer": client["factuurnummer"],
+            "email": plan["email"],
+            "pdf_path": resultaat["pdf_path"]
+        })
+    return facturen, fouten
+
+# ---------- MAIL ----------
+def mailtekst(factuur: dict) -> str:
+    return (f"Beste {voornaam(factuur['naam'])},\n\n"
+            f"In de bijlage vind je factuur {factuur['factuurnummer']}.\n\n"
+            "Met vriendelijke groet,\nLijf en Leven")
+
+def al_verzonden(factuurnummers) -> set:
+    """De factuurnummers die volgens factuur_mails al verzonden zijn."""
+    nummers = sorted(set(factuurnummers))
+    verzonden = set()
+    for i in range(0, len(nummers), NAW_CHUNK):
+        rows = (sb.table(MAIL_TABEL).select("factuurnummer").eq("status", mailer.VERZONDEN)
+                .in_("factuurnummer", nummers[i:i + NAW_CHUNK]).execute().data)
+        verzonden.update(r["factuurnummer"] for r in rows)
+    return verzonden
+
+def bewaar_mailstatus(verstuurd: list):
+    """Slaat de verzendstatus op van elke factuur waarvoor een verzendpoging is gedaan."""
+    rows = [{"factuurnummer": r["factuurnummer"], "email": r["email"], "status": r["mail_status"],
+             "pogingen": r["mail_pogingen"], "fout": r["mail_fout"]}
+            for r in verstuurd if r["mail_pogingen"]]
+    for i in range(0, len(rows), BULK_CHUNK):
+        sb.table(MAIL_TABEL).upsert(rows[i:i + BULK_CHUNK], on_conflict="factuurnummer").execute()
+
+def mail_pdf(pdflist: list, mailcount: int) -> list:
+    """Mailt de facturen die nog niet verzonden zijn; geeft per factuur de verzendstatus terug.
+
+    Facturen die al eerder verzonden zijn, krijgen status overgeslagen.
+    """
+    facturen = pdflist[:mailcount]
+    verzonden = al_verzonden(f["factuurnummer"] for f in facturen) if mailer.MAIL_VERSTUREN else set()
+    verstuurd = mailer.verstuur_facturen([f for f in facturen if f["factuurnummer"] not in verzonden], mailtekst)
+    bewaar_mailstatus(verstuurd)
+
+    per_nummer = {r["factuurnummer"]: r for r in verstuurd}
+    uit = []
+    for f in facturen:
+        r = per_nummer.get(f["factuurnummer"]) or dict(f, mail_status=mailer.OVERGESLAGEN, mail_pogingen=0,
+                                                       mail_fout="al verzonden")
+        uit.append({k: r[k] for k in ("factuurnummer", "email", "mail_status", "mail_pogingen", "mail_fout")})
+    return uit
@@ -1,215 +1,108 @@
 # facturenaanmaken.py
 import os
-from datetime import date, datetime, timedelta
-from decimal import Decimal
-from supabase import create_client, Client
-from weasyprint import HTML, CSS
-from jinja2 import Environment, FileSystemLoader
-from flask_mail import Message
-from flask import Flask, send_file
+from datetime import datetime, timedelta
 
-app = Flask(__name__)
+from facturatie import (factuurplannen, groepeer_per_naam, maak_factuur_pdfs, verzamel_facturen, get_tarieven,
+                        get_naw_data, FACTUUR_KOLOMMEN, NAW_CHUNK)
+from db import sb, lees_overzicht, BULK_CHUNK
+from pdfcache import statistieken as pdfcache_statistieken
 
 # ---------- CONFIG ----------
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-sb: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# Jinja2 omgeving voor templates
-TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "facturen_templates")
-jinja_env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
-
-# ---------- STUBS ----------
-def mail_pdf(pdflist: list, mailcount: int) -> None:
-    pass
-
-# ---------- HELPERS ----------
-def get_tarieven():
-    rows = sb.table("tarieven").select("*").execute().data
-    return [[r["item"], float(r["bedrag"]), float(r["btw_incl_pct"]), r["omschrijving_op_factuur"]] for r in rows]
-
-def get_naw_data(namen: list):
-    adres_lijst = []
-    for naam in namen:
-        c = sb.table("clienten").select("*").ilike("naam_client", naam).execute().data
-        if c:
-            c = c[0]
-            adres_lijst.append([
-                c["naam_client"], c["straatnaam"], c["postcode"], c["woonplaats"], c["land"],
-                c["geboorte_datum"], c["bsn_nr"], c["verzekeraar"], c["polis_nr"], "", "",
-                c["emailadres"], c["klant_id"]
-            ])
-    return adres_lijst
-
-def get_adres(naam: str, adres_lijst: list):
-    for adr in adres_lijst:
-        if adr[0] == naam:
-            return adr
-    return [""] * 30
-
-def get_tarief_naam(tarief_code: str, tarieven: list):
-    for t in tarieven:
-        if t[0] == tarief_code:
-            return t[3]
-    return ""
-
-def get_tarief_bedrag(tarief_code: str, tarieven: list):
-    for t in tarieven:
-        if t[0] == tarief_code:
-            return float(t[1])
-    return 0.0
-
-def register_last_invoices(invoices: list):
-    for inv in invoices:
-        sb.table("clienten").update({"laatste_factuurnr": inv[1]}).eq("naam_client", inv[0]).execute()
-
-def voornaam(naam: str):
-    return naam.split()[0] if " " in naam else naam
-
-# ---------- PDF GENERATOR ----------
-def generate_invoice_pdf(client, regels, totaal_btw, totaal_bedrag, contant=0, logo_path="static/images/logo.png"):
-    template = jinja_env.get_template("factuur.html")
-    html_out = template.render(
-        logo=logo_path,
-        naam_client=client["naam"],
-        straat=client["straat"],
-        postcode=client["postcode"],
-        woonplaats=client["woonplaats"],
-        land=client["land"],
-        factuurnummer=client["factuurnummer"],
-        deb_nr=client["deb_nr"],
-        datum_vandaag=date.today().strftime("%d-%m-%Y"),
-        regels=regels,
-        totaal_btw=totaal_btw,
-        totaal_bedrag=totaal_bedrag,
-        contant=contant,
-        nog_te_voldoen=totaal_bedrag - contant,
-        betaaldatum=(date.today() + timedelta(days=14)).strftime("%d-%m-%Y")
-    )
-
-    os.makedirs("output", exist_ok=True)
-    pdf_path = f"output/factuur_{client['factuurnummer']}.pdf"
-    HTML(string=html_out).write_pdf(pdf_path)
-    return pdf_path
+# run-log in tabel factuurruns (watermark voor de incrementele run)
+RUN_SOORT = "facturen_aanmaken"
+# terugkijken vóór het watermark: een transactie die pas na de vorige run
+# commit, heeft een gewijzigd_op (now() bij de start) van vóór het watermark
+FACTUUR_OVERLAP = float(os.getenv("FACTUUR_OVERLAP", "60"))   # langste transactie + klokverschil
+
+# ---------- INCREMENTELE RUN ----------
+def laatste_watermark():
+    """gewijzigd_op-grens van de laatste geslaagde factuurrun, of None."""
+    rows = (sb.table("factuurruns").select("watermark").eq("soort", RUN_SOORT)
+            .order("watermark", desc=True).limit(1).execute().data)
+    return rows[0]["watermark"] if rows else None
+
+def gewijzigde_namen(watermark: str):
+    """Namen met overzicht-rijen die na `watermark` zijn toegevoegd of gewijzigd.
+
+    Kijkt FACTUUR_OVERLAP seconden terug, zodat ook rijen meekomen die na de
+    vorige run gecommit zijn met een oudere gewijzigd_op; een naam uit die
+    overlap wordt gewoon nog eens gefactureerd (de PDF komt dan uit de cache
+    en een verzonden factuur wordt niet opnieuw gemaild). Geeft (namen,
+    nieuwe_watermark) terug; nieuwe_watermark is de hoogste gewijzigd_op die
+    gezien is.
+    """
+    namen = set()
+    nieuwe_watermark = watermark
+    sinds = (datetime.fromisoformat(watermark) - timedelta(seconds=FACTUUR_OVERLAP)).isoformat()
+    for r in lees_overzicht(sb, "naam,gewijzigd_op", filters=lambda q: q.gt("gewijzigd_op", sinds)):
+        if r["naam"] and r["naam"].strip():
+            namen.add(r["naam"])
+        nieuwe_watermark = max(nieuwe_watermark, r["gewijzigd_op"], key=datetime.fromisoformat)
+    return namen, nieuwe_watermark
+
+def get_overzicht_voor_namen(namen):
+    """Alle overzicht-rijen van de gegeven namen, gegroepeerd per naam."""
+    groepen = {}
+    namen = sorted(namen)
+    for i in range(0, len(namen), NAW_CHUNK):
+        chunk = namen[i:i + NAW_CHUNK]
+        rows = lees_overzicht(sb, FACTUUR_KOLOMMEN, filters=lambda q: q.in_("naam", chunk))
+        groepen.update(groepeer_per_naam(rows))
+    return groepen
+
+def registreer_run(watermark: str, aantal_rijen: int, aantal_facturen: int, volledig: bool):
+    sb.table("factuurruns").insert({
+        "soort": RUN_SOORT,
+        "watermark": watermark,
+        "volledig": volledig,
+        "aantal_rijen": aantal_rijen,
+        "aantal_facturen": aantal_facturen
+    }).execute()
+
+def register_last_invoices(facturen: list):
+    """laatste_factuurnr per client bijwerken, BULK_CHUNK facturen per call (zie schema.sql)."""
+    for i in range(0, len(facturen), BULK_CHUNK):
+        chunk = [{"naam": f["naam"], "factuurnummer": f["factuurnummer"]} for f in facturen[i:i + BULK_CHUNK]]
+        sb.rpc("registreer_factuurnummers", {"facturen": chunk}).execute()
 
 # ---------- MAIN ROUTINE ----------
-def facturenaanmaken():
-    PAGESIZE = 51
-    som1 = som2 = som3 = som4 = 0.0
-    reccounter = faccounter = 0
-    overzichtrecord = []
-    factuurnrlist = []
-
+def facturenaanmaken(workers: int = None, voortgang=None, volledig: bool = False):
+    """Maakt de facturen aan.
+
+    Standaard incrementeel: alleen de namen met rijen die sinds de laatste
+    geslaagde run zijn toegevoegd of gewijzigd worden opnieuw gefactureerd.
+    Met volledig=True (of als er nog geen run is) wordt alles opnieuw opgebouwd.
+    Verwijderde rijen ziet alleen een volledige run.
+    """
+    cache_voor = pdfcache_statistieken()
     tarieven = get_tarieven()
-    rows = sb.table("overzicht").select("*").order("datum_dienst").execute().data
-    namen = list({r["naam"] for r in rows})
-    adreslist = get_naw_data(namen)
-
-    for uname in namen:
-        if not uname.strip():
-            continue
-        beginrij = reccounter + 6
-        for r in rows:
-            if r["naam"] != uname:
-                continue
-            record = {
-                "datum": r["datum_dienst"],
-                "naam": r["naam"],
-                "tijd": r["tijd"],
-                "contant": r["contant"],
-                "te_ontvangen": float(r["te_ontvangen"]),
-                "opmerking": r["opmerking"],
-                "bedrag": float(r["bedrag"]),
-                "ex_btw": float(r["ex_btw"]),
-                "btw": float(r["btw_21_pct"]),
-                "factuurnummer": r["factuurnummer"],
-                "deb_nr": r["deb_nr"]
-            }
-            overzichtrecord.append(record)
-            som1 += float(r["te_ontvangen"])
-            som2 += float(r["ex_btw"])
-            som3 += float(r["btw_21_pct"])
-            som4 += float(r["bedrag"])
-            reccounter += 1
-
-        overzichtrecord.append({
-            "naam": "totaal",
-            "te_ontvangen": som1,
-            "ex_btw": som2,
-            "btw": som3,
-            "bedrag": som4
-        })
-        som1 = som2 = som3 = som4 = 0.0
-        reccounter += 1
-
-    huidigenaam = huidigefacnr = huidigtarief = ""
-    pagina = 0
-
-    for rec in overzichtrecord:
-        if rec.get("naam") == "totaal":
-            continue
-        if rec["naam"] == "":
-            continue
-
-        if (huidigtarief == "persoonlijke begeleiding" and huidigenaam != rec["naam"]) or huidigefacnr != rec["factuurnummer"]:
-            huidigadres = get_adres(rec["naam"], adreslist)
-            huidigefacnr = rec["factuurnummer"]
-            huidigtarief = get_tarief_naam(rec["opmerking"], tarieven)
-
-            client = {
-                "naam": rec["naam"],
-                "straat": huidigadres[1],
-                "postcode": huidigadres[2],
-                "woonplaats": huidigadres[3],
-                "land": huidigadres[4],
-                "factuurnummer": rec["factuurnummer"],
-                "deb_nr": rec["deb_nr"]
-            }
-
-            regels = []
-            totaal_btw = 0.0
-            totaal_bedrag = 0.0
-            for r in overzichtrecord:
-                if r.get("naam") == rec["naam"] and r.get("naam") != "totaal":
-                    aantaluren = 1
-                    if huidigtarief == "persoonlijke begeleiding":
-                        if r["opmerking"] == "PGB2":
-                            aantaluren = 2
-                        elif r["opmerking"] == "PGB3":
-                            aantaluren = 3
-                    regels.append({
-                        "datum": r["datum"].strftime("%d-%m-%Y"),
-                        "omschrijving": huidigtarief,
-                        "uren": aantaluren,
-                        "tarief": get_tarief_bedrag("PGB1", tarieven),
-                        "bedrag": float(r["bedrag"])
-                    })
-                    totaal_btw += float(r["btw"])
-                    totaal_bedrag += float(r["bedrag"])
-
-            pdf_path = generate_invoice_pdf(
-                client=client,
-                regels=regels,
-                totaal_btw=totaal_btw,
-                totaal_bedrag=totaal_bedrag,
-                contant=0
-            )
-
-            factuurnrlist.append({
-                "naam": rec["naam"],
-                "factuurnummer": rec["factuurnummer"],
-                "email": huidigadres[11] if len(huidigadres) > 11 else "",
-                "pdf_path": pdf_path
-            })
-            faccounter += 1
-            huidigenaam = rec["naam"]
-
-    register_last_invoices([[r["naam"], r["factuurnummer"]] for r in factuurnrlist])
-
-    if factuurnrlist:
-        mail_pdf(factuurnrlist, len(factuurnrlist))
+    watermark = None if volledig else laatste_watermark()
+    if watermark is None:
+        volledig = True
+        nieuwe_watermark = sb.table("overzicht").select("gewijzigd_op").order("gewijzigd_op", desc=True).limit(1).execute().data
+        nieuwe_watermark = nieuwe_watermark[0]["gewijzigd_op"] if nieuwe_watermark else None
+        groepen = groepeer_per_naam(lees_overzicht(sb, FACTUUR_KOLOMMEN))
+    else:
+        gewijzigd, nieuwe_watermark = gewijzigde_namen(watermark)
+        groepen = get_overzicht_voor_namen(gewijzigd)
+        print(f"Incrementele run: {len(gewijzigd)} namen gewijzigd sinds {watermark}")
+    adresindex = get_naw_data(list(groepen))
+
+    plannen = list(factuurplannen(groepen, tarieven, adresindex))
+    resultaten = maak_factuur_pdfs(plannen, workers, voortgang)
+    cache = pdfcache_statistieken(cache_voor)
+    print(f"PDF-cache: {cache}")
+    factuurnrlist, fouten = verzamel_facturen(plannen, resultaten)
+
+    register_last_invoices(factuurnrlist)
+    # mailen gebeurt alleen in facturenprinten: aanmaken (ook incrementeel) mailt niemand
+
+    if not fouten and nieuwe_watermark:
+        aantal_rijen = sum(len(g) for g in groepen.values())
+        registreer_run(nieuwe_watermark, aantal_rijen, len(factuurnrlist), volledig)
 
     print("Facturenaanmaken klaar!")
+    return {"pdfs": [r["pdf_path"] for r in factuurnrlist], "fouten": fouten, "cache": cache}
 
 # ---------- DIRECT UITVOEREN ----------
 if __name__ == "__main__":
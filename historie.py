@@ -0,0 +1,75 @@
+# historie.py
+"""
+Archief van geprinte overzicht-regels (tabel overzicht_historie, per jaar van
+datum_dienst gepartitioneerd; zie schema.sql). Na een geslaagde run verplaatst
+facturenprinten de geprinte regels in één keer hierheen, zodat de werktabel
+overzicht klein blijft voor de editors.
+
+Archiveren mag alleen met de service-role key (db.sb_service); lezen kan
+met de gewone client.
+
+Lookups per client, per factuurnummer en over een datumbereik lezen met
+keyset-paginering op (datum_dienst, id); met een datumbereik leest Postgres
+alleen de partities van die jaren.
+"""
+
+from db import lees_overzicht
+
+# ---------- ARCHIVEREN ----------
+def archiveer(sb, regels) -> int:
+    """Verplaatst precies de gegeven overzicht-regels naar de historie.
+
+    `regels` zijn de geprinte rijen (minstens id en gewijzigd_op, zoals
+    gelezen). Gebeurt in Postgres in één transactie (functie
+    archiveer_overzicht): een regel die na het lezen nog bijgewerkt is, heeft
+    een ander gewijzigd_op en blijft staan. Geeft het aantal verplaatste
+    regels terug (de functie levert één rij {"aantal": n}: PostgREST-
+    antwoorden zijn in postgrest-py altijd een lijst).
+    """
+    paren = [{"id": r["id"], "gewijzigd_op": r["gewijzigd_op"]} for r in regels]
+    return sb.rpc("archiveer_overzicht", {"regels": paren}).execute().data[0]["aantal"]
+
+def controleer(sb) -> None:
+    """Faalt als archiveer_overzicht met deze client niet uit te voeren is.
+
+    De functie is alleen voor service_role (zie schema.sql); met de anon-key
+    zou een run pas na het printen en mailen op het archiveren stuklopen.
+    Archiveert een lege lijst, dus verplaatst niets.
+    """
+    from postgrest.exceptions import APIError
+    try:
+        archiveer(sb, [])
+    except APIError as e:
+        raise RuntimeError(f"archiveer_overzicht niet uit te voeren (service-role key nodig): "
+                           f"{e.message or e}") from e
+
+# ---------- OPVRAGEN ----------
+def regels(sb, naam: str = None, factuurnummer: str = None, van: str = None, tot: str = None,
+           kolommen: str = "*", met_live: bool = False):
+    """Generator over gearchiveerde regels, gesorteerd op (datum_dienst, id).
+
+    `van`/`tot` (ISO-datums, inclusief) begrenzen datum_dienst. Met
+    `met_live` komen ook de nog niet geprinte regels uit overzicht mee
+    (view overzicht_met_historie; gearchiveerd_op is daar leeg).
+    """
+    def filters(q):
+        if naam:
+            q = q.eq("naam", naam)
+        if factuurnummer:
+            q = q.eq("factuurnummer", factuurnummer)
+        if van:
+            q = q.gte("datum_dienst", van)
+        if tot:
+            q = q.lte("datum_dienst", tot)
+        return q
+
+    tabel = "overzicht_met_historie" if met_live else "overzicht_historie"
+    return lees_overzicht(sb, kolommen, filters=filters, tabel=tabel)
+
+def factuur(sb, factuurnummer: str) -> list:
+    """Alle regels van één (gearchiveerde of nog live) factuur."""
+    return list(regels(sb, factuurnummer=factuurnummer, met_live=True))
+
+def client(sb, naam: str, van: str = None, tot: str = None) -> list:
+    """Alle regels van één client, over alle jaren of binnen [van, tot]."""
+    return list(regels(sb, naam=naam, van=van, tot=tot, met_live=True))
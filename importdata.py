@@ -2,116 +2,346 @@
 """
 Importeert clienten.csv en tarieven.csv naar Supabase.
 Upsert = insert bij nieuw, update bij conflict (unique keys).
+De CSV wordt regel voor regel gelezen, op de unieke sleutel ontdubbeld en in
+chunks als bulk-upsert verstuurd, met een paar chunks tegelijk onderweg.
+
+Met --delta worden alleen nieuwe of gewijzigde regels verstuurd (vergeleken
+met de fingerprints van de vorige import); --dry-run toont alleen het verschil.
 """
 
 import os
 import csv
-from datetime import date
+import json
+import hashlib
+import argparse
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
-import pandas as pd
 from dotenv import load_dotenv
-from supabase import create_client, Client
 
 # ---------- ENV ----------
 load_dotenv()
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
 # ---------- SUPABASE CLIENT ----------
-sb: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+from db import sb, lees_tabel
+from zoekindex import normaliseer
 
 # ---------- PADEN ----------
 CLIENTEN_CSV = Path("data/clienten.csv")
 TARIEVEN_CSV = Path("data/tarieven.csv")
 
+# fingerprints van de laatst geïmporteerde regels (voor --delta) en toegewezen
+# klant_id's per naam; onder output/ zodat hij niet in git belandt
+IMPORT_SNAPSHOT = Path(os.getenv("IMPORT_SNAPSHOT", "output/.import_snapshot.json"))
+
+# ---------- BULK ----------
+IMPORT_CHUNK = int(os.getenv("IMPORT_CHUNK", "500"))    # rijen per upsert
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "4"))  # chunks tegelijk onderweg
+
 # ---------- HELPERS ----------
-def df_to_records(df: pd.DataFrame) -> list[dict]:
-    """Converteer DataFrame naar lijst met dicts, NaN → None."""
-    return df.where(pd.notnull(df), None).to_dict(orient="records")
+def lees_csv(pad: Path):
+    """Generator over de CSV-regels als dict; lege velden → None."""
+    with open(pad, newline="", encoding="utf-8-sig") as f:
+        for rec in csv.DictReader(f, delimiter=";"):
+            yield {k.strip() if k else k: (v.strip() or None) if isinstance(v, str) else v
+                   for k, v in rec.items()}
 
 def parse_date(d):
     if not d:
         return None
+    for fmt in ("%d-%m-%Y", "%d-%m-%y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(d, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def parse_decimal(d, default=None):
+    """'34,65' → 34.65; onleesbare waarden → default."""
+    if d is None:
+        return default
+    tekst = str(d)
+    if "," in tekst:
+        tekst = tekst.replace(".", "").replace(",", ".")
     try:
-        return pd.to_datetime(d, dayfirst=True).date()
-    except Exception:
+        return float(Decimal(tekst))
+    except InvalidOperation:
+        return default
+
+JA = {"j", "ja", "y", "yes", "true", "1", "geen bezwaar"}
+NEE = {"n", "nee", "no", "false", "0", "wel bezwaar", "bezwaar", "bezwaar!"}
+
+def parse_bool(d):
+    if d is None:
         return None
+    d = d.strip().lower()
+    return True if d in JA else False if d in NEE else None
+
+def _json_waarde(v):
+    return v.isoformat() if isinstance(v, date) else v
+
+def chunks(rows, grootte: int):
+    rows = iter(rows)
+    while chunk := list(islice(rows, grootte)):
+        yield chunk
+
+def ontdubbel(rows: list, sleutel: str, dubbel: list = None) -> list:
+    """Laatste rij per sleutel wint, net als bij upserts na elkaar.
+
+    Postgres weigert een bulk-upsert die dezelfde sleutel twee keer raakt.
+    Sleutels waarvan een rij wegvalt komen in `dubbel` (als opgegeven).
+    """
+    per_sleutel = {}
+    for r in rows:
+        if per_sleutel.pop(r[sleutel], None) is not None and dubbel is not None:
+            dubbel.append(r[sleutel])
+        per_sleutel[r[sleutel]] = r
+    return list(per_sleutel.values())
+
+def bulk_upsert(tabel: str, rows, on_conflict: str, dubbel: list = None) -> int:
+    """Verstuurt de rijen als upserts van IMPORT_CHUNK rijen, IMPORT_WORKERS tegelijk.
+
+    De invoer wordt eerst in zijn geheel ontdubbeld: de chunks lopen
+    gelijktijdig, dus een sleutel in twee chunks zou anders afhangen van welke
+    upsert het laatst aankomt. Geeft het aantal verstuurde rijen terug; dubbele
+    sleutels (alleen de laatste rij gaat mee) komen in `dubbel`.
+    """
+    rows = ontdubbel(rows, on_conflict, dubbel)
+
+    def verstuur(chunk):
+        chunk = [{k: _json_waarde(v) for k, v in r.items()} for r in chunk]
+        sb.table(tabel).upsert(chunk, on_conflict=on_conflict, returning="minimal").execute()
+        return len(chunk)
+
+    verstuurd = 0
+    onderweg = set()
+    with ThreadPoolExecutor(max_workers=IMPORT_WORKERS) as pool:
+        for chunk in chunks(rows, IMPORT_CHUNK):
+            if len(onderweg) >= 2 * IMPORT_WORKERS:
+                klaar, onderweg = wait(onderweg, return_when=FIRST_COMPLETED)
+                verstuurd += sum(f.result() for f in klaar)
+            onderweg.add(pool.submit(verstuur, chunk))
+        verstuurd += sum(f.result() for f in onderweg)
+    return verstuurd
+
+# ---------- DELTA ----------
+def fingerprint(row: dict) -> str:
+    data = json.dumps({k: _json_waarde(v) for k, v in row.items()}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+def laad_snapshot() -> dict:
+    if not IMPORT_SNAPSHOT.exists():
+        return {}
+    with open(IMPORT_SNAPSHOT, encoding="utf-8") as f:
+        return json.load(f)
+
+def bewaar_snapshot(snapshot: dict) -> None:
+    IMPORT_SNAPSHOT.parent.mkdir(parents=True, exist_ok=True)
+    tmp = IMPORT_SNAPSHOT.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp, IMPORT_SNAPSHOT)
+
+def bepaal_delta(rows, sleutel: str, vorige: dict):
+    """Vergelijkt de rijen met de vorige fingerprints.
+
+    Geeft (te_versturen, diff, fingerprints) terug; alleen nieuwe en
+    gewijzigde rijen worden bewaard om te versturen.
+    """
+    fingerprints = {}
+    te_versturen = []
+    diff = {"nieuw": [], "gewijzigd": [], "ongewijzigd": 0}
+    for row in rows:
+        key = row[sleutel]
+        fp = fingerprints[key] = fingerprint(row)
+        if key not in vorige:
+            diff["nieuw"].append(key)
+            te_versturen.append(row)
+        elif vorige[key] != fp:
+            diff["gewijzigd"].append(key)
+            te_versturen.append(row)
+        else:
+            diff["ongewijzigd"] += 1
+    diff["verdwenen"] = sorted(set(vorige) - set(fingerprints))
+    return te_versturen, diff, fingerprints
+
+def toon_diff(tabel: str, diff: dict, max_keys: int = 20) -> None:
+    print(f"{tabel}: {len(diff['nieuw'])} nieuw, {len(diff['gewijzigd'])} gewijzigd, "
+          f"{diff['ongewijzigd']} ongewijzigd, {len(diff['verdwenen'])} niet meer in CSV")
+    for soort in ("nieuw", "gewijzigd", "verdwenen"):
+        if diff[soort]:
+            keys = ", ".join(map(str, diff[soort][:max_keys]))
+            meer = f" … (+{len(diff[soort]) - max_keys})" if len(diff[soort]) > max_keys else ""
+            print(f"  {soort}: {keys}{meer}")
+
+def importeer_delta(tabel: str, rows, sleutel: str, dry_run: bool = False, dubbel: list = None) -> int:
+    """Upsert alleen nieuwe/gewijzigde rijen en werkt daarna de snapshot bij.
+
+    Regels die uit de CSV verdwenen zijn worden gemeld, niet verwijderd.
+    """
+    snapshot = laad_snapshot()
+    rows = ontdubbel(rows, sleutel, dubbel)
+    te_versturen, diff, fingerprints = bepaal_delta(rows, sleutel, snapshot.get(tabel, {}))
+    toon_diff(tabel, diff)
+    if dry_run:
+        return 0
+    aantal = bulk_upsert(tabel, te_versturen, on_conflict=sleutel)
+    snapshot[tabel] = fingerprints
+    bewaar_snapshot(snapshot)
+    return aantal
 
 # ---------- TARIEVEN ----------
-def import_tarieven():
+def tarief_rij(rec: dict):
+    if not rec.get("item"):
+        return None
+    return {
+        "item": rec.get("item"),
+        "bedrag": parse_decimal(rec.get("bedrag"), 0.0),
+        "btw_incl_pct": parse_decimal(rec.get("BTW (incl) in %"), 0.0),
+        "omschrijving_op_factuur": rec.get("omschrijving op factuur"),
+    }
+
+def import_tarieven(delta: bool = False, dry_run: bool = False):
     print("Importeren tarieven...")
-    df = pd.read_csv(TARIEVEN_CSV, delimiter=";", decimal=",")
-    records = df_to_records(df)
-
-    for rec in records:
-        row = {
-            "item": rec.get("item"),
-            "bedrag": float(rec.get("bedrag", 0)),
-            "btw_incl_pct": float(rec.get("BTW (incl) in %", 0)),
-            "omschrijving_op_factuur": rec.get("omschrijving op factuur"),
-        }
-        sb.table("tarieven").upsert(row).execute()
-    print("✅ Tarieven geïmporteerd")
+    overgeslagen, dubbel = [], []
 
-# ---------- CLIENTEN ----------
-def import_clienten():
-    print("Importeren clienten...")
+    def rows():
+        for regelnr, rec in enumerate(lees_csv(TARIEVEN_CSV), start=2):
+            row = tarief_rij(rec)
+            if row is None:
+                overgeslagen.append(regelnr)
+                continue
+            yield row
 
-    resp = sb.table("clienten").select("klant_id").execute()
-    bestaande_ids = {int(r["klant_id"]) for r in resp.data if str(r["klant_id"]).isdigit()}
-    max_id = max(bestaande_ids, default=0)
-    nieuw_id = max_id + 1
+    if delta or dry_run:
+        aantal = importeer_delta("tarieven", rows(), "item", dry_run, dubbel)
+    else:
+        aantal = bulk_upsert("tarieven", rows(), on_conflict="item", dubbel=dubbel)
+    if overgeslagen:
+        print(f"⚠️  {len(overgeslagen)} regels zonder item overgeslagen: {overgeslagen}")
+    if dubbel:
+        print(f"⚠️  {len(dubbel)} dubbele items, alleen de laatste regel telt: {sorted(set(dubbel))}")
+    print(f"✅ {aantal} tarieven geïmporteerd")
 
-    df = pd.read_csv(CLIENTEN_CSV, delimiter=";", decimal=",")
-    records = df_to_records(df)
+# ---------- CLIENTEN ----------
+def client_rij(rec: dict):
+    if not rec.get("naam client"):
+        return None
+    return {
+        "naam_client": rec.get("naam client"),
+        "straatnaam": rec.get("Straatnaam"),
+        "postcode": rec.get("Postcode"),
+        "woonplaats": rec.get("Woonplaats"),
+        "land": rec.get("Land") or "Nederland",
+        "telefoonnr": rec.get("Telefoonnr."),
+        "geboorte_datum": parse_date(rec.get("Geb.datum")),
+        "bsn_nr": rec.get("BSN.nr."),
+        "verzekeraar": rec.get("verzekeraar"),
+        "polis_nr": rec.get("polis.nr."),
+        "standaard_tarief": parse_decimal(rec.get("standaard-tarief")),
+        "aanhef": rec.get("aanhef"),
+        "klant_id": rec.get("Klant-ID"),
+        "emailadres": rec.get("Emailadres"),
+        "taal": rec.get("taal") or "NL",
+        "intake_datum": parse_date(rec.get("intake-datum")),
+        "laatste_factuurnr": rec.get("laatste factuurnr"),
+        "product": rec.get("product"),
+        "specifiek": rec.get("specifiek"),
+        "praktijknaam": rec.get("Praktijknaam"),
+        "huisarts": rec.get("Huisarts"),
+        "huisarts_adres": rec.get("adres"),
+        "huisarts_postcode": rec.get("postcode"),
+        "huisarts_woonplaats": rec.get("woonplaats"),
+        "huisarts_tel_nr": rec.get("huisarts tel.nr."),
+        "huisarts_email": rec.get("huisarts Email"),
+        "hoe_terecht_gekomen": rec.get("hoe terecht gekomen?"),
+        "inlichten_jn": parse_bool(rec.get("inlichten J/N")),
+        "nieuwsbrief": parse_bool(rec.get("Nieuwsbrief")) or False,
+    }
 
-    for rec in records:
-        raw_klant_id = rec.get("Klant-ID")
+def _clienten_rows(snapshot: dict, overgeslagen: list, hernummerd: list):
+    """Clientregels voor de import (volledig en delta).
 
-        # 1. Zorg dat we een string hebben voor de check
-        str_id = str(raw_klant_id) if raw_klant_id is not None else ""
-        if not str_id or (str_id.isdigit() and int(str_id) in bestaande_ids):
-            rec["Klant-ID"] = str(nieuw_id)
+    De CSV is leidend: een bekend klant_id is dezelfde client (update), ook als
+    het al in de database staat. Regels zonder (of met een al eerder in de CSV
+    gebruikt) klant_id krijgen een nieuw id, dat per naam in de snapshot wordt
+    onthouden zodat het bij een volgende run gelijk blijft. Alleen als zo'n
+    nieuw id nodig is, worden de klant_id's uit de database opgehaald.
+    Hernummerde regels komen als (regelnr, naam, oud id, nieuw id) in `hernummerd`.
+    """
+    toegewezen = snapshot.get("clienten_toegewezen", {})
+    rows, zonder_id = [], []
+    gezien = set()
+    volgnummers = {}
+    for regelnr, rec in enumerate(lees_csv(CLIENTEN_CSV), start=2):
+        oud_id = rec.get("Klant-ID")
+        # leeg of dubbel klant_id in de CSV: (eerder toegewezen) eigen id gebruiken,
+        # per naam genummerd zodat ook dubbele regels met dezelfde naam apart blijven
+        if not oud_id or oud_id in gezien:
+            naam = normaliseer(rec.get("naam client"))
+            volgnummers[naam] = volgnummers.get(naam, 0) + 1
+            rec["_toewijzing"] = f"{naam}#{volgnummers[naam]}"
+            rec["Klant-ID"] = toegewezen.get(rec["_toewijzing"])
+        row = client_rij(rec)
+        if row is None:
+            overgeslagen.append(regelnr)
+            continue
+        if row["klant_id"] is None or row["klant_id"] != oud_id:
+            hernummerd.append([regelnr, row["naam_client"], oud_id, row["klant_id"]])
+        if row["klant_id"] is None:
+            zonder_id.append((rec["_toewijzing"], row, hernummerd[-1]))
+        else:
+            gezien.add(row["klant_id"])
+            rows.append(row)
+
+    if zonder_id:
+        ids = gezien | set(snapshot.get("clienten", {})) | set(toegewezen.values())
+        ids |= {r["klant_id"] for r in lees_tabel(sb, "clienten", "klant_id")}
+        nieuw_id = max((int(i) for i in ids if str(i).isdigit()), default=0) + 1
+        for toewijzing, row, melding in zonder_id:
+            row["klant_id"] = melding[3] = str(nieuw_id)
+            toegewezen[toewijzing] = row["klant_id"]
             nieuw_id += 1
-            bestaande_ids.add(int(rec["Klant-ID"]))
-
-        row = {
-            "naam_client": rec.get("naam client"),
-            "straatnaam": rec.get("Straatnaam"),
-            "postcode": rec.get("Postcode"),
-            "woonplaats": rec.get("Woonplaats"),
-            "land": rec.get("Land") or "Nederland",
-            "telefoonnr": rec.get("Telefoonnr."),
-            "geboorte_datum": rec.get("Geb.datum"),
-            "bsn_nr": rec.get("BSN.nr."),
-            "verzekeraar": rec.get("verzekeraar"),
-            "polis_nr": rec.get("polis.nr."),
-            "standaard_tarief": rec.get("standaard-tarief"),
-            "aanhef": rec.get("aanhef"),
-            "klant_id": rec.get("Klant-ID"),
-            "emailadres": rec.get("Emailadres"),
-            "taal": rec.get("taal") or "NL",
-            "intake_datum": rec.get("intake-datum"),
-            "laatste_factuurnr": rec.get("laatste factuurnr"),
-            "product": rec.get("product"),
-            "specifiek": rec.get("specifiek"),
-            "praktijknaam": rec.get("Praktijknaam"),
-            "huisarts": rec.get("Huisarts "),
-            "huisarts_adres": rec.get("adres"),
-            "huisarts_postcode": rec.get("postcode.1"),
-            "huisarts_woonplaats": rec.get("woonplaats.1"),
-            "huisarts_tel_nr": rec.get("huisarts tel.nr."),
-            "huisarts_email": rec.get("huisarts Email"),
-            "hoe_terecht_gekomen": rec.get("hoe terecht gekomen?"),
-            "inlichten_jn": rec.get("inlichten J/N"),
-            "nieuwsbrief": rec.get("Nieuwsbrief"),
-        }
-        sb.table("clienten").upsert(row).execute()
-    print("✅ Clienten geïmporteerd (dubbele klant_id’s automatisch vervangen)")
+            rows.append(row)
+    snapshot["clienten_toegewezen"] = toegewezen
+    return rows
+
+def import_clienten(delta: bool = False, dry_run: bool = False):
+    print("Importeren clienten...")
+    overgeslagen, hernummerd = [], []
+    snapshot = laad_snapshot()
+    rows = _clienten_rows(snapshot, overgeslagen, hernummerd)
+
+    if delta or dry_run:
+        if not dry_run:
+            bewaar_snapshot(snapshot)
+        aantal = importeer_delta("clienten", rows, "klant_id", dry_run)
+    else:
+        aantal = bulk_upsert("clienten", rows, on_conflict="klant_id")
+        # de database is nu gelijk aan de CSV: een volgende --delta begint hier
+        snapshot["clienten"] = {r["klant_id"]: fingerprint(r) for r in rows}
+        bewaar_snapshot(snapshot)
+
+    if overgeslagen:
+        print(f"⚠️  {len(overgeslagen)} regels zonder naam overgeslagen: {overgeslagen}")
+    if hernummerd:
+        print(f"⚠️  {len(hernummerd)} regels met een leeg of dubbel klant_id kregen een eigen id:")
+        for regelnr, naam, oud_id, nieuw_id in hernummerd:
+            print(f"  regel {regelnr} ({naam}): {oud_id or '(leeg)'} → {nieuw_id}")
+    print(f"✅ {aantal} clienten {'verstuurd' if delta or dry_run else 'geïmporteerd'}")
 
 # ---------- MAIN ----------
 if __name__ == "__main__":
-    #import_tarieven()
-    import_clienten()
-    print("🎉 Klaar – alle data staat in Supabase!")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delta", action="store_true", help="alleen nieuwe/gewijzigde regels versturen")
+    parser.add_argument("--dry-run", action="store_true", help="alleen het verschil tonen, niets versturen")
+    parser.add_argument("--tarieven", action="store_true", help="ook tarieven.csv importeren")
+    args = parser.parse_args()
+
+    if args.tarieven:
+        import_tarieven(args.delta, args.dry_run)
+    import_clienten(args.delta, args.dry_run)
+    print("🎉 Klaar – alle data staat in Supabase!" if not args.dry_run else "Dry-run: niets verstuurd")
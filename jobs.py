@@ -0,0 +1,164 @@
+# jobs.py
+"""
+Eenvoudige job-runner voor lange batches (facturen, overzicht).
+De route zet een job klaar en krijgt direct een job-id terug; de batch draait
+in een achtergrond-thread. Status en voortgang staan in een SQLite-bestand,
+zodat elke gunicorn-worker ze kan opvragen zonder externe services.
+
+Over alle workers heen lopen hoogstens JOB_WORKERS jobs tegelijk: een job gaat
+pas op "bezig" binnen een BEGIN IMMEDIATE-transactie op dat bestand. Elke
+worker geeft voor zijn eigen jobs een hartslag; jobs zonder hartslag (worker
+herstart of gestopt) worden na JOB_VERLOPEN seconden op "mislukt" gezet.
+"""
+
+import os
+import json
+import sqlite3
+import uuid
+import time
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# ---------- CONFIG ----------
+JOBS_DB = os.getenv("JOBS_DB", "output/jobs.sqlite3")
+# 1 = batches lopen na elkaar, nooit twee factuurruns tegelijk (ook niet over gunicorn-workers heen)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+JOB_HARTSLAG = int(os.getenv("JOB_HARTSLAG", "10"))    # seconden tussen hartslagen
+JOB_VERLOPEN = int(os.getenv("JOB_VERLOPEN", "60"))    # zonder hartslag daarna = worker weg
+JOB_WACHT = 1.0                                        # seconden tussen pogingen om te starten
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+_lock = threading.Lock()
+_eigen_jobs = set()     # wachtende/lopende jobs van dit proces
+_hartslag_thread = None
+
+# ---------- OPSLAG ----------
+def _connect():
+    os.makedirs(os.path.dirname(JOBS_DB) or ".", exist_ok=True)
+    con = sqlite3.connect(JOBS_DB, timeout=10)
+    con.row_factory = sqlite3.Row
+    con.execute("""
+        create table if not exists jobs (
+            id text primary key,
+            soort text,
+            status text,
+            gedaan integer default 0,
+            totaal integer default 0,
+            resultaat text,
+            fout text,
+            aangemaakt text,
+            bijgewerkt text
+        )
+    """)
+    return con
+
+def _nu(seconden_terug: int = 0) -> str:
+    return (datetime.now() - timedelta(seconds=seconden_terug)).isoformat(timespec="seconds")
+
+def _update(job_id: str, **velden):
+    velden["bijgewerkt"] = _nu()
+    kolommen = ", ".join(f"{k} = ?" for k in velden)
+    with closing(_connect()) as con, con:
+        con.execute(f"update jobs set {kolommen} where id = ?", [*velden.values(), job_id])
+
+def _ruim_op(con):
+    """Wachtende/lopende jobs zonder recente hartslag: hun worker is weg."""
+    con.execute("update jobs set status = 'mislukt', fout = ?, bijgewerkt = ? "
+                "where status in ('wachtend', 'bezig') and bijgewerkt < ?",
+                (f"geen hartslag meer na {JOB_VERLOPEN}s (worker herstart of gestopt)", _nu(), _nu(JOB_VERLOPEN)))
+
+def job_status(job_id: str):
+    """Status van een job als dict, of None als de job niet bestaat."""
+    with closing(_connect()) as con, con:
+        _ruim_op(con)
+        row = con.execute("select * from jobs where id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    job["resultaat"] = json.loads(job["resultaat"]) if job["resultaat"] else None
+    return job
+
+# ---------- HARTSLAG EN STARTEN ----------
+def _hartslag():
+    while True:
+        time.sleep(JOB_HARTSLAG)
+        with _lock:
+            ids = list(_eigen_jobs)
+        if ids:
+            with closing(_connect()) as con, con:
+                con.execute(f"update jobs set bijgewerkt = ? where status in ('wachtend', 'bezig') "
+                            f"and id in ({', '.join('?' * len(ids))})", [_nu(), *ids])
+
+def _start_hartslag():
+    global _hartslag_thread
+    with _lock:
+        if _hartslag_thread is None:
+            _hartslag_thread = threading.Thread(target=_hartslag, name="job-hartslag", daemon=True)
+            _hartslag_thread.start()
+
+def _claim(job_id: str):
+    """Zet de job op "bezig" als er (over alle workers) minder dan JOB_WORKERS lopen.
+
+    True = gestart, False = nog wachten, None = de job wacht niet meer (opgeruimd).
+    """
+    with closing(_connect()) as con:
+        con.isolation_level = None
+        con.execute("begin immediate")
+        try:
+            _ruim_op(con)
+            bezig = con.execute("select count(*) from jobs where status = 'bezig'").fetchone()[0]
+            if bezig >= JOB_WORKERS:
+                return False
+            cur = con.execute("update jobs set status = 'bezig', bijgewerkt = ? where id = ? and status = 'wachtend'",
+                              (_nu(), job_id))
+            return True if cur.rowcount else None
+        finally:
+            con.execute("commit")
+
+# ---------- UITVOEREN ----------
+def _run(job_id: str, soort: str, functie, kwargs: dict):
+    try:
+        while (gestart := _claim(job_id)) is False:
+            time.sleep(JOB_WACHT)
+        if gestart:
+            _voer_uit(job_id, soort, functie, kwargs)
+    finally:
+        with _lock:
+            _eigen_jobs.discard(job_id)
+
+def _voer_uit(job_id: str, soort: str, functie, kwargs: dict):
+    def voortgang(gedaan: int, totaal: int):
+        _update(job_id, gedaan=gedaan, totaal=totaal)
+
+    start = time.perf_counter()
+    with metrics.scope(f"job:{soort}") as s:
+        try:
+            resultaat = functie(voortgang=voortgang, **kwargs)
+        except Exception as e:
+            metrics.observeer("job_duration_seconds", time.perf_counter() - start, soort=soort, status="mislukt")
+            _update(job_id, status="mislukt", fout=f"{type(e).__name__}: {e}")
+            return
+    metrics.observeer("job_duration_seconds", time.perf_counter() - start, soort=soort, status="klaar")
+    if isinstance(resultaat, dict):
+        resultaat["metrics"] = {"queries": s.queries, "db_seconden": round(s.db_tijd, 3),
+                                "pdf_seconden": round(s.pdf_tijd, 3), "n_plus_one": s.n_plus_one}
+    _update(job_id, status="klaar", resultaat=json.dumps(resultaat, default=str))
+
+def start_job(soort: str, functie, **kwargs) -> str:
+    """Zet `functie(voortgang=..., **kwargs)` in de wachtrij en geeft het job-id terug."""
+    job_id = uuid.uuid4().hex
+    nu = _nu()
+    with closing(_connect()) as con, con:
+        con.execute(
+            "insert into jobs (id, soort, status, aangemaakt, bijgewerkt) values (?, ?, ?, ?, ?)",
+            (job_id, soort, "wachtend", nu, nu)
+        )
+    with _lock:
+        _eigen_jobs.add(job_id)
+    _start_hartslag()
+    _executor.submit(_run, job_id, soort, functie, kwargs)
+    return job_id
@@ -0,0 +1,255 @@
+# mailer.py
+"""
+Versturen van facturen per e-mail.
+Een kleine pool van blijvende SMTP-verbindingen wordt door meerdere threads
+tegelijk gebruikt, met een rate limit (berichten per minuut) zodat de
+provider ons niet afknijpt. Tijdelijke fouten (verbinding weg, 4xx) gaan in
+een retry-rij en worden na een oplopende wachttijd opnieuw geprobeerd;
+permanente fouten (5xx, geen adres) niet. Per bericht komt er een status terug.
+Server, poort en TLS komen uit de omgeving, zodat er lokaal tegen een
+SMTP-stand-in (bijv. `python -m aiosmtpd -n -l localhost:8025`) getest kan worden.
+"""
+
+import os
+import time
+import queue
+import smtplib
+import threading
+import mimetypes
+from email.message import EmailMessage
+from concurrent.futures import ThreadPoolExecutor
+
+# ---------- CONFIG ----------
+MAIL_VERSTUREN = os.getenv("MAIL_VERSTUREN", "0") == "1"
+MAIL_SERVER = os.getenv("MAIL_SERVER", "smtp.gmail.com")
+MAIL_PORT = int(os.getenv("MAIL_PORT", "587"))
+MAIL_USE_TLS = os.getenv("MAIL_USE_TLS", "1") == "1"
+MAIL_USERNAME = os.getenv("MAIL_USER")
+MAIL_PASSWORD = os.getenv("MAIL_PASS")
+MAIL_DEFAULT_SENDER = os.getenv("MAIL_SENDER") or MAIL_USERNAME
+MAIL_TIMEOUT = int(os.getenv("MAIL_TIMEOUT", "30"))
+
+MAIL_VERBINDINGEN = int(os.getenv("MAIL_VERBINDINGEN", "3"))       # SMTP-verbindingen in de pool
+MAIL_PER_MINUUT = int(os.getenv("MAIL_PER_MINUUT", "60"))          # rate limit over alle verbindingen
+MAIL_MAX_POGINGEN = int(os.getenv("MAIL_MAX_POGINGEN", "4"))
+MAIL_RETRY_WACHT = float(os.getenv("MAIL_RETRY_WACHT", "5"))       # seconden, verdubbelt per poging
+MAIL_MAX_BERICHTEN = int(os.getenv("MAIL_MAX_BERICHTEN", "100"))   # per verbinding, daarna nieuwe
+
+# statussen per bericht
+VERZONDEN = "verzonden"
+MISLUKT = "mislukt"
+OVERGESLAGEN = "overgeslagen"
+
+# ---------- RATE LIMIT ----------
+class RateLimiter:
+    """Token bucket: gemiddeld per_minuut berichten, kleine pieken toegestaan."""
+
+    def __init__(self, per_minuut: int, piek: int = None):
+        self.per_seconde = per_minuut / 60
+        self.capaciteit = piek or max(1, min(per_minuut, MAIL_VERBINDINGEN))
+        self.tokens = self.capaciteit
+        self.bijgewerkt = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wacht(self):
+        while True:
+            with self.lock:
+                nu = time.monotonic()
+                self.tokens = min(self.capaciteit, self.tokens + (nu - self.bijgewerkt) * self.per_seconde)
+                self.bijgewerkt = nu
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                tekort = (1 - self.tokens) / self.per_seconde
+            time.sleep(tekort)
+
+# ---------- VERBINDINGEN ----------
+class SMTPPool:
+    """Pool van blijvende, ingelogde SMTP-verbindingen (lui opgebouwd)."""
+
+    def __init__(self, grootte: int = None, server: str = None, poort: int = None,
+                 tls: bool = None, gebruiker: str = None, wachtwoord: str = None):
+        self.grootte = grootte or MAIL_VERBINDINGEN
+        self.server = server or MAIL_SERVER
+        self.poort = poort or MAIL_PORT
+        self.tls = MAIL_USE_TLS if tls is None else tls
+        self.gebruiker = MAIL_USERNAME if gebruiker is None else gebruiker
+        self.wachtwoord = MAIL_PASSWORD if wachtwoord is None else wachtwoord
+        self._vrij = queue.LifoQueue()
+        self._aangemaakt = 0
+        self._lock = threading.Lock()
+
+    def _verbind(self):
+        smtp = smtplib.SMTP(self.server, self.poort, timeout=MAIL_TIMEOUT)
+        smtp.ehlo()
+        if self.tls:
+            smtp.starttls()
+            smtp.ehlo()
+        if self.gebruiker:
+            smtp.login(self.gebruiker, self.wachtwoord)
+        smtp.verstuurd = 0
+        return smtp
+
+    def pak(self):
+        while True:
+            try:
+                return self._vrij.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                nieuw = self._aangemaakt < self.grootte
+                if nieuw:
+                    self._aangemaakt += 1
+            if nieuw:
+                break
+            # alles in gebruik: wachten op een vrije, of tot er een gesloten is
+            try:
+                return self._vrij.get(timeout=1)
+            except queue.Empty:
+                continue
+        try:
+            return self._verbind()
+        except Exception:
+            with self._lock:
+                self._aangemaakt -= 1
+            raise
+
+    def terug(self, smtp, kapot: bool = False):
+        if kapot or smtp.verstuurd >= MAIL_MAX_BERICHTEN:
+            self._sluit(smtp)
+            with self._lock:
+                self._aangemaakt -= 1
+            return
+        self._vrij.put(smtp)
+
+    def _sluit(self, smtp):
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def sluit_alles(self):
+        while True:
+            try:
+                smtp = self._vrij.get_nowait()
+            except queue.Empty:
+                break
+            self._sluit(smtp)
+            with self._lock:
+                self._aangemaakt -= 1
+
+# ---------- BERICHTEN ----------
+def maak_bericht(naar: str, onderwerp: str, tekst: str, bijlage: str = None) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = MAIL_DEFAULT_SENDER
+    msg["To"] = naar
+    msg["Subject"] = onderwerp
+    msg.set_content(tekst)
+    if bijlage:
+        soort, _ = mimetypes.guess_type(bijlage)
+        hoofd, sub = (soort or "application/octet-stream").split("/", 1)
+        with open(bijlage, "rb") as f:
+            msg.add_attachment(f.read(), maintype=hoofd, subtype=sub, filename=os.path.basename(bijlage))
+    return msg
+
+def _is_tijdelijk(fout: Exception) -> bool:
+    """Verbindingsfouten en 4xx-antwoorden zijn het opnieuw proberen waard."""
+    if isinstance(fout, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in fout.recipients.values())
+    if isinstance(fout, smtplib.SMTPResponseException):
+        return 400 <= fout.smtp_code < 500
+    return isinstance(fout, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError))
+
+# ---------- VERSTUREN ----------
+def _verstuur_een(pool: SMTPPool, limiet: RateLimiter, msg: EmailMessage):
+    """Verstuurt één bericht; geeft None of de fout terug."""
+    try:
+        smtp = pool.pak()
+    except Exception as e:
+        return e
+    limiet.wacht()
+    try:
+        smtp.send_message(msg)
+    except smtplib.SMTPRecipientsRefused as e:
+        # verbinding is nog goed, alleen dit adres niet
+        pool.terug(smtp)
+        return e
+    except Exception as e:
+        pool.terug(smtp, kapot=not isinstance(e, smtplib.SMTPResponseException))
+        return e
+    smtp.verstuurd += 1
+    pool.terug(smtp)
+    return None
+
+def verstuur(berichten: dict, voortgang=None, pool: SMTPPool = None, per_minuut: int = None) -> dict:
+    """Verstuurt {sleutel: EmailMessage} tegelijk over de pool.
+
+    Geeft per sleutel {"status", "pogingen", "fout"} terug. Berichten met een
+    tijdelijke fout gaan in de retry-rij en worden na MAIL_RETRY_WACHT
+    (daarna steeds het dubbele) seconden opnieuw geprobeerd, tot
+    MAIL_MAX_POGINGEN.
+    """
+    eigen_pool = pool is None
+    pool = pool or SMTPPool()
+    limiet = RateLimiter(per_minuut or MAIL_PER_MINUUT)
+    status = {k: {"status": MISLUKT, "pogingen": 0, "fout": None} for k in berichten}
+    rij = list(berichten)
+    gedaan = 0
+    wacht = MAIL_RETRY_WACHT
+
+    try:
+        with ThreadPoolExecutor(max_workers=pool.grootte) as executor:
+            while rij:
+                fouten = executor.map(lambda k: _verstuur_een(pool, limiet, berichten[k]), rij)
+                opnieuw = []
+                for sleutel, fout in zip(rij, fouten):
+                    s = status[sleutel]
+                    s["pogingen"] += 1
+                    if fout is None:
+                        s.update(status=VERZONDEN, fout=None)
+                    elif _is_tijdelijk(fout) and s["pogingen"] < MAIL_MAX_POGINGEN:
+                        s["fout"] = str(fout)
+                        opnieuw.append(sleutel)
+                        continue
+                    else:
+                        s.update(status=MISLUKT, fout=str(fout))
+                    gedaan += 1
+                    if voortgang:
+                        voortgang(gedaan, len(berichten))
+                rij = opnieuw
+                if rij:
+                    print(f"{len(rij)} e-mails opnieuw proberen over {wacht:g}s")
+                    time.sleep(wacht)
+                    wacht *= 2
+    finally:
+        if eigen_pool:
+            pool.sluit_alles()
+    return status
+
+def verstuur_facturen(facturen: list, tekst, voortgang=None, pool: SMTPPool = None) -> list:
+    """Mailt elke factuur ({naam, factuurnummer, email, pdf_path}) als PDF-bijlage.
+
+    `tekst(factuur)` levert de berichttekst. Geeft de facturen terug met per
+    factuur mail_status, mail_pogingen en mail_fout.
+    """
+    berichten, resultaat = {}, []
+    for f in facturen:
+        r = dict(f, mail_status=OVERGESLAGEN, mail_pogingen=0, mail_fout=None)
+        resultaat.append(r)
+        if not MAIL_VERSTUREN:
+            r["mail_fout"] = "MAIL_VERSTUREN staat uit"
+        elif not (f.get("email") or "").strip():
+            r["mail_fout"] = "geen e-mailadres"
+        else:
+            berichten[f["factuurnummer"]] = maak_bericht(
+                f["email"].strip(), f"Factuur {f['factuurnummer']}", tekst(f), f["pdf_path"])
+
+    if berichten:
+        status = verstuur(berichten, voortgang, pool)
+        for r in resultaat:
+            s = status.get(r["factuurnummer"])
+            if s:
+                r.update(mail_status=s["status"], mail_pogingen=s["pogingen"], mail_fout=s["fout"])
+        verzonden = sum(s["status"] == VERZONDEN for s in status.values())
+        print(f"E-mail: {verzonden} van {len(berichten)} facturen verzonden")
+    return resultaat
@@ -0,0 +1,171 @@
+# metrics.py
+"""
+Instrumentatie: route-latency, queries per tabel, PDF-rendertijden, jobs.
+Alles wordt in het geheugen van het proces bijgehouden en via /metrics in
+het Prometheus-tekstformaat geëxporteerd (per gunicorn-worker).
+Queries worden per scope (één request of één job) gegroepeerd op hun vorm
+(methode, tabel, filterkolommen; zonder waarden). Komt dezelfde vorm vaker
+dan METRICS_N1_DREMPEL keer voor, dan is dat vrijwel altijd een N+1-patroon:
+dat wordt gelogd, geteld en in de timing-headers gemeld.
+"""
+
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from collections import Counter
+
+# ---------- CONFIG ----------
+METRICS_N1_DREMPEL = int(os.getenv("METRICS_N1_DREMPEL", "20"))
+METRICS_HEADERS = os.getenv("METRICS_HEADERS", "0") == "1"   # Server-Timing e.d. op elke response
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+BESCHRIJVINGEN = {
+    "http_request_duration_seconds": ("histogram", "Duur van HTTP-requests per route"),
+    "db_query_duration_seconds": ("histogram", "Duur van PostgREST-queries per tabel en operatie"),
+    "db_queries_total": ("counter", "Aantal PostgREST-queries per tabel en operatie"),
+    "db_rows_total": ("counter", "Aantal gelezen rijen per tabel"),
+    "pdf_render_duration_seconds": ("histogram", "Duur van één PDF-render (WeasyPrint)"),
+    "job_duration_seconds": ("histogram", "Duur van achtergrond-jobs"),
+    "n_plus_one_total": ("counter", "Scopes waarin één query-vorm vaker dan de drempel herhaald werd"),
+}
+
+_lock = threading.Lock()
+_tellers = {}       # (naam, labels) -> waarde
+_histogrammen = {}  # (naam, labels) -> [aantal per bucket..., som, aantal]
+_collectors = []    # functies die extra (naam, labels, waarde)-gauges leveren
+
+_scope = contextvars.ContextVar("metrics_scope", default=None)
+
+# ---------- REGISTRY ----------
+def _sleutel(naam: str, labels: dict):
+    return naam, tuple(sorted(labels.items()))
+
+def tel(naam: str, waarde: float = 1, **labels):
+    with _lock:
+        k = _sleutel(naam, labels)
+        _tellers[k] = _tellers.get(k, 0) + waarde
+
+def observeer(naam: str, seconden: float, **labels):
+    with _lock:
+        h = _histogrammen.setdefault(_sleutel(naam, labels), [0] * (len(BUCKETS) + 2))
+        for i, grens in enumerate(BUCKETS):
+            if seconden <= grens:
+                h[i] += 1
+        h[-2] += seconden
+        h[-1] += 1
+
+def registreer_collector(functie):
+    """functie() → iterable van (naam, labels-dict, waarde), bij elke export opgevraagd."""
+    _collectors.append(functie)
+
+# ---------- SCOPES ----------
+class Scope:
+    def __init__(self, naam: str):
+        self.naam = naam
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_tijd = 0.0
+        self.pdf_tijd = 0.0
+        self.vormen = Counter()
+        self.n_plus_one = []
+
+def start_scope(naam: str):
+    """Begint een scope (request/job); geeft (scope, token) voor einde_scope."""
+    s = Scope(naam)
+    return s, _scope.set(s)
+
+def einde_scope(token):
+    _scope.reset(token)
+
+def huidige_scope():
+    return _scope.get()
+
+@contextmanager
+def scope(naam: str):
+    s, token = start_scope(naam)
+    try:
+        yield s
+    finally:
+        einde_scope(token)
+
+# ---------- METEN ----------
+def query(tabel: str, operatie: str, vorm: str, seconden: float, rijen: int = None):
+    """Eén PostgREST-query; aangeroepen vanuit de HTTP-laag (dbpool)."""
+    tel("db_queries_total", tabel=tabel, operatie=operatie)
+    observeer("db_query_duration_seconds", seconden, tabel=tabel, operatie=operatie)
+    if rijen:
+        tel("db_rows_total", rijen, tabel=tabel)
+    s = _scope.get()
+    if s is None:
+        return
+    s.queries += 1
+    s.db_tijd += seconden
+    s.vormen[vorm] += 1
+    if s.vormen[vorm] == METRICS_N1_DREMPEL + 1:
+        s.n_plus_one.append(vorm)
+        tel("n_plus_one_total", scope=s.naam)
+        print(f"⚠️  N+1 in {s.naam}: '{vorm}' al {METRICS_N1_DREMPEL + 1}x herhaald")
+
+def pdf_render(seconden: float):
+    observeer("pdf_render_duration_seconds", seconden)
+    s = _scope.get()
+    if s is not None:
+        s.pdf_tijd += seconden
+
+def timing_headers(s: Scope) -> dict:
+    """Server-Timing en query-telling voor één request."""
+    totaal = (time.perf_counter() - s.start) * 1000
+    headers = {
+        "Server-Timing": f'app;dur={totaal:.1f}, db;dur={s.db_tijd * 1000:.1f};desc="{s.queries} queries"',
+        "X-Query-Count": str(s.queries),
+    }
+    if s.pdf_tijd:
+        headers["Server-Timing"] += f", pdf;dur={s.pdf_tijd * 1000:.1f}"
+    if s.n_plus_one:
+        headers["X-N-Plus-One"] = "; ".join(s.n_plus_one)
+    return headers
+
+# ---------- EXPORT ----------
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    delen = []
+    for k, v in labels:
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+        delen.append(f'{k}="{v}"')
+    return "{" + ",".join(delen) + "}"
+
+def exporteer() -> str:
+    """Alle metrics in het Prometheus-tekstformaat (versie 0.0.4)."""
+    with _lock:
+        tellers = dict(_tellers)
+        histogrammen = {k: list(v) for k, v in _histogrammen.items()}
+    gauges = {}
+    for collector in _collectors:
+        for naam, labels, waarde in collector():
+            gauges[_sleutel(naam, labels)] = waarde
+
+    regels, gezien = [], set()
+    def kop(naam, soort):
+        if naam not in gezien:
+            gezien.add(naam)
+            regels.append(f"# HELP {naam} {BESCHRIJVINGEN.get(naam, (soort, naam))[1]}")
+            regels.append(f"# TYPE {naam} {soort}")
+
+    for (naam, labels), waarde in sorted(tellers.items()):
+        kop(naam, "counter")
+        regels.append(f"{naam}{_labels(labels)} {waarde}")
+    for (naam, labels), h in sorted(histogrammen.items()):
+        kop(naam, "histogram")
+        for grens, aantal in zip(BUCKETS, h):
+            regels.append(f"{naam}_bucket{_labels(labels + (('le', grens),))} {aantal}")
+        regels.append(f"{naam}_bucket{_labels(labels + (('le', '+Inf'),))} {h[-1]}")
+        regels.append(f"{naam}_sum{_labels(labels)} {h[-2]:.6f}")
+        regels.append(f"{naam}_count{_labels(labels)} {h[-1]}")
+    for (naam, labels), waarde in sorted(gauges.items()):
+        kop(naam, "gauge")
+        regels.append(f"{naam}{_labels(labels)} {waarde}")
+    return "\n".join(regels) + "\n"
@@ -0,0 +1,125 @@
+# omzet.py
+"""
+Omzet ex BTW, BTW en incl. BTW per jaar, kwartaal, maand, client of
+tariefcode: voor de BTW-aangifte en de jaaromzet per client.
+De cijfers komen uit de rollup omzet_maand (zie schema.sql), die bij elke
+wijziging in overzicht door triggers bijgewerkt wordt en ook de gearchiveerde
+regels bevat; de functie omzet() telt die per gevraagde indeling op. Een
+rapport over meerdere jaren is daardoor één kleine query.
+Uitkomsten worden OMZET_TTL seconden gecachet; wijzigingen via deze worker
+(overzicht of tarieven) legen de cache meteen. Export als CSV of PDF.
+"""
+
+import os
+import io
+import csv
+import time
+import threading
+from datetime import date
+from decimal import Decimal
+
+import metrics
+from db import PAGINA_GROOTTE, als_decimal
+
+# ---------- CONFIG ----------
+OMZET_TTL = int(os.getenv("OMZET_TTL", "60"))
+# indelingen die omzet() kent
+PER = ("jaar", "kwartaal", "maand", "client", "tarief")
+# tabellen waarvan een wijziging de omzet verandert
+BRONNEN = ("overzicht", "tarieven")
+BEDRAGEN = ("totaal_ex", "totaal_btw", "totaal_inc")
+CENT = Decimal("0.01")
+
+_lock = threading.Lock()
+_cache = {}             # (per, van, tot) -> (geladen_op, rapport)
+_tellers = {"hits": 0, "misses": 0}
+
+# ---------- CACHE ----------
+def leeg():
+    with _lock:
+        _cache.clear()
+
+def bijgewerkt(tabel: str):
+    """Na een wijziging via deze worker: rapporten opnieuw ophalen."""
+    if tabel in BRONNEN:
+        leeg()
+
+def statistieken() -> dict:
+    with _lock:
+        return dict(_tellers, rapporten=len(_cache))
+
+metrics.registreer_collector(lambda: ((f"omzet_cache_{k}", {}, v) for k, v in statistieken().items()))
+
+# ---------- RAPPORT ----------
+def _bedrag(waarde) -> Decimal:
+    return als_decimal(waarde, Decimal(0)).quantize(CENT)
+
+def _lees(sb, per: str, van, tot):
+    """Alle regels van omzet(), met keyset-paginering op sleutel (max-rows van PostgREST)."""
+    laatste = None
+    while True:
+        rows = sb.rpc("omzet", {"per": per, "van": van, "tot": tot, "na": laatste,
+                                "aantal_max": PAGINA_GROOTTE}).execute().data
+        yield from rows
+        if len(rows) < PAGINA_GROOTTE:
+            break
+        laatste = rows[-1]["sleutel"]
+
+def rapport(sb, per: str = "kwartaal", van: str = None, tot: str = None) -> dict:
+    """Omzet over [van, tot] (ISO-datums, op hele maanden; leeg = alles), ingedeeld per `per`.
+
+    Geeft {"per", "van", "tot", "regels", "totaal"}; elke regel heeft sleutel
+    (bv. "2025-K1", een naam of een tariefcode), aantal en de drie bedragen
+    als Decimal.
+    """
+    if per not in PER:
+        raise ValueError(f"onbekende indeling '{per}', kies uit {', '.join(PER)}")
+    van, tot = (date.fromisoformat(d).isoformat() if d else None for d in (van, tot))
+    sleutel = (per, van, tot)
+    with _lock:
+        item = _cache.get(sleutel)
+        if item and time.monotonic() - item[0] <= OMZET_TTL:
+            _tellers["hits"] += 1
+            return item[1]
+        _tellers["misses"] += 1
+
+    regels = [{"sleutel": r["sleutel"] or "", "aantal": r["aantal"], **{k: _bedrag(r[k]) for k in BEDRAGEN}}
+              for r in _lees(sb, per, van, tot)]
+    totaal = {"aantal": sum(r["aantal"] for r in regels),
+              **{k: sum((r[k] for r in regels), Decimal("0.00")) for k in BEDRAGEN}}
+    uitkomst = {"per": per, "van": van, "tot": tot, "regels": regels, "totaal": totaal}
+    with _lock:
+        _cache[sleutel] = (time.monotonic(), uitkomst)
+    return uitkomst
+
+# ---------- EXPORT ----------
+KOPPEN = {"jaar": "Jaar", "kwartaal": "Kwartaal", "maand": "Maand", "client": "Naam client", "tarief": "Tarief"}
+
+def _nl(bedrag: Decimal) -> str:
+    return f"{bedrag:.2f}".replace(".", ",")
+
+def als_csv(uitkomst: dict) -> str:
+    """;-gescheiden met decimale komma, zoals Excel (NL) het verwacht."""
+    buffer = io.StringIO()
+    w = csv.writer(buffer, delimiter=";")
+    w.writerow([KOPPEN[uitkomst["per"]], "Aantal", "Omzet ex BTW", "BTW", "Omzet incl BTW"])
+    for r in uitkomst["regels"] + [dict(uitkomst["totaal"], sleutel="TOTAAL")]:
+        w.writerow([r["sleutel"], r["aantal"], *(_nl(r[k]) for k in BEDRAGEN)])
+    return buffer.getvalue()
+
+def als_pdf(uitkomst: dict, pdf_path: str) -> str:
+    from jinja2 import Environment, FileSystemLoader
+    from pdfrender import schrijf_pdf
+    env = Environment(loader=FileSystemLoader(os.path.join(os.path.dirname(__file__), "facturen_templates")))
+    html_out = env.get_template("omzet.html").render(
+        kop=KOPPEN[uitkomst["per"]],
+        regels=uitkomst["regels"],
+        totaal=uitkomst["totaal"],
+        van=uitkomst["van"],
+        tot=uitkomst["tot"],
+        datum_vandaag=date.today().strftime("%d-%m-%Y"),
+    )
+    start = time.perf_counter()
+    schrijf_pdf(html_out, pdf_path)
+    metrics.pdf_render(time.perf_counter() - start)
+    return pdf_path
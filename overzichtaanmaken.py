@@ -1,30 +1,30 @@
 # overzichtaanmaken.py
 import os
-from datetime import date, datetime
+import time
+from datetime import date
 from decimal import Decimal
-from supabase import create_client, Client
-from weasyprint import HTML
+import numpy as np
 from jinja2 import Environment, FileSystemLoader
 
+from db import sb, lees_overzicht, lees_tabel
+from facturatie import als_datum
+from pdfrender import schrijf_pdf
+import metrics
+
 # ---------- CONFIG ----------
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-sb: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# overzicht-kolommen die het rapport nodig heeft
+OVERZICHT_KOLOMMEN = ("datum_dienst,naam,tijd,contant,te_ontvangen,opmerking,bedrag,bedrag_exbtw,btw,"
+                      "factuurnummer,datum_factuur")
+# bedragkolommen van het rapport; in het geheugen als hele centen (int64)
+BEDRAG_KOLOMMEN = ("te_ontvangen", "bedrag_exbtw", "btw", "bedrag")
+TEKST_KOLOMMEN = ("datum_dienst", "naam", "tijd", "contant", "opmerking", "factuurnummer", "datum_factuur")
+# kolommen met een subtotaal per naam en een eindtotaal, met hun kolom in
+# de views overzicht_totalen en overzicht_eindtotaal
+TOTAAL_KOLOMMEN = {"bedrag_exbtw": "totaal_ex", "btw": "totaal_btw", "bedrag": "totaal_inc"}
 
 TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "facturen_templates")
 jinja_env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
 
-# ---------- HELPERS ----------
-def create_uniq_name_list(rows, col_name="naam"):
-    seen = set()
-    unique = []
-    for r in rows:
-        val = r[col_name].strip() if r[col_name] else ""
-        if val and val not in seen:
-            seen.add(val)
-            unique.append(val)
-    return unique
-
 # ---------- PDF GENERATOR ----------
 def generate_overzicht_pdf(overzicht_rows, totaal_ex, totaal_btw, totaal_inc):
     template = jinja_env.get_template("overzicht.html")
@@ -38,114 +38,157 @@ def generate_overzicht_pdf(overzicht_rows, totaal_ex, totaal_btw, totaal_inc):
 
     os.makedirs("output", exist_ok=True)
     pdf_path = "output/overzicht_consulten.pdf"
-    HTML(string=html_out).write_pdf(pdf_path)
+    start = time.perf_counter()
+    schrijf_pdf(html_out, pdf_path)
+    metrics.pdf_render(time.perf_counter() - start)
     return pdf_path
 
-# ---------- MAIN ROUTINE ----------
-def overzichtaanmaken():
-    reccounter = somcounter = 0
-    overzichtrecord = []
-    sommenlijst = []
+# ---------- KOLOMMEN ----------
+def centen(waarden) -> np.ndarray:
+    """numeric(10,2)-waarden (JSON-getal, string of None) → hele centen als int64.
+
+    Met twee decimalen ligt waarde * 100 altijd ruim binnen een halve cent van
+    een geheel getal, dus afronden geeft exact de centen uit de database.
+    """
+    return np.rint(np.array([0 if w is None else w for w in waarden], dtype=np.float64) * 100).astype(np.int64)
 
-    rows = sb.table("overzicht").select("*").order("datum_dienst").execute().data
-    unamelist = create_uniq_name_list(rows, "naam")
-    tarieven = {t["item"]: float(t["btw_incl_pct"]) for t in sb.table("tarieven").select("*").execute().data}
+def _euro(c) -> Decimal:
+    return Decimal(int(c)).scaleb(-2)
 
-    for uname in unamelist:
-        if not uname.strip():
+def lees_kolommen(rows) -> dict:
+    """Overzicht-regels → kolommen; bedragen als int64-array in centen.
+
+    Regels zonder naam tellen (net als in de views) niet mee.
+    """
+    kolommen = {k: [] for k in TEKST_KOLOMMEN + BEDRAG_KOLOMMEN}
+    for r in rows:
+        if not r["naam"] or not r["naam"].strip():
             continue
-        beginrij = reccounter + 6
-        for r in rows:
-            if r["naam"] != uname:
-                continue
-            datum = r["datum_dienst"]
-            dag = f"{datum.day:02d}"
-            maand = f"{datum.month:02d}"
-            jaar = str(datum.year)
-
-            record = {
-                "datum": f"{dag}-{maand}-{jaar}",
-                "naam_client": r["naam"],
-                "tijd": str(r["tijd"]),
-                "contant": "Ja" if r["contant"] else "Nee",
-                "te_ontvangen": float(r["te_ontvangen"]),
-                "opmerking": r["opmerking"] or "",
-                "bedrag_exbtw": 0.0,
-                "btw": 0.0,
-                "factuurbedrag": 0.0,
-                "factuurnummer": r["factuurnummer"] or "",
-                "datum_ontvangst": r["datum_factuur"].strftime("%d-%m-%Y") if r["datum_factuur"] else ""
+        for k in kolommen:
+            kolommen[k].append(r[k])
+    for k in BEDRAG_KOLOMMEN:
+        kolommen[k] = centen(kolommen[k])
+    return kolommen
+
+def groepeer(namen: list):
+    """Groepen per naam in volgorde van eerste voorkomen.
+
+    Geeft (namen, groep per regel, volgorde, grenzen): `volgorde` zet de regels
+    per groep achter elkaar (stabiel, dus binnen een naam op datum) en groep g
+    loopt van grenzen[g] tot grenzen[g + 1] in die volgorde.
+    """
+    if not namen:
+        leeg = np.zeros(0, dtype=np.int64)
+        return [], leeg, leeg, np.zeros(1, dtype=np.int64)
+    uniek, eerste, groep = np.unique(np.array(namen, dtype=object), return_index=True, return_inverse=True)
+    rang = np.empty(len(uniek), dtype=np.int64)
+    rang[np.argsort(eerste, kind="stable")] = np.arange(len(uniek))
+    groep = rang[groep.ravel()]
+    volgorde = np.argsort(groep, kind="stable")
+    grenzen = np.concatenate(([0], np.cumsum(np.bincount(groep, minlength=len(uniek)))))
+    return list(uniek[np.argsort(eerste, kind="stable")]), groep, volgorde, grenzen
+
+def som_per_groep(kolom: np.ndarray, groep: np.ndarray, aantal: int) -> np.ndarray:
+    """Som per groep in één gevectoriseerde pass; exact in hele centen."""
+    sommen = np.zeros(aantal, dtype=np.int64)
+    np.add.at(sommen, groep, kolom)
+    return sommen
+
+def lees_totalen():
+    """Subtotalen per naam en het eindtotaal, in Postgres berekend (views overzicht_totalen/_eindtotaal)."""
+    per_naam = {r["naam"]: r for r in lees_tabel(sb, "overzicht_totalen", "naam,totaal_ex,totaal_btw,totaal_inc",
+                                                 sleutel="naam")}
+    eind = sb.table("overzicht_eindtotaal").select("totaal_ex,totaal_btw,totaal_inc").execute().data[0]
+    return per_naam, eind
+
+def bereken(rows, totalen=None) -> dict:
+    """Rekenkern van het rapport: kolommen, groepen en alle (sub)totalen in centen.
+
+    `totalen` is de uitkomst van lees_totalen(). De (sub)totalen komen uit de
+    database; de kolomsommen controleren ze tegen de getoonde regels. Wijkt
+    een naam af (tussen de twee reads gewijzigd) of ontbreekt hij, dan telt de
+    kolomsom, zodat de totalen altijd bij de regels op het rapport passen.
+    Zonder `totalen` gelden alleen de kolomsommen.
+    """
+    kolommen = lees_kolommen(rows)
+    namen, groep, volgorde, grenzen = groepeer(kolommen["naam"])
+    subtotalen = {k: som_per_groep(kolommen[k], groep, len(namen)) for k in TOTAAL_KOLOMMEN}
+    totaal = {k: int(s.sum()) for k, s in subtotalen.items()}
+
+    if totalen is not None:
+        per_naam, eind = totalen
+        db_sub = {k: centen([(per_naam.get(naam) or {}).get(v) for naam in namen])
+                  for k, v in TOTAAL_KOLOMMEN.items()}
+        gelijk = np.array([naam in per_naam for naam in namen], dtype=bool)
+        for k in TOTAAL_KOLOMMEN:
+            gelijk &= db_sub[k] == subtotalen[k]
+        db_eind = {k: int(centen([eind[v]])[0]) for k, v in TOTAAL_KOLOMMEN.items()}
+        if not gelijk.all() or db_eind != totaal:
+            print(f"Overzicht: {int((~gelijk).sum())} subtotalen uit de database wijken af van de regels "
+                  f"(tussentijds gewijzigd); die worden hier opgeteld")
+        subtotalen = {k: np.where(gelijk, db_sub[k], subtotalen[k]) for k in TOTAAL_KOLOMMEN}
+        totaal = db_eind if db_eind == totaal else {k: int(s.sum()) for k, s in subtotalen.items()}
+
+    return {"kolommen": kolommen, "namen": namen, "volgorde": volgorde, "grenzen": grenzen,
+            "subtotalen": subtotalen, "totalen": totaal}
+
+# ---------- LAYOUT ----------
+def _lege_regel(**velden):
+    regel = dict.fromkeys(("datum", "naam_client", "tijd", "contant", "te_ontvangen", "opmerking", "bedrag_exbtw",
+                           "btw", "factuurbedrag", "factuurnummer", "datum_ontvangst"), "")
+    regel.update(velden)
+    return regel
+
+def layout_regels(rapport: dict):
+    """Regels voor de template, pas tijdens het renderen aangemaakt: per naam de
+    sessies, een subtotaal en een lege regel, en als laatste het totaal."""
+    k = rapport["kolommen"]
+    sub = rapport["subtotalen"]
+    grenzen = rapport["grenzen"]
+    for g in range(len(rapport["namen"])):
+        for i in rapport["volgorde"][grenzen[g]:grenzen[g + 1]]:
+            yield {
+                "datum": als_datum(k["datum_dienst"][i]).strftime("%d-%m-%Y"),
+                "naam_client": k["naam"][i],
+                "tijd": str(k["tijd"][i]),
+                "contant": "Ja" if k["contant"][i] else "Nee",
+                "te_ontvangen": _euro(k["te_ontvangen"][i]),
+                "opmerking": k["opmerking"][i] or "",
+                "bedrag_exbtw": _euro(k["bedrag_exbtw"][i]),
+                "btw": _euro(k["btw"][i]),
+                "factuurbedrag": _euro(k["bedrag"][i]),
+                "factuurnummer": k["factuurnummer"][i] or "",
+                "datum_ontvangst": als_datum(k["datum_factuur"][i]).strftime("%d-%m-%Y") if k["datum_factuur"][i] else ""
             }
-
-            tarief_code = r["opmerking"] or ""
-            btw_pct = tarieven.get(tarief_code, 21.0)
-            bedrag_incl = float(r["bedrag"])
-            bedrag_ex = bedrag_incl / (100 + btw_pct) * 100
-            btw = bedrag_incl - bedrag_ex
-
-            record["bedrag_exbtw"] = round(bedrag_ex, 2)
-            record["btw"] = round(btw, 2)
-            record["factuurbedrag"] = round(bedrag_incl, 2)
-
-            overzichtrecord.append(record)
-            reccounter += 1
-
-        # SUBTOTAAL REGEL
-        eindrij = reccounter + 6
-        overzichtrecord.append({
-            "datum": "",
-            "naam_client": "",
-            "tijd": "",
-            "contant": "",
-            "te_ontvangen": "",
-            "opmerking": "",
-            "bedrag_exbtw": round(sum(r["bedrag_exbtw"] for r in overzichtrecord[beginrij-6:eindrij-6]), 2),
-            "btw": round(sum(r["btw"] for r in overzichtrecord[beginrij-6:eindrij-6]), 2),
-            "factuurbedrag": round(sum(r["factuurbedrag"] for r in overzichtrecord[beginrij-6:eindrij-6]), 2),
-            "factuurnummer": "",
-            "datum_ontvangst": ""
-        })
-        sommenlijst.append(reccounter + 6)
-        somcounter += 1
-        reccounter += 1
-        overzichtrecord.append({
-            "datum": "",
-            "naam_client": "",
-            "tijd": "",
-            "contant": "",
-            "te_ontvangen": "",
-            "opmerking": "",
-            "bedrag_exbtw": "",
-            "btw": "",
-            "factuurbedrag": "",
-            "factuurnummer": "",
-            "datum_ontvangst": ""
-        })
-        reccounter += 1
+        # SUBTOTAAL REGEL + LEGE REGEL
+        yield _lege_regel(bedrag_exbtw=_euro(sub["bedrag_exbtw"][g]), btw=_euro(sub["btw"][g]),
+                          factuurbedrag=_euro(sub["bedrag"][g]))
+        yield _lege_regel()
 
     # TOTAAL REGEL
-    totaal_ex = round(sum(r["bedrag_exbtw"] for r in overzichtrecord if isinstance(r["bedrag_exbtw"], float)), 2)
-    totaal_btw = round(sum(r["btw"] for r in overzichtrecord if isinstance(r["btw"], float)), 2)
-    totaal_inc = round(sum(r["factuurbedrag"] for r in overzichtrecord if isinstance(r["factuurbedrag"], float)), 2)
-
-    overzichtrecord.append({
-        "datum": "TOTAAL",
-        "naam_client": "",
-        "tijd": "",
-        "contant": "",
-        "te_ontvangen": "",
-        "opmerking": "",
-        "bedrag_exbtw": totaal_ex,
-        "btw": totaal_btw,
-        "factuurbedrag": totaal_inc,
-        "factuurnummer": "",
-        "datum_ontvangst": ""
-    })
+    t = rapport["totalen"]
+    yield _lege_regel(datum="TOTAAL", bedrag_exbtw=_euro(t["bedrag_exbtw"]), btw=_euro(t["btw"]),
+                      factuurbedrag=_euro(t["bedrag"]))
+
+# ---------- MAIN ROUTINE ----------
+def overzichtaanmaken(voortgang=None):
+    # ex/btw per regel en de (sub)totalen komen exact uit de database (views
+    # overzicht_regels, overzicht_totalen, overzicht_eindtotaal); groeperen en
+    # controleren gebeurt hier per kolom, in hele centen
+    rows = lees_overzicht(sb, OVERZICHT_KOLOMMEN, tabel="overzicht_regels")
+    rapport = bereken(rows, lees_totalen())
+    t = rapport["totalen"]
 
     # GENEREER PDF
-    pdf_path = generate_overzicht_pdf(overzichtrecord, totaal_ex, totaal_btw, totaal_inc)
+    if voortgang:
+        voortgang(0, 1)
+    pdf_path = generate_overzicht_pdf(layout_regels(rapport), _euro(t["bedrag_exbtw"]), _euro(t["btw"]),
+                                      _euro(t["bedrag"]))
+    if voortgang:
+        voortgang(1, 1)
     print(f"Overzicht PDF gegenereerd: {pdf_path}")
+    return {"pdfs": [pdf_path], "fouten": []}
 
 # ---------- DIRECT UITVOEREN ----------
 if __name__ == "__main__":
-    overzichtaanmaken()
\ No newline at end of file
+    overzichtaanmaken()
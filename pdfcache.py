@@ -0,0 +1,110 @@
+# pdfcache.py
+"""
+Content-addressed cache voor gegenereerde PDF's.
+De sleutel is een hash over de gerenderde HTML van een document (plus het
+logo-pad). Bij een treffer wordt de bewaarde PDF gekopieerd in plaats van
+opnieuw door WeasyPrint gehaald. Omdat factuurdatum en betaaldatum in de HTML
+staan, levert de cache nooit een PDF met een oude datum.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+import metrics
+
+# ---------- CONFIG ----------
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "output/.pdfcache")
+PDF_CACHE_MAX_MB = int(os.getenv("PDF_CACHE_MAX_MB", "500"))
+PDF_CACHE_MAX_DAGEN = int(os.getenv("PDF_CACHE_MAX_DAGEN", "62"))
+
+_lock = threading.Lock()
+_tellers = {"hits": 0, "misses": 0, "opgeslagen": 0, "verwijderd": 0}
+
+# ---------- SLEUTELS ----------
+def sleutel(*delen) -> str:
+    data = json.dumps(delen, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+def _cache_pad(key: str) -> str:
+    return os.path.join(PDF_CACHE_DIR, key[:2], f"{key}.pdf")
+
+# ---------- OPVRAGEN / OPSLAAN ----------
+def haal_op(key: str, doel_pad: str) -> bool:
+    """Kopieert de gecachte PDF naar doel_pad; False als de sleutel onbekend is."""
+    pad = _cache_pad(key)
+    try:
+        os.makedirs(os.path.dirname(doel_pad) or ".", exist_ok=True)
+        shutil.copyfile(pad, doel_pad)
+        os.utime(pad)  # mtime = laatst gebruikt, voor de eviction
+    except FileNotFoundError:
+        with _lock:
+            _tellers["misses"] += 1
+        return False
+    with _lock:
+        _tellers["hits"] += 1
+    return True
+
+def bewaar(key: str, pdf_pad: str) -> None:
+    pad = _cache_pad(key)
+    os.makedirs(os.path.dirname(pad), exist_ok=True)
+    tmp = f"{pad}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.copyfile(pdf_pad, tmp)
+    os.replace(tmp, pad)
+    with _lock:
+        _tellers["opgeslagen"] += 1
+
+# ---------- EVICTION ----------
+def opruimen(max_mb: int = None, max_dagen: int = None) -> int:
+    """Verwijdert entries ouder dan max_dagen en daarna de oudste tot onder max_mb.
+
+    Geeft het aantal verwijderde bestanden terug.
+    """
+    max_bytes = (PDF_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    grens = time.time() - (PDF_CACHE_MAX_DAGEN if max_dagen is None else max_dagen) * 86400
+
+    entries = []
+    for root, _, files in os.walk(PDF_CACHE_DIR):
+        for naam in files:
+            pad = os.path.join(root, naam)
+            try:
+                st = os.stat(pad)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, pad))
+
+    entries.sort()
+    totaal = sum(e[1] for e in entries)
+    verwijderd = 0
+    for mtime, size, pad in entries:
+        if mtime >= grens and totaal <= max_bytes:
+            break
+        try:
+            os.remove(pad)
+        except FileNotFoundError:
+            pass
+        totaal -= size
+        verwijderd += 1
+
+    with _lock:
+        _tellers["verwijderd"] += verwijderd
+    return verwijderd
+
+def statistieken(sinds: dict = None) -> dict:
+    """Tellers sinds de start van het proces (zo gaan ze naar metrics).
+
+    Met een eerdere uitkomst als `sinds` alleen wat er daarna bijkwam, zoals
+    de cijfers van één factuurrun.
+    """
+    with _lock:
+        stats = dict(_tellers)
+    if sinds:
+        stats = {k: v - sinds.get(k, 0) for k, v in stats.items()}
+    opgevraagd = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = round(stats["hits"] / opgevraagd, 3) if opgevraagd else 0.0
+    return stats
+
+metrics.registreer_collector(lambda: ((f"pdf_cache_{k}", {}, v) for k, v in statistieken().items()))
@@ -0,0 +1,66 @@
+# pdfrender.py
+"""
+HTML → PDF conversie met WeasyPrint, serieel of verdeeld over een process pool.
+De Jinja-HTML wordt vooraf in het hoofdproces gerenderd; alleen de (CPU-zware)
+layout en het wegschrijven van de PDF gebeurt in de workers.
+De workers worden met "spawn" gestart, niet met fork: de pool wordt aangemaakt
+vanuit een multithreaded proces (gunicorn-threads, achtergrondjobs) en een
+fork kan daar een lock overnemen die op dat moment door een andere thread
+vastgehouden wordt.
+"""
+
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+
+# ---------- CONFIG ----------
+# aantal worker-processen voor PDF-rendering; 1 = serieel (zoals vroeger)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "1"))
+
+# ---------- RENDEREN ----------
+def schrijf_pdf(html_out: str, pdf_path: str) -> str:
+    from weasyprint import HTML
+    os.makedirs(os.path.dirname(pdf_path) or ".", exist_ok=True)
+    HTML(string=html_out).write_pdf(pdf_path)
+    return pdf_path
+
+def _schrijf_pdf_taak(taak):
+    html_out, pdf_path = taak
+    start = time.perf_counter()
+    try:
+        schrijf_pdf(html_out, pdf_path)
+        return {"pdf_path": pdf_path, "fout": None, "duur": time.perf_counter() - start}
+    except Exception as e:
+        return {"pdf_path": pdf_path, "fout": f"{type(e).__name__}: {e}", "duur": time.perf_counter() - start}
+
+def _gemeten(resultaat):
+    # rendertijd in het hoofdproces vastleggen (de workers hebben eigen metrics)
+    metrics.pdf_render(resultaat.pop("duur"))
+    return resultaat
+
+def schrijf_pdfs(taken: list, workers: int = None):
+    """Zet een lijst (html, pdf_path)-taken om naar PDF's.
+
+    Levert per taak, in de volgorde van `taken`, een dict met pdf_path en fout
+    (None als het gelukt is). Een mislukte factuur houdt de rest niet tegen.
+    """
+    workers = PDF_WORKERS if workers is None else workers
+    workers = max(1, min(workers, len(taken)))
+    if workers == 1:
+        for taak in taken:
+            yield _gemeten(_schrijf_pdf_taak(taak))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        resultaten = pool.map(_schrijf_pdf_taak, taken)
+        for i, taak in enumerate(taken):
+            try:
+                yield _gemeten(next(resultaten))
+            except Exception as e:
+                # pool kapot (bv. worker gecrasht): de rest als mislukt melden
+                for _, pdf_path in taken[i:]:
+                    yield {"pdf_path": pdf_path, "fout": f"{type(e).__name__}: {e}"}
+                return
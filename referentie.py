@@ -0,0 +1,208 @@
+# referentie.py
+"""
+In-process cache voor de referentietabellen tarieven en clienten.
+Tarieven (klein) staan er volledig in, met een index op item. Van clienten
+staat alleen een lichte index in het geheugen (id, naam, klant_id, woonplaats;
+op genormaliseerde naam en op klant_id), met daarop de trigrammen voor
+autocomplete (zoekindex); volledige client-records komen in een LRU van
+hoogstens REFERENTIE_MAX_CLIENTEN stuks. Alles verloopt na
+REFERENTIE_TTL seconden, zodat wijzigingen uit andere workers of uit
+importdata vanzelf doorkomen. Wijzigingen via deze worker (opslaan,
+verwijderen, bulk) worden direct doorgevoerd.
+Met een lokale replica (replica.py, REPLICA_PAD) laadt de cache uit SQLite in
+plaats van via het netwerk.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import metrics
+import replica
+import zoekindex
+from db import lees_tabel
+from zoekindex import normaliseer
+
+# ---------- CONFIG ----------
+REFERENTIE_TTL = int(os.getenv("REFERENTIE_TTL", "300"))
+REFERENTIE_MAX_CLIENTEN = int(os.getenv("REFERENTIE_MAX_CLIENTEN", "1000"))
+INDEX_KOLOMMEN = "id,naam_client,klant_id,woonplaats"
+
+_lock = threading.Lock()
+_tellers = {"hits": 0, "misses": 0}
+
+_tarieven = []          # alle tarief-rijen
+_tarief_op_item = {}    # item -> rij
+_tarieven_geladen_op = None
+
+_clienten = {}          # id -> {id, naam_client, klant_id, woonplaats}
+_client_op_naam = {}    # genormaliseerde naam -> id
+_client_op_klant_id = {}
+_clienten_geladen_op = None
+_records = OrderedDict()   # id -> (geladen_op, volledig record), LRU
+
+# ---------- HULP ----------
+def _verlopen(geladen_op) -> bool:
+    return geladen_op is None or time.monotonic() - geladen_op > REFERENTIE_TTL
+
+def _tel(treffer: bool):
+    with _lock:
+        _tellers["hits" if treffer else "misses"] += 1
+
+def leeg():
+    """Vergeet alles; de volgende lookup laadt opnieuw."""
+    global _tarieven_geladen_op, _clienten_geladen_op
+    with _lock:
+        _tarieven_geladen_op = _clienten_geladen_op = None
+        _records.clear()
+
+# ---------- TARIEVEN ----------
+def _zorg_tarieven(sb):
+    global _tarieven, _tarief_op_item, _tarieven_geladen_op
+    if not _verlopen(_tarieven_geladen_op):
+        _tel(True)
+        return
+    _tel(False)
+    if replica.actief():
+        rows = replica.tarieven(sb)
+    else:
+        rows = sb.table("tarieven").select("*").execute().data
+    with _lock:
+        _tarieven = rows
+        _tarief_op_item = {}
+        for r in rows:
+            _tarief_op_item.setdefault(r["item"], r)
+        _tarieven_geladen_op = time.monotonic()
+
+def tarieven(sb) -> list:
+    _zorg_tarieven(sb)
+    return _tarieven
+
+def tarief(sb, item: str):
+    """Tarief-rij voor een item (exact), of None."""
+    _zorg_tarieven(sb)
+    return _tarief_op_item.get(item)
+
+# ---------- CLIENTEN ----------
+def _index_toevoegen(c: dict):
+    _clienten[c["id"]] = c
+    zoekindex.voeg_toe(c["id"], c.get("naam_client"))
+    if c.get("naam_client"):
+        _client_op_naam.setdefault(normaliseer(c["naam_client"]), c["id"])
+    if c.get("klant_id"):
+        _client_op_klant_id.setdefault(str(c["klant_id"]), c["id"])
+
+def _index_verwijderen(client_id):
+    oud = _clienten.pop(client_id, None)
+    if oud is None:
+        return
+    zoekindex.verwijder(client_id)
+    for index, sleutel in ((_client_op_naam, normaliseer(oud.get("naam_client"))),
+                           (_client_op_klant_id, str(oud.get("klant_id")))):
+        if index.get(sleutel) == client_id:
+            del index[sleutel]
+
+def _zorg_clienten(sb):
+    global _clienten_geladen_op
+    if not _verlopen(_clienten_geladen_op):
+        return
+    if replica.actief():
+        rows = replica.client_index(sb, INDEX_KOLOMMEN.split(","))
+    else:
+        rows = list(lees_tabel(sb, "clienten", INDEX_KOLOMMEN))
+    with _lock:
+        _clienten.clear()
+        _client_op_naam.clear()
+        _client_op_klant_id.clear()
+        _records.clear()
+        zoekindex.leeg()
+        for r in rows:
+            _index_toevoegen(r)
+        _clienten_geladen_op = time.monotonic()
+
+def client_namen(sb) -> list:
+    """[{"naam_client": ...}] van alle clienten, op naam gesorteerd (datalist in snelinvoeren)."""
+    _zorg_clienten(sb)
+    with _lock:
+        namen = sorted({c["naam_client"] for c in _clienten.values() if c.get("naam_client")}, key=str.lower)
+    return [{"naam_client": n} for n in namen]
+
+def clienten_op_naam(sb) -> dict:
+    """Genormaliseerde naam → index-rij van de client, voor exacte lookups (bulk-invoer)."""
+    _zorg_clienten(sb)
+    with _lock:
+        return {naam: _clienten[client_id] for naam, client_id in _client_op_naam.items()}
+
+def zoek_clienten(sb, q: str, limit: int = 10) -> list:
+    """Autocomplete: gerangschikte index-rijen voor zoekterm q, met score (zie zoekindex.zoek)."""
+    _zorg_clienten(sb)
+    with _lock:
+        return [dict(_clienten[client_id], score=round(score, 3)) for score, client_id in zoekindex.zoek(q, limit)]
+
+def _record(sb, client_id):
+    with _lock:
+        item = _records.get(client_id)
+        if item and not _verlopen(item[0]):
+            _records.move_to_end(client_id)
+            _tellers["hits"] += 1
+            return item[1]
+        _tellers["misses"] += 1
+    if replica.actief():
+        record = replica.client(sb, client_id)
+    else:
+        rows = sb.table("clienten").select("*").eq("id", client_id).execute().data
+        record = rows[0] if rows else None
+    if record is None:
+        return None
+    with _lock:
+        _records[client_id] = (time.monotonic(), record)
+        _records.move_to_end(client_id)
+        while len(_records) > REFERENTIE_MAX_CLIENTEN:
+            _records.popitem(last=False)
+    return record
+
+def client_op_naam(sb, naam: str):
+    """Volledig client-record bij een naam (hoofdletters/spaties maken niet uit, zie zoekindex.normaliseer), of None."""
+    _zorg_clienten(sb)
+    client_id = _client_op_naam.get(normaliseer(naam))
+    return _record(sb, client_id) if client_id else None
+
+def client_op_klant_id(sb, klant_id):
+    _zorg_clienten(sb)
+    client_id = _client_op_klant_id.get(str(klant_id))
+    return _record(sb, client_id) if client_id else None
+
+# ---------- SCHRIJVEN ----------
+def bijwerken(tabel: str, rij: dict):
+    """Na opslaan: tarieven opnieuw laden, een client direct in de index zetten."""
+    global _tarieven_geladen_op
+    if tabel in replica.KOLOMMEN:
+        replica.markeer_verouderd()
+    with _lock:
+        if tabel == "tarieven":
+            _tarieven_geladen_op = None
+        elif tabel == "clienten" and rij.get("id"):
+            _records.pop(rij["id"], None)
+            if _clienten_geladen_op is not None:
+                _index_verwijderen(rij["id"])
+                _index_toevoegen({k: rij.get(k) for k in INDEX_KOLOMMEN.split(",")})
+
+def verwijder(tabel: str, rij_id):
+    global _tarieven_geladen_op
+    if tabel in replica.KOLOMMEN:
+        replica.markeer_verouderd()
+    with _lock:
+        if tabel == "tarieven":
+            _tarieven_geladen_op = None
+        elif tabel == "clienten":
+            _records.pop(rij_id, None)
+            _index_verwijderen(rij_id)
+
+def statistieken() -> dict:
+    with _lock:
+        stats = dict(_tellers)
+        stats["clienten_records"] = len(_records)
+    return stats
+
+metrics.registreer_collector(lambda: ((f"referentie_cache_{k}", {}, v) for k, v in statistieken().items()))
@@ -0,0 +1,263 @@
+# replica.py
+"""
+Optionele lokale leesreplica (SQLite) van clienten en tarieven.
+Staat aan zodra REPLICA_PAD gezet is. De replica wordt incrementeel bijgewerkt:
+hoogstens eens per REPLICA_INTERVAL seconden worden de rijen opgehaald met
+gewijzigd_op na de vorige sync, plus de deletes uit de tabel verwijderingen
+(zie schema.sql). Elke sync kijkt ook terug tot REPLICA_OVERLAP seconden vóór
+de start van de vorige sync, zodat transacties die pas na die sync committen
+(met een oudere now()) alsnog meekomen; rijen worden op id overschreven, dus
+dubbel ophalen kan geen kwaad.
+Alleen lezen gaat via de replica; schrijven gaat altijd naar Supabase. Na een
+eigen wijziging (markeer_verouderd) synct de eerstvolgende lookup meteen.
+Lukt een sync niet, dan blijft de laatst bekende stand in gebruik.
+De replica bevat volledige client-records (ook BSN): zet hem onder output/
+(staat in .gitignore), niet in een map die mee kan in git.
+
+    REPLICA_PAD=output/replica.sqlite python replica.py   # één incrementele sync
+    python replica.py --volledig                          # opnieuw opbouwen
+    python replica.py --volg                              # blijven synchroniseren
+"""
+
+import os
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+# ---------- ENV ----------
+load_dotenv()
+
+import metrics
+from db import lees_tabel, lees_op_volgorde
+
+# ---------- CONFIG ----------
+REPLICA_PAD = os.getenv("REPLICA_PAD", "")                      # leeg = geen replica
+REPLICA_INTERVAL = float(os.getenv("REPLICA_INTERVAL", "30"))   # seconden tussen twee syncs
+REPLICA_OVERLAP = float(os.getenv("REPLICA_OVERLAP", "60"))     # langste transactie + klokverschil
+# SQLite staat standaard hoogstens 999 parameters per query toe
+SQLITE_CHUNK = 500
+
+# geïndexeerde kolommen per tabel; het volledige record staat als JSON in `data`
+KOLOMMEN = {
+    "clienten": ("naam_client", "klant_id", "bsn_nr"),
+    "tarieven": ("item",),
+}
+
+# indexes zoals in schema.sql, plus naam zonder hoofdletters voor /api/client/<naam>
+SCHEMA = """
+create table if not exists clienten (
+    id text primary key,
+    naam_client text,
+    klant_id text,
+    bsn_nr text,
+    gewijzigd_op text,
+    data text not null
+);
+create index if not exists idx_clienten_naam on clienten(naam_client collate nocase);
+create index if not exists idx_clienten_klant_id on clienten(klant_id);
+create index if not exists idx_clienten_bsn on clienten(bsn_nr);
+
+create table if not exists tarieven (
+    id text primary key,
+    item text,
+    gewijzigd_op text,
+    data text not null
+);
+create index if not exists idx_tarieven_item on tarieven(item);
+
+create table if not exists sync (
+    tabel text primary key,
+    watermark text,
+    verwijderd_tot text,
+    gesynchroniseerd_op real
+);
+"""
+
+_lokaal = threading.local()     # één SQLite-verbinding per thread
+_sync_lock = threading.Lock()
+_laatste_sync = None            # time.monotonic() van de laatste sync(poging) in dit proces
+_tellers = {"syncs": 0, "rijen": 0, "verwijderd": 0, "mislukt": 0}
+
+def actief() -> bool:
+    return bool(REPLICA_PAD)
+
+# ---------- SQLITE ----------
+def _db() -> sqlite3.Connection:
+    if getattr(_lokaal, "pad", None) != REPLICA_PAD:
+        os.makedirs(os.path.dirname(REPLICA_PAD) or ".", exist_ok=True)
+        con = sqlite3.connect(REPLICA_PAD, timeout=30)
+        con.row_factory = sqlite3.Row
+        # WAL: lezers in andere threads/workers wachten niet op een lopende sync
+        con.execute("pragma journal_mode=wal")
+        con.execute("pragma synchronous=normal")
+        con.executescript(SCHEMA)
+        _lokaal.con, _lokaal.pad = con, REPLICA_PAD
+    return _lokaal.con
+
+def _gevuld() -> bool:
+    return _db().execute("select count(*) from sync where watermark is not null").fetchone()[0] == len(KOLOMMEN)
+
+# ---------- OPHALEN ----------
+def _vanaf(watermark, vorige_start):
+    """Ophalen vanaf het watermark, of eerder als de vorige sync daar te kort op zat."""
+    if not watermark:
+        return None
+    grens = datetime.fromtimestamp(vorige_start - REPLICA_OVERLAP, timezone.utc)
+    return min(datetime.fromisoformat(watermark), grens).isoformat()
+
+def _laatste(tijden):
+    tijden = [t for t in tijden if t]
+    return max(tijden, key=datetime.fromisoformat) if tijden else None
+
+def _wijzigingen(sb, tabel: str, sinds):
+    """Rijen met gewijzigd_op na `sinds` (of alle), keyset op (gewijzigd_op, id)."""
+    filters = (lambda q: q.gt("gewijzigd_op", sinds)) if sinds is not None else None
+    return lees_op_volgorde(sb, tabel, "gewijzigd_op", filters=filters)
+
+def _verwijderingen(sb, tabel: str, sinds):
+    """Deletes op `tabel` na `sinds`, keyset op id."""
+    def filters(q):
+        q = q.eq("tabel", tabel)
+        return q.gt("verwijderd_op", sinds) if sinds is not None else q
+    return lees_tabel(sb, "verwijderingen", "id,rij_id,verwijderd_op", filters=filters)
+
+def _laatste_verwijdering(sb, tabel: str):
+    rows = (sb.table("verwijderingen").select("verwijderd_op").eq("tabel", tabel)
+            .order("verwijderd_op", desc=True).limit(1).execute().data)
+    return rows[0]["verwijderd_op"] if rows else None
+
+# ---------- SYNC ----------
+def _sync_tabel(sb, con, tabel: str, volledig: bool) -> dict:
+    start = time.time()
+    stand = con.execute("select watermark, verwijderd_tot, gesynchroniseerd_op from sync where tabel = ?",
+                        (tabel,)).fetchone()
+    opnieuw = volledig or stand is None or stand["watermark"] is None
+    if opnieuw:
+        # stand van de deletes vóór het laden vastleggen: wat tijdens het laden
+        # verwijderd wordt, komt bij de volgende sync alsnog mee
+        watermark, verwijderd_tot = None, _laatste_verwijdering(sb, tabel)
+        weg = []
+        rows = list(_wijzigingen(sb, tabel, None))
+    else:
+        watermark, verwijderd_tot = stand["watermark"], stand["verwijderd_tot"]
+        weg = list(_verwijderingen(sb, tabel, _vanaf(verwijderd_tot, stand["gesynchroniseerd_op"])))
+        rows = list(_wijzigingen(sb, tabel, _vanaf(watermark, stand["gesynchroniseerd_op"])))
+
+    kolommen = KOLOMMEN[tabel]
+    # één transactie: lezers zien de oude of de nieuwe stand, nooit een half bijgewerkte
+    with con:
+        if opnieuw:
+            con.execute(f"delete from {tabel}")
+        con.executemany(
+            f"insert or replace into {tabel} (id, {', '.join(kolommen)}, gewijzigd_op, data) "
+            f"values (?, {', '.join('?' for _ in kolommen)}, ?, ?)",
+            [(r["id"], *(None if r.get(k) is None else str(r[k]) for k in kolommen), r.get("gewijzigd_op"),
+              json.dumps(r)) for r in rows])
+        con.executemany(f"delete from {tabel} where id = ?", [(w["rij_id"],) for w in weg])
+        con.execute("insert or replace into sync (tabel, watermark, verwijderd_tot, gesynchroniseerd_op) "
+                    "values (?, ?, ?, ?)",
+                    (tabel,
+                     # "" = gesynchroniseerd maar nog leeg: volgende keer alles ophalen
+                     _laatste([watermark] + [r.get("gewijzigd_op") for r in rows]) or "",
+                     _laatste([verwijderd_tot] + [w["verwijderd_op"] for w in weg]),
+                     start))
+    return {"rijen": len(rows), "verwijderd": len(weg)}
+
+def sync(sb, volledig: bool = False) -> dict:
+    """Haalt de wijzigingen sinds de vorige sync op (of alles) en past ze lokaal toe."""
+    global _laatste_sync
+    con = _db()
+    resultaat = {}
+    with _sync_lock:
+        for tabel in KOLOMMEN:
+            resultaat[tabel] = _sync_tabel(sb, con, tabel, volledig)
+        _laatste_sync = time.monotonic()
+    _tellers["syncs"] += 1
+    _tellers["rijen"] += sum(r["rijen"] for r in resultaat.values())
+    _tellers["verwijderd"] += sum(r["verwijderd"] for r in resultaat.values())
+    return resultaat
+
+def _zorg_actueel(sb):
+    global _laatste_sync
+    if _laatste_sync is not None and time.monotonic() - _laatste_sync < REPLICA_INTERVAL:
+        return
+    try:
+        sync(sb)
+    except Exception as e:
+        # zonder eerdere stand valt er niets te lezen
+        if not _gevuld():
+            raise
+        _laatste_sync = time.monotonic()
+        _tellers["mislukt"] += 1
+        print(f"Replica-sync mislukt, laatst bekende stand blijft in gebruik: {e}")
+
+def markeer_verouderd():
+    """Na een eigen wijziging: de volgende lookup synct eerst."""
+    global _laatste_sync
+    _laatste_sync = None
+
+# ---------- LEZEN ----------
+def _records(query: str, parameters=()) -> list:
+    return [json.loads(r["data"]) for r in _db().execute(query, parameters)]
+
+def tarieven(sb) -> list:
+    _zorg_actueel(sb)
+    return _records("select data from tarieven order by item")
+
+def client_index(sb, kolommen) -> list:
+    """Alle clienten, alleen de gevraagde kolommen (voor de index in referentie)."""
+    _zorg_actueel(sb)
+    return [{k: r.get(k) for k in kolommen} for r in _records("select data from clienten order by id")]
+
+def client(sb, client_id):
+    _zorg_actueel(sb)
+    rows = _records("select data from clienten where id = ?", (client_id,))
+    return rows[0] if rows else None
+
+def client_op_naam(sb, naam: str):
+    """Client bij een naam, zonder onderscheid in hoofdletters (zoals ilike zonder wildcards)."""
+    _zorg_actueel(sb)
+    rows = _records("select data from clienten where naam_client = ? collate nocase order by id limit 1", (naam,))
+    return rows[0] if rows else None
+
+def clienten_op_namen(sb, namen: list) -> list:
+    """Alle clienten met een naam uit `namen` (exact, zoals in_ op naam_client)."""
+    _zorg_actueel(sb)
+    rows = []
+    for i in range(0, len(namen), SQLITE_CHUNK):
+        deel = namen[i:i + SQLITE_CHUNK]
+        rows += _records(f"select data from clienten where naam_client in ({', '.join('?' for _ in deel)})", deel)
+    return rows
+
+def statistieken() -> dict:
+    stats = dict(_tellers)
+    if actief():
+        for r in _db().execute("select tabel, gesynchroniseerd_op from sync"):
+            stats[f"leeftijd_{r['tabel']}_s"] = round(time.time() - r["gesynchroniseerd_op"], 1)
+    return stats
+
+metrics.registreer_collector(lambda: ((f"replica_{k}", {}, v) for k, v in statistieken().items()))
+
+# ---------- DIRECT UITVOEREN ----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--volledig", action="store_true", help="replica opnieuw opbouwen")
+    parser.add_argument("--volg", action="store_true", help="elke REPLICA_INTERVAL seconden opnieuw synchroniseren")
+    args = parser.parse_args()
+    if not actief():
+        parser.error("REPLICA_PAD is niet gezet")
+
+    from db import sb
+    volledig = args.volledig
+    while True:
+        start = time.perf_counter()
+        print(f"Replica {REPLICA_PAD}: {sync(sb, volledig)} in {time.perf_counter() - start:.2f}s")
+        if not args.volg:
+            break
+        volledig = False
+        time.sleep(REPLICA_INTERVAL)
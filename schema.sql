@@ -1,17 +1,24 @@
+-- Idempotent: uit te voeren op een nieuwe database én op een bestaande
+-- (oudere) database om die bij te werken. Tabellen, indexes en partities
+-- worden alleen aangemaakt als ze ontbreken, later bijgekomen kolommen met
+-- add column if not exists; functies, views en triggers worden vervangen.
+
 -- EXTENSIES
 create extension if not exists "uuid-ossp";
+create extension if not exists pg_trgm;
 
 -- 1. TARIEVEN
-create table tarieven (
+create table if not exists tarieven (
     id uuid primary key default gen_random_uuid(),
     item text unique,
     bedrag numeric(10,2),
     btw_incl_pct numeric(5,2),
-    omschrijving_op_factuur text
+    omschrijving_op_factuur text,
+    gewijzigd_op timestamptz not null default now()
 );
 
 -- 2. CLIENTEN
-create table clienten (
+create table if not exists clienten (
     id uuid primary key default gen_random_uuid(),
     naam_client text,
     straatnaam text,
@@ -41,11 +48,12 @@ create table clienten (
     huisarts_email text,
     hoe_terecht_gekomen text,
     inlichten_jn boolean,
-    nieuwsbrief boolean default false
+    nieuwsbrief boolean default false,
+    gewijzigd_op timestamptz not null default now()
 );
 
 -- 3. OVERZICHT
-create table overzicht (
+create table if not exists overzicht (
     id uuid primary key default gen_random_uuid(),
     datum_dienst date,
     naam text,
@@ -60,12 +68,389 @@ create table overzicht (
     factuurnummer text unique,
     datum_factuur date,
     ontvangst boolean default false,
-    deb_nr text
+    deb_nr text,
+    gewijzigd_op timestamptz not null default now()
 );
 
+-- bestaande database van vóór gewijzigd_op: kolom toevoegen en backfillen vóór
+-- de triggers (bestaande rijen tellen als gewijzigd op het moment van migreren)
+alter table overzicht add column if not exists gewijzigd_op timestamptz;
+alter table clienten add column if not exists gewijzigd_op timestamptz;
+alter table tarieven add column if not exists gewijzigd_op timestamptz;
+update overzicht set gewijzigd_op = now() where gewijzigd_op is null;
+update clienten set gewijzigd_op = now() where gewijzigd_op is null;
+update tarieven set gewijzigd_op = now() where gewijzigd_op is null;
+alter table overzicht alter column gewijzigd_op set default now(), alter column gewijzigd_op set not null;
+alter table clienten alter column gewijzigd_op set default now(), alter column gewijzigd_op set not null;
+alter table tarieven alter column gewijzigd_op set default now(), alter column gewijzigd_op set not null;
+
+-- gewijzigd_op bijhouden bij elke update (watermark voor incrementele factuurruns
+-- en voor het bijwerken van de lokale replica, zie replica.py)
+create or replace function zet_gewijzigd_op() returns trigger as $$
+begin
+    new.gewijzigd_op := now();
+    return new;
+end;
+$$ language plpgsql;
+
+create or replace trigger trg_overzicht_gewijzigd_op
+    before update on overzicht
+    for each row execute function zet_gewijzigd_op();
+
+create or replace trigger trg_clienten_gewijzigd_op
+    before update on clienten
+    for each row execute function zet_gewijzigd_op();
+
+create or replace trigger trg_tarieven_gewijzigd_op
+    before update on tarieven
+    for each row execute function zet_gewijzigd_op();
+
+-- verwijderde clienten/tarieven, zodat de lokale replica ook deletes ziet
+create table if not exists verwijderingen (
+    id bigserial primary key,
+    tabel text not null,
+    rij_id uuid not null,
+    verwijderd_op timestamptz not null default now()
+);
+
+create or replace function log_verwijdering() returns trigger as $$
+begin
+    insert into verwijderingen (tabel, rij_id) values (tg_table_name, old.id);
+    return old;
+end;
+$$ language plpgsql;
+
+create or replace trigger trg_clienten_verwijderd
+    after delete on clienten
+    for each row execute function log_verwijdering();
+
+create or replace trigger trg_tarieven_verwijderd
+    after delete on tarieven
+    for each row execute function log_verwijdering();
+
+-- 4. FACTUURRUNS (run-log)
+create table if not exists factuurruns (
+    id uuid primary key default gen_random_uuid(),
+    soort text not null,
+    gestart_op timestamptz not null default now(),
+    watermark timestamptz,
+    volledig boolean default false,
+    aantal_rijen integer,
+    aantal_facturen integer
+);
+
+-- verzendstatus per factuur: facturenprinten mailt alleen wat nog niet verzonden is
+create table if not exists factuur_mails (
+    factuurnummer text primary key,
+    email text,
+    status text not null,
+    pogingen integer not null default 0,
+    fout text,
+    bijgewerkt_op timestamptz not null default now()
+);
+
+-- laatste factuurnummer per client in één call bijwerken (facturenaanmaken):
+-- `facturen` is een lijst [{"naam": ..., "factuurnummer": ...}]; zoals de
+-- losse updates op naam_client, met de rechten van de aanroeper. Geeft het
+-- aantal bijgewerkte clienten terug (één rij, zodat PostgREST een lijst levert).
+create or replace function registreer_factuurnummers(facturen jsonb) returns table (aantal integer)
+set search_path = public as $$
+    with bijgewerkt as (
+        update clienten c
+           set laatste_factuurnr = f.factuurnummer
+          from jsonb_to_recordset(facturen) f(naam text, factuurnummer text)
+         where c.naam_client = f.naam
+        returning 1
+    )
+    select count(*)::integer from bijgewerkt;
+$$ language sql;
+
 -- INDEXES
-create index idx_overzicht_factuurnummer on overzicht(factuurnummer);
-create index idx_overzicht_datum_dienst on overzicht(datum_dienst);
-create index idx_clienten_klant_id on clienten(klant_id);
-create index idx_clienten_bsn on clienten(bsn_nr);
-create index idx_tarieven_item on tarieven(item);
+create index if not exists idx_overzicht_factuurnummer on overzicht(factuurnummer);
+create index if not exists idx_overzicht_datum_dienst on overzicht(datum_dienst);
+create index if not exists idx_clienten_klant_id on clienten(klant_id);
+create index if not exists idx_clienten_bsn on clienten(bsn_nr);
+create index if not exists idx_tarieven_item on tarieven(item);
+create index if not exists idx_overzicht_gewijzigd_op on overzicht(gewijzigd_op);
+create index if not exists idx_overzicht_naam on overzicht(naam);
+-- trigram-indexes: ilike '%...%' in /api/zoek kan hiermee een index gebruiken
+create index if not exists idx_clienten_naam_trgm on clienten using gin (naam_client gin_trgm_ops);
+create index if not exists idx_overzicht_naam_trgm on overzicht using gin (naam gin_trgm_ops);
+create index if not exists idx_factuurruns_soort_watermark on factuurruns(soort, watermark desc);
+create index if not exists idx_clienten_gewijzigd_op on clienten(gewijzigd_op, id);
+create index if not exists idx_tarieven_gewijzigd_op on tarieven(gewijzigd_op, id);
+create index if not exists idx_verwijderingen_tabel_op on verwijderingen(tabel, verwijderd_op);
+
+-- 5. OVERZICHT-RAPPORT (exact in numeric, zelfde rekenwijze als snelinvoer.btw_splitsing)
+-- per regel: ex = incl / (100 + btw%) * 100 op centen afgerond, btw = incl - ex;
+-- zonder (bekend) tarief geldt 21%
+create or replace view overzicht_regels as
+select o.*,
+       round(o.bedrag / (100 + coalesce(t.btw_incl_pct, 21)) * 100, 2) as bedrag_exbtw,
+       o.bedrag - round(o.bedrag / (100 + coalesce(t.btw_incl_pct, 21)) * 100, 2) as btw
+from overzicht o
+left join tarieven t on t.item = o.opmerking;
+
+-- subtotalen per naam (regels zonder naam tellen, net als in het rapport, niet mee)
+create or replace view overzicht_totalen as
+select naam,
+       count(*) as aantal,
+       sum(bedrag_exbtw) as totaal_ex,
+       sum(btw) as totaal_btw,
+       sum(bedrag) as totaal_inc
+from overzicht_regels
+where nullif(btrim(naam), '') is not null
+group by naam;
+
+-- eindtotaal van het rapport (altijd precies één rij)
+create or replace view overzicht_eindtotaal as
+select count(*) as aantal,
+       coalesce(sum(bedrag_exbtw), 0) as totaal_ex,
+       coalesce(sum(btw), 0) as totaal_btw,
+       coalesce(sum(bedrag), 0) as totaal_inc
+from overzicht_regels
+where nullif(btrim(naam), '') is not null;
+
+-- 6. HISTORIE (geprinte overzicht-regels; overzicht zelf blijft klein)
+-- gepartitioneerd per jaar van datum_dienst: lookups met een datumbereik lezen
+-- alleen de partities van die jaren; regels zonder datum gaan naar de default
+create table if not exists overzicht_historie (
+    id uuid not null,
+    datum_dienst date,
+    naam text,
+    tijd time,
+    contant boolean,
+    te_ontvangen numeric(10,2),
+    opmerking text,
+    bedrag numeric(10,2),
+    ex_btw numeric(10,2),
+    btw_21_pct numeric(10,2),
+    factuurbedrag numeric(10,2),
+    factuurnummer text,
+    datum_factuur date,
+    ontvangst boolean,
+    deb_nr text,
+    gewijzigd_op timestamptz,
+    gearchiveerd_op timestamptz not null default now()
+) partition by range (datum_dienst);
+
+create table if not exists overzicht_historie_zonder_datum partition of overzicht_historie default;
+create table if not exists overzicht_historie_2024 partition of overzicht_historie for values from ('2024-01-01') to ('2025-01-01');
+create table if not exists overzicht_historie_2025 partition of overzicht_historie for values from ('2025-01-01') to ('2026-01-01');
+create table if not exists overzicht_historie_2026 partition of overzicht_historie for values from ('2026-01-01') to ('2027-01-01');
+
+-- indexes op de parent gelden voor elke (ook later aangemaakte) partitie
+create index if not exists idx_historie_datum_id on overzicht_historie(datum_dienst, id);
+create index if not exists idx_historie_naam on overzicht_historie(naam, datum_dienst);
+create index if not exists idx_historie_factuurnummer on overzicht_historie(factuurnummer);
+create index if not exists idx_historie_id on overzicht_historie(id);
+
+-- verplaatst precies de geprinte overzicht-regels in één transactie naar de
+-- historie: `regels` is een lijst [{"id": ..., "gewijzigd_op": ...}] zoals ze
+-- gelezen zijn; een regel die sindsdien gewijzigd is, blijft in overzicht
+-- (ontbrekende jaarpartities worden eerst aangemaakt). Geeft het aantal
+-- verplaatste regels terug (één rij, zodat PostgREST een lijst levert).
+-- Alleen voor de server (service_role), niet via de anon-key.
+drop function if exists archiveer_overzicht(timestamptz);
+create or replace function archiveer_overzicht(regels jsonb) returns table (aantal integer)
+security definer set search_path = public as $$
+declare
+    jaar integer;
+    n integer;
+begin
+    for jaar in select distinct extract(year from o.datum_dienst)::integer
+                from overzicht o
+                join jsonb_to_recordset(regels) as g(id uuid, gewijzigd_op timestamptz)
+                  on o.id = g.id and o.gewijzigd_op = g.gewijzigd_op
+                where o.datum_dienst is not null
+    loop
+        execute format('create table if not exists %I partition of overzicht_historie for values from (%L) to (%L)',
+                       'overzicht_historie_' || jaar, make_date(jaar, 1, 1), make_date(jaar + 1, 1, 1));
+    end loop;
+
+    -- verplaatsen is geen omzetwijziging: omzet_maand blijft staan (zie 7.)
+    perform set_config('app.archiveren', 'aan', true);
+    with weg as (
+        delete from overzicht o
+        using jsonb_to_recordset(regels) as g(id uuid, gewijzigd_op timestamptz)
+        where o.id = g.id and o.gewijzigd_op = g.gewijzigd_op
+        returning o.*
+    )
+    insert into overzicht_historie (id, datum_dienst, naam, tijd, contant, te_ontvangen, opmerking, bedrag, ex_btw,
+                                    btw_21_pct, factuurbedrag, factuurnummer, datum_factuur, ontvangst, deb_nr,
+                                    gewijzigd_op)
+    select id, datum_dienst, naam, tijd, contant, te_ontvangen, opmerking, bedrag, ex_btw,
+           btw_21_pct, factuurbedrag, factuurnummer, datum_factuur, ontvangst, deb_nr, gewijzigd_op
+    from weg;
+    get diagnostics n = row_count;
+    perform set_config('app.archiveren', 'uit', true);
+    return query select n;
+end;
+$$ language plpgsql;
+
+revoke execute on function archiveer_overzicht(jsonb) from public, anon, authenticated;
+grant execute on function archiveer_overzicht(jsonb) to service_role;
+
+-- live en gearchiveerde regels samen (gearchiveerd_op is leeg voor live regels)
+create or replace view overzicht_met_historie as
+select o.*, null::timestamptz as gearchiveerd_op from overzicht o
+union all
+select * from overzicht_historie;
+
+-- 7. OMZET-ROLLUP (BTW-aangifte en omzet per client/tarief)
+-- omzet per maand, naam en tariefcode over live én gearchiveerde regels,
+-- incrementeel bijgehouden door triggers op overzicht. Per regel tellen de bij
+-- het invoeren opgeslagen ex_btw en btw_21_pct, zodat een later gewijzigd
+-- btw-percentage al aangegeven kwartalen niet verandert; alleen regels zonder
+-- opgeslagen ex_btw worden (zoals in overzicht_regels) met het huidige
+-- percentage van hun tarief berekend. Regels zonder datum of naam tellen niet mee.
+create table if not exists omzet_maand (
+    maand date not null,                -- eerste dag van de maand van datum_dienst
+    naam text not null,
+    opmerking text not null,            -- tariefcode, '' = zonder
+    aantal integer not null default 0,
+    totaal_ex numeric(14,2) not null default 0,
+    totaal_btw numeric(14,2) not null default 0,
+    totaal_inc numeric(14,2) not null default 0,
+    primary key (maand, naam, opmerking)
+);
+create index if not exists idx_omzet_maand_naam on omzet_maand(naam, maand);
+create index if not exists idx_omzet_maand_opmerking on omzet_maand(opmerking, maand);
+
+-- één regel bij (teken 1) of af (teken -1) boeken
+drop function if exists omzet_boeken(date, text, text, numeric, integer);
+create or replace function omzet_boeken(datum date, naam_ text, opmerking_ text, bedrag_ numeric,
+                                        ex_btw_ numeric, btw_ numeric, teken integer)
+returns void as $$
+declare
+    pct numeric;
+    incl numeric := coalesce(bedrag_, 0);
+    ex numeric := ex_btw_;
+begin
+    if datum is null or nullif(btrim(naam_), '') is null then
+        return;
+    end if;
+    if ex is null then
+        select btw_incl_pct into pct from tarieven where item = opmerking_;
+        ex := round(incl / (100 + coalesce(pct, 21)) * 100, 2);
+    end if;
+    insert into omzet_maand as m (maand, naam, opmerking, aantal, totaal_ex, totaal_btw, totaal_inc)
+    values (date_trunc('month', datum)::date, naam_, coalesce(opmerking_, ''), teken,
+            teken * ex, teken * coalesce(btw_, incl - ex), teken * incl)
+    on conflict (maand, naam, opmerking) do update
+        set aantal = m.aantal + excluded.aantal,
+            totaal_ex = m.totaal_ex + excluded.totaal_ex,
+            totaal_btw = m.totaal_btw + excluded.totaal_btw,
+            totaal_inc = m.totaal_inc + excluded.totaal_inc;
+end;
+$$ language plpgsql;
+
+create or replace function omzet_bijwerken() returns trigger as $$
+begin
+    if current_setting('app.archiveren', true) = 'aan' then
+        return null;
+    end if;
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform omzet_boeken(old.datum_dienst, old.naam, old.opmerking, old.bedrag, old.ex_btw, old.btw_21_pct, -1);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform omzet_boeken(new.datum_dienst, new.naam, new.opmerking, new.bedrag, new.ex_btw, new.btw_21_pct, 1);
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+create or replace trigger trg_overzicht_omzet
+    after insert or update of datum_dienst, naam, opmerking, bedrag, ex_btw, btw_21_pct or delete on overzicht
+    for each row execute function omzet_bijwerken();
+
+-- opnieuw opbouwen, voor één tariefcode of (code null) helemaal; zelfde
+-- rekenwijze als omzet_boeken (opgeslagen ex_btw/btw_21_pct per regel)
+create or replace function herbereken_omzet(code text default null) returns integer
+security definer set search_path = public as $$
+declare
+    n integer;
+begin
+    delete from omzet_maand where code is null or opmerking = coalesce(code, '');
+    insert into omzet_maand (maand, naam, opmerking, aantal, totaal_ex, totaal_btw, totaal_inc)
+    select date_trunc('month', r.datum_dienst)::date, r.naam, coalesce(r.opmerking, ''), count(*),
+           sum(r.ex), sum(coalesce(r.btw, r.incl - r.ex)), sum(r.incl)
+    from (
+        select o.datum_dienst, o.naam, o.opmerking, coalesce(o.bedrag, 0) as incl, o.btw_21_pct as btw,
+               coalesce(o.ex_btw, round(coalesce(o.bedrag, 0) / (100 + coalesce(t.btw_incl_pct, 21)) * 100, 2)) as ex
+        from overzicht_met_historie o
+        left join tarieven t on t.item = o.opmerking
+        where o.datum_dienst is not null and nullif(btrim(o.naam), '') is not null
+          and (code is null or coalesce(o.opmerking, '') = code)
+    ) r
+    group by 1, 2, 3;
+    get diagnostics n = row_count;
+    return n;
+end;
+$$ language plpgsql;
+
+revoke execute on function herbereken_omzet(text) from public, anon, authenticated;
+grant execute on function herbereken_omzet(text) to service_role;
+
+-- ander btw-percentage of andere code: de geraakte tariefcodes herberekenen
+-- (raakt alleen regels zonder opgeslagen ex_btw en een hernoemde code; als
+-- eigenaar, zodat het ook werkt voor rollen zonder execute op herbereken_omzet)
+create or replace function omzet_tarief_gewijzigd() returns trigger
+security definer set search_path = public as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') and old.item is not null then
+        perform herbereken_omzet(old.item);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') and new.item is not null
+            and (tg_op = 'INSERT' or new.item is distinct from old.item) then
+        perform herbereken_omzet(new.item);
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+create or replace trigger trg_tarieven_omzet
+    after insert or delete on tarieven
+    for each row execute function omzet_tarief_gewijzigd();
+
+create or replace trigger trg_tarieven_omzet_wijziging
+    after update on tarieven
+    for each row when (old.btw_incl_pct is distinct from new.btw_incl_pct or old.item is distinct from new.item)
+    execute function omzet_tarief_gewijzigd();
+
+-- (opnieuw) vullen uit alle live en gearchiveerde regels: op een bestaande
+-- database is omzet_maand anders leeg of nog met de oude rekenwijze gevuld
+select herbereken_omzet(null);
+
+-- omzet over [van, tot] (op hele maanden) per jaar, kwartaal, maand, client of tarief;
+-- gesorteerd op sleutel, per pagina van aantal_max regels na sleutel `na`
+-- (rpc-aanroepen kennen in postgrest-py geen order/limit)
+create or replace function omzet(per text, van date default null, tot date default null,
+                                 na text default null, aantal_max integer default 1000)
+returns table (sleutel text, aantal bigint, totaal_ex numeric, totaal_btw numeric, totaal_inc numeric)
+language sql stable as $$
+    select * from (
+        select case per
+                   when 'jaar' then to_char(m.maand, 'YYYY')
+                   when 'kwartaal' then to_char(m.maand, 'YYYY-"K"Q')
+                   when 'maand' then to_char(m.maand, 'YYYY-MM')
+                   when 'client' then m.naam
+                   when 'tarief' then m.opmerking
+               end as sleutel,
+               sum(m.aantal)::bigint as aantal,
+               sum(m.totaal_ex) as totaal_ex,
+               sum(m.totaal_btw) as totaal_btw,
+               sum(m.totaal_inc) as totaal_inc
+        from omzet_maand m
+        where (van is null or m.maand >= date_trunc('month', van))
+          and (tot is null or m.maand <= tot)
+          -- per client/tarief is de sleutel een kolom: vóór het groeperen al verder na `na`
+          and (na is null or per not in ('client', 'tarief')
+               or (case per when 'client' then m.naam else m.opmerking end) > na)
+        group by 1
+        having sum(m.aantal) <> 0
+    ) r
+    where na is null or r.sleutel > na
+    order by r.sleutel
+    limit aantal_max
+$$;
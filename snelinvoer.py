@@ -0,0 +1,198 @@
+# snelinvoer.py
+"""
+Sessies invoeren voor het overzicht: één via het formulier of een hele reeks
+tegelijk (geplakte regels uit Excel of een agenda-export als CSV).
+Clientnamen en tariefcodes worden tegen gecachte lookups opgelost, de
+BTW-splitsing gebeurt in één keer voor de hele batch met Decimal, en alles
+gaat in één bulk-insert naar de overzicht-tabel.
+"""
+
+import io
+import csv
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+import zoekindex
+import referentie
+from db import bulk_mutatie, als_decimal
+
+# ---------- CONFIG ----------
+STANDAARD_BTW = Decimal("21")
+CENT = Decimal("0.01")
+
+# kolomnamen uit plak-regels en agenda-exports → veld
+KOLOM_ALIASSEN = {
+    "datum": "datum", "date": "datum", "start date": "datum", "startdatum": "datum", "datum_dienst": "datum",
+    "naam": "naam", "naam client": "naam", "client": "naam", "subject": "naam", "onderwerp": "naam",
+    "tijd": "tijd", "time": "tijd", "start time": "tijd", "begintijd": "tijd",
+    "opmerking": "opmerking", "tarief": "opmerking", "code": "opmerking", "description": "opmerking",
+    "bedrag": "bedrag", "bedrag_incl": "bedrag", "bedrag incl": "bedrag", "amount": "bedrag",
+    "contant": "contant",
+    "te_ontvangen": "te_ontvangen", "te ontvangen": "te_ontvangen",
+    "factuurnummer": "factuurnummer", "factuurnr": "factuurnummer",
+    "deb_nr": "deb_nr", "debiteurnr": "deb_nr",
+}
+# volgorde van geplakte regels zonder kopregel
+STANDAARD_KOLOMMEN = ["datum", "naam", "tijd", "opmerking", "bedrag"]
+
+JA = {"j", "ja", "y", "yes", "true", "1", "on", "x"}
+
+# ---------- BTW ----------
+def btw_splitsing(bedragen_incl, btw_pcts):
+    """(ex_btw, btw) per regel, op centen afgerond.
+
+    Zelfde rekenwijze als één regel via het formulier: ex = incl / (100 + pct) * 100.
+    De deler wordt per tarief één keer berekend; btw = incl - ex, zodat
+    ex + btw altijd precies het bedrag incl. is.
+    """
+    delers = {pct: 100 + pct for pct in set(btw_pcts)}
+    ex = [(incl / delers[pct] * 100).quantize(CENT, ROUND_HALF_UP)
+          for incl, pct in zip(bedragen_incl, btw_pcts)]
+    return [(e, incl - e) for e, incl in zip(ex, bedragen_incl)]
+
+def overzicht_rij(velden: dict, ex_btw: Decimal, btw: Decimal) -> dict:
+    """Insert-rij voor de overzicht-tabel (JSON-klaar)."""
+    bedrag = str(velden["bedrag"])
+    return {
+        "datum_dienst": velden["datum"].isoformat(),
+        "naam": velden["naam"],
+        "tijd": velden["tijd"],
+        "contant": velden["contant"],
+        "te_ontvangen": str(velden["te_ontvangen"]) if velden["te_ontvangen"] is not None else bedrag,
+        "opmerking": velden["opmerking"],
+        "bedrag": bedrag,
+        "ex_btw": str(ex_btw),
+        "btw_21_pct": str(btw),
+        "factuurbedrag": bedrag,
+        "factuurnummer": velden["factuurnummer"],
+        "datum_factuur": date.today().isoformat(),
+        "deb_nr": velden["deb_nr"],
+    }
+
+# ---------- LOOKUPS ----------
+def tarieven(sb) -> dict:
+    """Tariefcode (hoofdletters) → tarief, uit de referentie-cache."""
+    return {r["item"].strip().upper(): r for r in referentie.tarieven(sb) if r["item"]}
+
+# ---------- PARSEN ----------
+def parse_bedrag(tekst):
+    if not tekst:
+        return None
+    if "," in tekst:
+        tekst = tekst.replace(".", "").replace(",", ".")
+    try:
+        return Decimal(tekst.replace("€", "").strip())
+    except InvalidOperation:
+        raise ValueError(f"ongeldig bedrag '{tekst}'")
+
+def parse_datum(tekst):
+    for fmt in ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%d-%m-%y"):
+        try:
+            return datetime.strptime(tekst, fmt).date()
+        except (TypeError, ValueError):
+            continue
+    raise ValueError(f"ongeldige datum '{tekst or ''}'")
+
+def parse_tijd(tekst):
+    if not tekst:
+        return None
+    for fmt in ("%H:%M", "%H:%M:%S", "%H.%M"):
+        try:
+            return datetime.strptime(tekst, fmt).strftime("%H:%M")
+        except ValueError:
+            continue
+    raise ValueError(f"ongeldige tijd '{tekst}'")
+
+def lees_regels(tekst: str):
+    """Geplakte regels of CSV-tekst → lijst (regelnummer, dict veld → tekst).
+
+    Scheidingsteken: tab als die in de tekst staat (plakken uit Excel), anders
+    ; (CSV uit NL Excel) en pas als laatste , — bedragen met een decimale
+    komma blijven zo heel. Een kopregel is optioneel: zonder kopregel gelden
+    de kolommen STANDAARD_KOLOMMEN.
+    """
+    tekst = tekst.lstrip("\ufeff")
+    regels = [r for r in tekst.splitlines() if r.strip()]
+    if not regels:
+        return []
+    scheiding = next((t for t in ("\t", ";") if t in tekst), ",")
+    reader = csv.reader(io.StringIO("\n".join(regels)), delimiter=scheiding)
+    rijen = list(reader)
+
+    kop = [KOLOM_ALIASSEN.get(k.strip().lower()) for k in rijen[0]]
+    if "datum" in kop and "naam" in kop:
+        start = 2
+        rijen = rijen[1:]
+    else:
+        kop, start = STANDAARD_KOLOMMEN, 1
+    return [(nr, {veld: (waarde.strip() or None) for veld, waarde in zip(kop, rij) if veld})
+            for nr, rij in enumerate(rijen, start=start)]
+
+# ---------- BULK INVOER ----------
+def valideer(sb, regels):
+    """Lost clienten/tarieven op en controleert elke regel.
+
+    Geeft (geldig, fouten): geldig is een lijst (regelnummer, velden),
+    fouten een lijst {"regel", "fout"}.
+    """
+    clienten = referentie.clienten_op_naam(sb)
+    tarief_per_code = tarieven(sb)
+    geldig, fouten = [], []
+    for nr, rec in regels:
+        try:
+            client = clienten.get(zoekindex.normaliseer(rec.get("naam")))
+            if client is None:
+                suggestie = referentie.zoek_clienten(sb, rec.get("naam") or "", 1)
+                hint = f", bedoel je '{suggestie[0]['naam_client']}'?" if suggestie else ""
+                raise ValueError(f"onbekende client '{rec.get('naam') or ''}'{hint}")
+
+            code = (rec.get("opmerking") or "").strip()
+            tarief = tarief_per_code.get(code.upper())
+            if code and tarief is None:
+                raise ValueError(f"onbekende tariefcode '{code}'")
+            bedrag = parse_bedrag(rec.get("bedrag"))
+            if bedrag is None:
+                if tarief is None or tarief["bedrag"] is None:
+                    raise ValueError("geen bedrag en geen tarief met bedrag")
+                bedrag = als_decimal(tarief["bedrag"])
+            btw_pct = als_decimal(tarief["btw_incl_pct"], STANDAARD_BTW) if tarief else STANDAARD_BTW
+
+            geldig.append((nr, {
+                "datum": parse_datum(rec.get("datum")),
+                "naam": client["naam_client"],
+                "tijd": parse_tijd(rec.get("tijd")),
+                "contant": (rec.get("contant") or "").lower() in JA,
+                "te_ontvangen": parse_bedrag(rec.get("te_ontvangen")),
+                "opmerking": tarief["item"] if tarief else code,
+                "bedrag": bedrag.quantize(CENT, ROUND_HALF_UP),
+                "btw_pct": btw_pct,
+                "factuurnummer": rec.get("factuurnummer"),
+                "deb_nr": rec.get("deb_nr"),
+            }))
+        except ValueError as e:
+            fouten.append({"regel": nr, "fout": str(e)})
+    return geldig, fouten
+
+def bulk_invoeren(sb, tekst: str, alleen_controleren: bool = False) -> dict:
+    """Voert alle regels in één bulk-insert in; met een validatiefout in een regel
+    wordt niets ingevoerd.
+
+    Weigert de database de bulk-insert, dan probeert bulk_mutatie de regels
+    één voor één: de regels die lukken staan er dan wel in, de rest komt met
+    de fout in "fouten".
+    """
+    geldig, fouten = valideer(sb, lees_regels(tekst))
+    splitsing = btw_splitsing([v["bedrag"] for _, v in geldig], [v["btw_pct"] for _, v in geldig])
+    rows = [overzicht_rij(v, ex, btw) for (_, v), (ex, btw) in zip(geldig, splitsing)]
+    resultaat = {"regels": [dict(r, regel=nr) for (nr, _), r in zip(geldig, rows)],
+                 "fouten": fouten, "opgeslagen": 0}
+    if fouten or alleen_controleren or not rows:
+        return resultaat
+
+    opgeslagen = bulk_mutatie(sb, "overzicht", rows)["upserts"]
+    for (nr, _), r in zip(geldig, opgeslagen):
+        if r["status"] == "ok":
+            resultaat["opgeslagen"] += 1
+        else:
+            fouten.append({"regel": nr, "fout": r["fout"]})
+    return resultaat
@@ -0,0 +1,62 @@
+# tests/test_app.py
+import pytest
+
+import db
+import referentie
+from app import app
+from benchmarks.nepsupabase import NepSupabase
+
+FORMULIER = {"datum": "2026-01-05", "naam": "Jan Jansen", "tijd": "10:00", "te_ontvangen": "", "opmerking": "PGB1",
+             "bedrag_incl": "121", "btw_incl_pct": "21", "factuurnummer": "", "deb_nr": ""}
+
+@pytest.fixture
+def nep(monkeypatch):
+    nep = NepSupabase({"clienten": [{"id": "c1", "naam_client": "Jan Jansen", "klant_id": "1"},
+                                    {"id": "c2", "naam_client": "Piet de Vries", "klant_id": "2"}]})
+    monkeypatch.setattr(db, "_client", nep)
+    referentie.leeg()
+    yield nep
+    referentie.leeg()
+
+@pytest.fixture
+def client(nep):
+    return app.test_client()
+
+# ---------- snelinvoeren ----------
+def test_snelinvoeren_slaat_op(client, nep):
+    resp = client.post("/api/snelinvoeren", data=dict(FORMULIER, btw_incl_pct="0"))
+    assert resp.status_code == 302
+    [rij] = nep.tabel("overzicht")
+    assert (rij["bedrag"], rij["ex_btw"], rij["btw_21_pct"]) == ("121", "121.00", "0.00")
+
+@pytest.mark.parametrize("veld,waarde,melding", [
+    ("datum", "gisteren", "ongeldige datum 'gisteren'"),
+    ("bedrag_incl", "veel", "ongeldig bedrag 'veel'"),
+    ("btw_incl_pct", "21%", "ongeldig bedrag '21%'"),
+    ("tijd", "10u", "ongeldige tijd '10u'"),
+])
+def test_snelinvoeren_ongeldige_invoer_geeft_400(client, nep, veld, waarde, melding):
+    resp = client.post("/api/snelinvoeren", data=dict(FORMULIER, **{veld: waarde}))
+    assert resp.status_code == 400
+    html = resp.get_data(as_text=True)
+    assert melding.replace("'", "&#39;") in html
+    # het formulier komt terug met de ingevulde waarden
+    assert 'value="Jan Jansen"' in html
+    assert nep.tabel("overzicht") == []
+
+# ---------- autocomplete ----------
+def test_autocomplete(client):
+    resp = client.get("/api/autocomplete/clienten?q=jan")
+    assert resp.status_code == 200
+    assert [c["naam_client"] for c in resp.get_json()] == ["Jan Jansen"]
+
+def test_autocomplete_limit_maximaal_50(client, nep):
+    nep.table("clienten").insert([{"naam_client": f"Jan {i}"} for i in range(60)]).execute()
+    referentie.leeg()
+    assert len(client.get("/api/autocomplete/clienten?q=jan&limit=500").get_json()) == 50
+
+@pytest.mark.parametrize("limit", ["abc", "-1", "0", "1.5", ""])
+def test_autocomplete_ongeldige_limit_geeft_400(client, limit):
+    resp = client.get(f"/api/autocomplete/clienten?q=jan&limit={limit}")
+    assert resp.status_code == 400
+    assert "ongeldige limit" in resp.get_json()["fout"]
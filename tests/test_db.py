@@ -0,0 +1,144 @@
+# tests/test_db.py
+import random
+
+import pytest
+from supabase import create_client
+
+import db
+from db import bulk_mutatie, lees_op_volgorde, lees_overzicht, lees_tabel
+from benchmarks.nepsupabase import NepSupabase
+from benchmarks.nepserver import NEP_KEY, start_op_achtergrond
+
+def _overzicht(aantal=47, seed=1):
+    rnd = random.Random(seed)
+    # weinig datums, veel gelijke datum_dienst: elke paginagrens valt midden in een datum
+    datums = ["2026-01-05", "2026-01-06", "2026-01-07", None]
+    return [{"id": f"{i:08x}-0000-0000-0000-000000000000", "datum_dienst": rnd.choice(datums),
+             "naam": rnd.choice(["Jan Jansen", "Piet de Vries"]), "bedrag": 85} for i in rnd.sample(range(1000), aantal)]
+
+def _verwacht(rows):
+    return sorted(rows, key=lambda r: (r["datum_dienst"] is None, r["datum_dienst"] or "", r["id"]))
+
+@pytest.fixture(params=["direct", "http"])
+def maak_sb(request):
+    servers = []
+
+    def maak(rows):
+        nep = NepSupabase({"overzicht": rows})
+        if request.param == "direct":
+            return nep
+        # via de echte postgrest-client en een server met een kleine max-rows
+        servers.append(start_op_achtergrond(nep, max_rijen=10))
+        return create_client(f"http://127.0.0.1:{servers[-1].server_port}", NEP_KEY)
+
+    yield maak
+    for server in servers:
+        server.shutdown()
+
+@pytest.fixture
+def sb(maak_sb):
+    return maak_sb(_overzicht())
+
+@pytest.mark.parametrize("pagina", [1, 3, 7, 10])
+def test_lees_overzicht_keyset_met_gelijke_datums(sb, pagina):
+    gelezen = [(r["datum_dienst"], r["id"]) for r in lees_overzicht(sb, "naam", pagina=pagina)]
+    assert gelezen == [(r["datum_dienst"], r["id"]) for r in _verwacht(_overzicht())]
+
+@pytest.mark.parametrize("pagina", [1, 4, 10])
+def test_lees_overzicht_keyset_met_filter(sb, pagina):
+    gelezen = list(lees_overzicht(sb, "naam,bedrag", filters=lambda q: q.eq("naam", "Piet de Vries"), pagina=pagina))
+    assert [r["id"] for r in gelezen] == [r["id"] for r in _verwacht(_overzicht()) if r["naam"] == "Piet de Vries"]
+    # de sleutelkolommen komen mee, ook als ze niet gevraagd zijn
+    assert set(gelezen[0]) == {"naam", "bedrag", "datum_dienst", "id"}
+
+@pytest.mark.parametrize("pagina", [5, 10])
+def test_lees_overzicht_pagina_precies_vol(maak_sb, pagina):
+    # aantal rijen een veelvoud van de pagina (en alles op één datum): de laatste pagina is leeg
+    rows = [{"id": f"{i:08x}-0000-0000-0000-000000000000", "datum_dienst": "2026-01-05", "naam": "Jan Jansen"}
+            for i in range(30)]
+    assert [r["id"] for r in lees_overzicht(maak_sb(rows), "naam", pagina=pagina)] == [r["id"] for r in rows]
+
+@pytest.mark.parametrize("pagina", [1, 5, 10])
+def test_lees_tabel_keyset(sb, pagina):
+    gelezen = [r["id"] for r in lees_tabel(sb, "overzicht", "naam", pagina=pagina)]
+    assert gelezen == sorted(r["id"] for r in _overzicht())
+
+@pytest.mark.parametrize("pagina", [1, 4, 10])
+def test_lees_op_volgorde_met_filter(maak_sb, pagina):
+    # zoals replica._wijzigingen: veel rijen met dezelfde gewijzigd_op
+    tijden = ["2026-01-05T10:00:00+00:00", "2026-01-05T11:00:00+00:00", "2026-01-05T12:00:00+00:00"]
+    rows = [{"id": f"{i:08x}-0000-0000-0000-000000000000", "gewijzigd_op": tijden[i % 3]} for i in range(25)]
+    sinds = tijden[0]
+    gelezen = lees_op_volgorde(maak_sb(rows), "overzicht", "gewijzigd_op", "id",
+                               filters=lambda q: q.gt("gewijzigd_op", sinds), pagina=pagina)
+    assert [r["id"] for r in gelezen] == [r["id"] for r in sorted(rows, key=lambda r: (r["gewijzigd_op"], r["id"]))
+                                          if r["gewijzigd_op"] > sinds]
+
+def test_lees_tabel_op_andere_sleutel():
+    nep = NepSupabase({"per_naam": [{"naam": n, "aantal": i} for i, n in enumerate("edcba")]})
+    assert [r["naam"] for r in lees_tabel(nep, "per_naam", "aantal", pagina=2, sleutel="naam")] == list("abcde")
+
+# ---------- bulk_mutatie ----------
+def _clienten():
+    return NepSupabase({"clienten": [
+        {"id": "c1", "naam_client": "Jan Jansen", "bsn_nr": "111"},
+        {"id": "c2", "naam_client": "Piet de Vries", "bsn_nr": "222"},
+    ]})
+
+def _tel_calls(nep):
+    """Telt de requests per soort (upsert/insert/delete) op de stand-in."""
+    calls = []
+    table = nep.table
+
+    def geteld(naam):
+        q = table(naam)
+        for soort in ("upsert", "insert", "delete"):
+            def doe(*args, _soort=soort, _orig=getattr(q, soort), **kw):
+                calls.append(_soort)
+                return _orig(*args, **kw)
+            setattr(q, soort, doe)
+        return q
+
+    nep.table = geteld
+    return calls
+
+def test_bulk_mutatie_bijwerken_invoegen_en_verwijderen():
+    nep = _clienten()
+    uit = bulk_mutatie(nep, "clienten",
+                       upserts=[{"naam_client": "Klaas Bos", "bsn_nr": "333"},
+                                {"id": "c1", "naam_client": "Jan Janssen"},
+                                {"id": "", "naam_client": "Els Smit"}],
+                       deletes=["c2", "bestaat-niet", "c2", None])
+    assert [r["status"] for r in uit["upserts"]] == ["ok", "ok", "ok"]
+    # resultaten in de volgorde van de invoer; ingevoegde rijen krijgen een id
+    assert [r["rij"]["naam_client"] for r in uit["upserts"]] == ["Klaas Bos", "Jan Janssen", "Els Smit"]
+    assert uit["upserts"][1]["rij"]["id"] == "c1" and uit["upserts"][0]["rij"]["id"]
+    assert uit["deletes"] == [{"id": "c2", "status": "ok"}, {"id": "bestaat-niet", "status": "niet_gevonden"}]
+    assert sorted(r["naam_client"] for r in nep.tabel("clienten")) == ["Els Smit", "Jan Janssen", "Klaas Bos"]
+
+def test_bulk_mutatie_chunkt_per_kolommen(monkeypatch):
+    monkeypatch.setattr(db, "BULK_CHUNK", 2)
+    monkeypatch.setattr(db, "BULK_DELETE_CHUNK", 2)
+    nep = NepSupabase({"overzicht": [{"id": f"o{i}", "naam": "Jan Jansen"} for i in range(5)]})
+    calls = _tel_calls(nep)
+    upserts = ([{"naam": f"Nieuw {i}"} for i in range(5)]                      # 3 inserts van max 2
+               + [{"naam": "Piet", "bedrag": 85}]                             # andere kolommen: eigen insert
+               + [{"id": f"o{i}", "bedrag": 100} for i in range(3)])          # 2 upserts
+    uit = bulk_mutatie(nep, "overzicht", upserts=upserts, deletes=["o3", "o4", "o9"])
+    assert sorted(calls) == ["delete"] * 2 + ["insert"] * 4 + ["upsert"] * 2
+    assert all(r["status"] == "ok" for r in uit["upserts"])
+    assert [r["status"] for r in uit["deletes"]] == ["ok", "ok", "niet_gevonden"]
+
+def test_bulk_mutatie_fout_komt_bij_de_juiste_rij():
+    nep = _clienten()
+    calls = _tel_calls(nep)
+    uit = bulk_mutatie(nep, "clienten", upserts=[
+        {"naam_client": "Klaas Bos", "bsn_nr": "333"},
+        {"naam_client": "Dubbel", "bsn_nr": "111"},
+        {"naam_client": "Els Smit", "bsn_nr": "444"},
+    ])
+    assert [r["status"] for r in uit["upserts"]] == ["ok", "fout", "ok"]
+    assert "clienten_bsn_nr_key" in uit["upserts"][1]["fout"]
+    # eerst de hele chunk, na de fout rij voor rij
+    assert calls == ["insert"] * 4
+    assert sorted(r["naam_client"] for r in nep.tabel("clienten")) == ["Els Smit", "Jan Jansen", "Klaas Bos", "Piet de Vries"]
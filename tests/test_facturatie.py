@@ -0,0 +1,91 @@
+# tests/test_facturatie.py
+from decimal import Decimal
+
+import facturatie
+
+# [item, bedrag, btw_incl_pct, omschrijving_op_factuur], zoals get_tarieven()
+TARIEVEN = [
+    ["PGB1", 85.0, 21.0, facturatie.PERSOONLIJKE_BEGELEIDING],
+    ["PGB2", 170.0, 21.0, facturatie.PERSOONLIJKE_BEGELEIDING],
+    ["CONS", 95.0, 21.0, "consult"],
+    ["CONS", 1.0, 9.0, "dubbel"],
+]
+ADRESSEN = {
+    facturatie.normaliseer("Jan Jansen"): ["Jan Jansen", "Dorpsstraat 1", "1234 AB", "Ergens", "Nederland",
+                                           None, None, None, None, "", "", "jan@example.nl", "1"],
+}
+
+def _rij(naam, datum, opmerking, bedrag, btw, factuurnummer, deb_nr="1"):
+    return {"naam": naam, "datum_dienst": datum, "opmerking": opmerking, "bedrag": bedrag, "btw_21_pct": btw,
+            "factuurnummer": factuurnummer, "deb_nr": deb_nr}
+
+def _plannen(rows):
+    return list(facturatie.factuurplannen(facturatie.groepeer_per_naam(rows), TARIEVEN, ADRESSEN))
+
+def test_groeperen_per_naam_slaat_lege_namen_over():
+    rows = [_rij("Jan Jansen", "2026-01-02", "CONS", 95, 16.49, "F1"), _rij(" ", "2026-01-03", "CONS", 95, 16.49, "F9"),
+            _rij("Piet de Vries", "2026-01-04", "CONS", 95, 16.49, "F2"),
+            _rij("Jan Jansen", "2026-01-05", "CONS", 95, 16.49, "F1")]
+    groepen = facturatie.groepeer_per_naam(rows)
+    assert list(groepen) == ["Jan Jansen", "Piet de Vries"]
+    assert [r["datum_dienst"] for r in groepen["Jan Jansen"]] == ["2026-01-02", "2026-01-05"]
+
+def test_een_factuur_per_factuurnummer_met_alle_regels_van_de_naam():
+    rows = [_rij("Jan Jansen", "2026-01-02", "CONS", 95, 16.49, "F1"),
+            _rij("Jan Jansen", "2026-01-09", "CONS", 95, 16.49, "F1"),
+            _rij("Piet de Vries", "2026-01-04", "CONS", 95, 16.49, "F2", deb_nr="2")]
+    plannen = _plannen(rows)
+    assert [(p["client"]["naam"], p["client"]["factuurnummer"], p["client"]["deb_nr"]) for p in plannen] == [
+        ("Jan Jansen", "F1", "1"), ("Piet de Vries", "F2", "2")]
+    assert [r["datum"] for r in plannen[0]["regels"]] == ["02-01-2026", "09-01-2026"]
+    # bij dubbele tariefcodes wint de eerste
+    assert {r["omschrijving"] for r in plannen[0]["regels"]} == {"consult"}
+
+def test_nieuw_factuurnummer_binnen_een_naam_geeft_nieuwe_factuur():
+    rows = [_rij("Jan Jansen", "2026-01-02", "CONS", 95, 16.49, "F1"),
+            _rij("Jan Jansen", "2026-02-02", "CONS", 95, 16.49, "F3")]
+    assert [p["client"]["factuurnummer"] for p in _plannen(rows)] == ["F1", "F3"]
+
+def test_persoonlijke_begeleiding_per_naam_een_factuur_ook_bij_zelfde_nummer():
+    rows = [_rij("Jan Jansen", "2026-01-02", "PGB1", 85, 14.75, "F1"),
+            _rij("Piet de Vries", "2026-01-02", "PGB2", 170, 29.50, "F1", deb_nr="2")]
+    plannen = _plannen(rows)
+    assert [(p["client"]["naam"], p["client"]["factuurnummer"]) for p in plannen] == [
+        ("Jan Jansen", "F1"), ("Piet de Vries", "F1")]
+    # uren per tariefcode; het uurtarief is dat van PGB1
+    assert [(r["uren"], r["tarief"]) for r in plannen[1]["regels"]] == [(2, 85.0)]
+
+def test_btw_en_totalen_komen_uit_de_opgeslagen_splitsing():
+    rows = [_rij("Jan Jansen", "2026-01-02", "PGB1", 85, 14.75, "F1"),
+            _rij("Jan Jansen", "2026-01-03", "PGB1", "1085.50", "188.39", "F1")]
+    [plan] = _plannen(rows)
+    assert f"{plan['totaal_btw']:.2f}" == "203.14"
+    assert f"{plan['totaal_bedrag']:.2f}" == "1170.50"
+    assert plan["email"] == "jan@example.nl"
+    assert (plan["client"]["straat"], plan["client"]["postcode"]) == ("Dorpsstraat 1", "1234 AB")
+
+def test_afronden_op_centen_is_exact():
+    # 0,10 + 0,20 + ... is in float niet exact; op de factuur (%.2f) moet het op de cent kloppen
+    bedragen = [0.1, 0.2, 70.25, 0.05, 14.15, 33.33, 0.01] * 40
+    btw = [0.02, 0.03, 12.19, 0.01, 2.46, 5.78, 0.0] * 40
+    rows = [_rij("Jan Jansen", "2026-01-02", "CONS", b, t, "F1") for b, t in zip(bedragen, btw)]
+    [plan] = _plannen(rows)
+    assert f"{plan['totaal_bedrag']:.2f}" == str(sum(Decimal(str(b)) for b in bedragen))
+    assert f"{plan['totaal_btw']:.2f}" == str(sum(Decimal(str(t)) for t in btw))
+    html = facturatie.render_invoice_html(plan["client"], plan["regels"], plan["totaal_btw"],
+                                          plan["totaal_bedrag"])
+    assert f"€ {sum(Decimal(str(b)) for b in bedragen)}" in html
+
+def test_onbekende_client_krijgt_leeg_adres():
+    [plan] = _plannen([_rij("Onbekend", "2026-01-02", "XX", 50, 8.68, "F5")])
+    assert plan["client"]["straat"] == "" and plan["email"] == ""
+    assert plan["regels"][0]["omschrijving"] == ""
+
+def test_verzamel_facturen_splitst_gelukt_en_mislukt(capsys):
+    plannen = _plannen([_rij("Jan Jansen", "2026-01-02", "CONS", 95, 16.49, "F1"),
+                        _rij("Piet de Vries", "2026-01-04", "CONS", 95, 16.49, "F2")])
+    facturen, fouten = facturatie.verzamel_facturen(plannen, [{"pdf_path": "f1.pdf", "fout": None},
+                                                             {"pdf_path": "f2.pdf", "fout": "OSError: schijf vol"}])
+    assert facturen == [{"naam": "Jan Jansen", "factuurnummer": "F1", "email": "jan@example.nl", "pdf_path": "f1.pdf"}]
+    assert fouten == [{"factuurnummer": "F2", "fout": "OSError: schijf vol"}]
+    assert "Factuur F2 (Piet de Vries) mislukt" in capsys.readouterr().out
@@ -0,0 +1,48 @@
+# tests/test_facturenaanmaken.py
+import pytest
+
+import db
+import facturenaanmaken
+from benchmarks.nepsupabase import NepSupabase
+
+WATERMARK = "2026-01-31T12:00:00+00:00"
+
+@pytest.fixture
+def nep(monkeypatch):
+    nep = NepSupabase({"overzicht": [
+        {"id": "o1", "naam": "Jan Jansen", "gewijzigd_op": "2026-01-31T11:55:00+00:00"},
+        # na de vorige run gecommit, maar met een gewijzigd_op van vóór het watermark
+        {"id": "o2", "naam": "Piet de Vries", "gewijzigd_op": "2026-01-31T11:59:30+00:00"},
+        {"id": "o3", "naam": "Jan Jansen", "gewijzigd_op": "2026-01-31T12:05:00+00:00"},
+        {"id": "o4", "naam": "Jan Jansen", "gewijzigd_op": "2026-01-31T12:06:00.5+00:00"},
+        {"id": "o5", "naam": "  ", "gewijzigd_op": "2026-01-31T12:07:00+00:00"},
+    ]})
+    monkeypatch.setattr(db, "_client", nep)
+    return nep
+
+def test_gewijzigde_namen_kijkt_terug_voor_het_watermark(nep):
+    namen, nieuwe_watermark = facturenaanmaken.gewijzigde_namen(WATERMARK)
+    assert namen == {"Jan Jansen", "Piet de Vries"}
+    assert nieuwe_watermark == "2026-01-31T12:07:00+00:00"
+
+def test_gewijzigde_namen_zonder_overlap(nep, monkeypatch):
+    monkeypatch.setattr(facturenaanmaken, "FACTUUR_OVERLAP", 0)
+    namen, _ = facturenaanmaken.gewijzigde_namen(WATERMARK)
+    assert namen == {"Jan Jansen"}
+
+def test_watermark_blijft_staan_zonder_wijzigingen(nep):
+    namen, nieuwe_watermark = facturenaanmaken.gewijzigde_namen("2026-02-01T00:00:00+00:00")
+    assert namen == set()
+    assert nieuwe_watermark == "2026-02-01T00:00:00+00:00"
+
+def test_register_last_invoices_per_chunk(nep, monkeypatch):
+    monkeypatch.setattr(facturenaanmaken, "BULK_CHUNK", 2)
+    nep.tabellen["clienten"] = [{"id": "c1", "naam_client": "Jan Jansen"}, {"id": "c2", "naam_client": "Jan Jansen"},
+                                {"id": "c3", "naam_client": "Piet de Vries"}, {"id": "c4", "naam_client": "Klaas Bos"}]
+    voor = nep.queries
+    facturenaanmaken.register_last_invoices([
+        {"naam": "Jan Jansen", "factuurnummer": "2026-001"}, {"naam": "Piet de Vries", "factuurnummer": "2026-002"},
+        {"naam": "Els Smit", "factuurnummer": "2026-003"}])
+    assert nep.queries - voor == 2
+    assert {r["id"]: r.get("laatste_factuurnr") for r in nep.tabel("clienten")} == {
+        "c1": "2026-001", "c2": "2026-001", "c3": "2026-002", "c4": None}
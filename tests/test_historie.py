@@ -0,0 +1,66 @@
+# tests/test_historie.py
+import pytest
+from supabase import create_client
+
+import historie
+from benchmarks.nepsupabase import NepSupabase
+from benchmarks.nepserver import NEP_KEY, NEP_SERVICE_KEY, start_op_achtergrond
+
+@pytest.fixture
+def nep():
+    return NepSupabase({"overzicht": [
+        {"id": "o1", "datum_dienst": "2025-03-01", "naam": "Jan Jansen", "bedrag": 85,
+         "gewijzigd_op": "2026-01-01T10:00:00+00:00"},
+        {"id": "o2", "datum_dienst": "2026-01-05", "naam": "Jan Jansen", "bedrag": 85,
+         "gewijzigd_op": "2026-01-02T10:00:00+00:00"},
+        {"id": "o3", "datum_dienst": "2026-01-06", "naam": "Piet de Vries", "bedrag": 85,
+         "gewijzigd_op": "2026-01-03T10:00:00+00:00"},
+    ]})
+
+@pytest.fixture
+def server(nep):
+    server = start_op_achtergrond(nep)
+    yield server
+    server.shutdown()
+
+@pytest.fixture
+def sb(server):
+    # de echte supabase-py client over HTTP: het antwoord gaat door postgrest's APIResponse;
+    # archiveren mag alleen met de service-role key
+    return create_client(f"http://127.0.0.1:{server.server_port}", NEP_SERVICE_KEY)
+
+@pytest.fixture
+def sb_anon(server):
+    return create_client(f"http://127.0.0.1:{server.server_port}", NEP_KEY)
+
+def _geprint(nep, *ids):
+    return [dict(r) for r in nep.tabel("overzicht") if r["id"] in ids]
+
+def test_archiveer_via_postgrest(nep, sb):
+    assert historie.archiveer(sb, _geprint(nep, "o1", "o2")) == 2
+    assert [r["id"] for r in nep.tabel("overzicht")] == ["o3"]
+    assert sorted(r["id"] for r in nep.tabel("overzicht_historie")) == ["o1", "o2"]
+
+def test_archiveer_zonder_regels(sb):
+    assert historie.archiveer(sb, []) == 0
+
+def test_archiveer_laat_na_het_lezen_gewijzigde_regels_staan(nep, sb):
+    geprint = _geprint(nep, "o1", "o2", "o3")
+    # o2 wordt tijdens de run bewerkt (en krijgt een nieuw gewijzigd_op)
+    sb.table("overzicht").update({"bedrag": 95}).eq("id", "o2").execute()
+    assert historie.archiveer(sb, geprint) == 2
+    assert [r["id"] for r in nep.tabel("overzicht")] == ["o2"]
+
+def test_factuur_en_client_lezen_live_en_historie(nep, sb):
+    historie.archiveer(sb, _geprint(nep, "o1", "o2"))
+    assert [r["id"] for r in historie.client(sb, "Jan Jansen")] == ["o1", "o2"]
+    assert [r["id"] for r in historie.client(sb, "Piet de Vries")] == ["o3"]
+
+def test_controleer_met_service_key(nep, sb):
+    historie.controleer(sb)
+    assert len(nep.tabel("overzicht")) == 3
+
+def test_controleer_faalt_met_anon_key(nep, sb_anon):
+    with pytest.raises(RuntimeError, match="service-role"):
+        historie.controleer(sb_anon)
+    assert len(nep.tabel("overzicht")) == 3
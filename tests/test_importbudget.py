@@ -0,0 +1,7 @@
+# tests/test_importbudget.py
+from benchmarks import importbudget
+
+def test_import_app_binnen_budget():
+    resultaat = importbudget.meet(3)
+    assert resultaat["te_vroeg_geladen"] == []
+    assert resultaat["mediaan_ms"] <= resultaat["budget_ms"], resultaat
@@ -0,0 +1,109 @@
+# tests/test_importdata.py
+import json
+
+import pytest
+
+import db
+import importdata
+from benchmarks.nepsupabase import NepSupabase
+
+KOPJE = "naam client;Klant-ID;Woonplaats"
+
+@pytest.fixture
+def csv(tmp_path, monkeypatch):
+    """Schrijft clienten.csv in tmp_path; snapshot ook daar, database is de stand-in."""
+    pad = tmp_path / "clienten.csv"
+    monkeypatch.setattr(importdata, "CLIENTEN_CSV", pad)
+    monkeypatch.setattr(importdata, "IMPORT_SNAPSHOT", tmp_path / "snapshot.json")
+    monkeypatch.setattr(db, "_client", NepSupabase({"clienten": [{"id": "c0", "naam_client": "Oud", "klant_id": "7"}]}))
+
+    def schrijf(*regels):
+        pad.write_text("\n".join((KOPJE,) + regels) + "\n", encoding="utf-8")
+    return schrijf
+
+@pytest.fixture
+def verstuurd(monkeypatch):
+    """Houdt bij welke clientregels er per run naar de database gaan."""
+    runs = []
+    echt = importdata.bulk_upsert
+
+    def bulk_upsert(tabel, rows, on_conflict, dubbel=None):
+        rows = list(rows)
+        runs.append({r[on_conflict]: r for r in rows})
+        return echt(tabel, rows, on_conflict, dubbel)
+
+    monkeypatch.setattr(importdata, "bulk_upsert", bulk_upsert)
+    return runs
+
+def _klant_ids():
+    return {r["naam_client"]: r["klant_id"] for r in db._client.tabel("clienten")}
+
+# ---------- hernummeren ----------
+def test_leeg_en_dubbel_klant_id_krijgen_een_nieuw_id(csv, verstuurd, capsys):
+    csv("Jan Jansen;1;Ergens", "Piet de Vries;;Ergens", "Klaas Bos;1;Elders", "Els Smit;5;Ergens")
+    importdata.import_clienten()
+    # hoogste id (ook uit de database) + 1, in CSV-volgorde
+    assert _klant_ids() == {"Oud": "7", "Jan Jansen": "1", "Piet de Vries": "8", "Klaas Bos": "9", "Els Smit": "5"}
+    uit = capsys.readouterr().out
+    assert "regel 3 (Piet de Vries): (leeg) → 8" in uit and "regel 4 (Klaas Bos): 1 → 9" in uit
+
+def test_nieuw_id_blijft_gelijk_bij_een_volgende_run(csv, verstuurd):
+    csv("Jan Jansen;1;Ergens", "Piet de Vries;;Ergens", "Klaas Bos;1;Elders")
+    importdata.import_clienten()
+    csv("Nieuw;;Ergens", "Jan Jansen;1;Ergens", "Piet de Vries;;Elders", "Klaas Bos;1;Elders")
+    importdata.import_clienten()
+    ids = _klant_ids()
+    assert (ids["Piet de Vries"], ids["Klaas Bos"], ids["Nieuw"]) == ("8", "9", "10")
+    assert len(db._client.tabel("clienten")) == 5
+
+def test_dubbele_regels_met_dezelfde_naam_blijven_apart(csv, verstuurd):
+    csv("Jan Jansen;;Ergens", "jan  jansen;;Elders")
+    importdata.import_clienten()
+    assert sorted(verstuurd[0]) == ["8", "9"]
+    assert sorted(r["woonplaats"] for r in db._client.tabel("clienten") if r["klant_id"] != "7") == ["Elders", "Ergens"]
+
+# ---------- delta ----------
+def test_delta_verstuurt_alleen_nieuwe_en_gewijzigde_regels(csv, verstuurd, capsys):
+    csv("Jan Jansen;1;Ergens", "Piet de Vries;2;Ergens", "Klaas Bos;3;Ergens")
+    importdata.import_clienten()
+    csv("Jan Jansen;1;Ergens", "Piet de Vries;2;Elders", "Els Smit;4;Ergens")
+    capsys.readouterr()
+    importdata.import_clienten(delta=True)
+    assert sorted(verstuurd[-1]) == ["2", "4"]
+    assert "1 nieuw, 1 gewijzigd, 1 ongewijzigd, 1 niet meer in CSV" in capsys.readouterr().out
+    # verdwenen regels worden gemeld, niet verwijderd
+    assert _klant_ids()["Klaas Bos"] == "3"
+
+    importdata.import_clienten(delta=True)
+    assert verstuurd[-1] == {}
+
+def test_dry_run_verstuurt_niets_en_laat_de_snapshot_staan(csv, verstuurd):
+    csv("Jan Jansen;1;Ergens", "Piet de Vries;;Ergens")
+    importdata.import_clienten()
+    snapshot = importdata.IMPORT_SNAPSHOT.read_text(encoding="utf-8")
+    csv("Jan Jansen;1;Elders", "Piet de Vries;;Ergens", "Els Smit;;Ergens")
+    importdata.import_clienten(dry_run=True)
+    assert len(verstuurd) == 1
+    assert importdata.IMPORT_SNAPSHOT.read_text(encoding="utf-8") == snapshot
+    assert {r["naam_client"]: r.get("woonplaats") for r in db._client.tabel("clienten")} == {
+        "Oud": None, "Jan Jansen": "Ergens", "Piet de Vries": "Ergens"}
+
+def test_delta_zonder_snapshot_verstuurt_alles(csv, verstuurd):
+    csv("Jan Jansen;1;Ergens", "Piet de Vries;;Ergens")
+    importdata.import_clienten(delta=True)
+    assert sorted(verstuurd[0]) == ["1", "8"]
+    snapshot = json.loads(importdata.IMPORT_SNAPSHOT.read_text(encoding="utf-8"))
+    assert sorted(snapshot["clienten"]) == ["1", "8"]
+    assert snapshot["clienten_toegewezen"] == {"piet de vries#1": "8"}
+
+# ---------- bulk_upsert ----------
+def test_bulk_upsert_ontdubbelt_over_chunks_heen(monkeypatch):
+    nep = NepSupabase()
+    monkeypatch.setattr(db, "_client", nep)
+    monkeypatch.setattr(importdata, "IMPORT_CHUNK", 2)
+    rows = [{"item": "PGB1", "bedrag": 80}, {"item": "PGB2", "bedrag": 170},
+            {"item": "CONS", "bedrag": 95}, {"item": "PGB1", "bedrag": 85}]
+    dubbel = []
+    assert importdata.bulk_upsert("tarieven", iter(rows), on_conflict="item", dubbel=dubbel) == 3
+    assert dubbel == ["PGB1"]
+    assert {r["item"]: r["bedrag"] for r in nep.tabel("tarieven")} == {"PGB1": 85, "PGB2": 170, "CONS": 95}
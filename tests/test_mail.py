@@ -0,0 +1,60 @@
+# tests/test_mail.py
+import pytest
+
+import db
+import mailer
+import facturatie
+from benchmarks.nepsupabase import NepSupabase
+
+FACTUREN = [
+    {"naam": "Jan Jansen", "factuurnummer": "2026-001", "email": "jan@example.nl", "pdf_path": "a.pdf"},
+    {"naam": "Piet de Vries", "factuurnummer": "2026-002", "email": "piet@example.nl", "pdf_path": "b.pdf"},
+]
+
+@pytest.fixture
+def nep(monkeypatch):
+    nep = NepSupabase()
+    monkeypatch.setattr(db, "_client", nep)
+    monkeypatch.setattr(mailer, "MAIL_VERSTUREN", True)
+    monkeypatch.setattr(mailer, "maak_bericht", lambda naar, onderwerp, tekst, bijlage=None: naar)
+    return nep
+
+@pytest.fixture
+def verstuurd(monkeypatch):
+    """Vervangt de SMTP-stap; geeft de lijst adressen per verstuur()-aanroep terug."""
+    aanroepen, mislukt = [], set()
+
+    def verstuur(berichten, voortgang=None, pool=None, per_minuut=None):
+        aanroepen.append(sorted(berichten.values()))
+        return {k: {"status": mailer.MISLUKT if naar in mislukt else mailer.VERZONDEN, "pogingen": 1,
+                    "fout": "550" if naar in mislukt else None} for k, naar in berichten.items()}
+
+    monkeypatch.setattr(mailer, "verstuur", verstuur)
+    return aanroepen, mislukt
+
+def test_factuur_wordt_maar_een_keer_gemaild(nep, verstuurd):
+    aanroepen, _ = verstuurd
+    eerste = facturatie.mail_pdf(FACTUREN, len(FACTUREN))
+    assert [r["mail_status"] for r in eerste] == [mailer.VERZONDEN, mailer.VERZONDEN]
+
+    tweede = facturatie.mail_pdf(FACTUREN, len(FACTUREN))
+    assert [(r["mail_status"], r["mail_fout"]) for r in tweede] == [(mailer.OVERGESLAGEN, "al verzonden")] * 2
+    assert aanroepen == [["jan@example.nl", "piet@example.nl"]]
+
+def test_mislukte_mail_wordt_opnieuw_geprobeerd(nep, verstuurd):
+    aanroepen, mislukt = verstuurd
+    mislukt.add("piet@example.nl")
+    facturatie.mail_pdf(FACTUREN, len(FACTUREN))
+    assert {r["factuurnummer"]: r["status"] for r in nep.tabel("factuur_mails")} == {
+        "2026-001": mailer.VERZONDEN, "2026-002": mailer.MISLUKT}
+
+    mislukt.clear()
+    facturatie.mail_pdf(FACTUREN, len(FACTUREN))
+    assert aanroepen[-1] == ["piet@example.nl"]
+    assert {r["status"] for r in nep.tabel("factuur_mails")} == {mailer.VERZONDEN}
+
+def test_zonder_mail_versturen_geen_status(nep, verstuurd, monkeypatch):
+    monkeypatch.setattr(mailer, "MAIL_VERSTUREN", False)
+    uit = facturatie.mail_pdf(FACTUREN, len(FACTUREN))
+    assert [r["mail_status"] for r in uit] == [mailer.OVERGESLAGEN] * 2
+    assert nep.tabel("factuur_mails") == []
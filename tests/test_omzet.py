@@ -0,0 +1,38 @@
+# tests/test_omzet.py
+from decimal import Decimal
+
+import pytest
+
+import omzet
+from benchmarks.nepsupabase import NepSupabase
+
+@pytest.fixture
+def nep():
+    omzet.leeg()
+    yield NepSupabase({
+        "tarieven": [{"item": "PGB1", "bedrag": 85, "btw_incl_pct": 21}],
+        "overzicht": [
+            # ingevoerd toen PGB1 nog 9% was: de opgeslagen splitsing telt
+            {"id": "o1", "datum_dienst": "2025-02-03", "naam": "Jan Jansen", "opmerking": "PGB1", "bedrag": 109,
+             "ex_btw": 100, "btw_21_pct": 9},
+            # zonder opgeslagen splitsing: het huidige percentage van het tarief
+            {"id": "o2", "datum_dienst": "2025-02-10", "naam": "Jan Jansen", "opmerking": "PGB1", "bedrag": 121,
+             "ex_btw": None, "btw_21_pct": None},
+        ],
+    })
+    omzet.leeg()
+
+def test_omzet_gebruikt_opgeslagen_btw_per_regel(nep):
+    [regel] = omzet.rapport(nep, "kwartaal")["regels"]
+    assert regel["sleutel"] == "2025-K1"
+    assert (regel["totaal_ex"], regel["totaal_btw"], regel["totaal_inc"]) == (
+        Decimal("200.00"), Decimal("30.00"), Decimal("230.00"))
+
+def test_ander_percentage_verandert_aangegeven_kwartaal_niet(nep):
+    voor = omzet.rapport(nep, "kwartaal")["regels"][0]["totaal_btw"]
+    nep.table("tarieven").update({"btw_incl_pct": 9}).eq("item", "PGB1").execute()
+    omzet.leeg()
+    # alleen o2 (zonder opgeslagen ex_btw) volgt het nieuwe percentage: 121 / 1,09
+    na = omzet.rapport(nep, "kwartaal")["regels"][0]
+    assert voor == Decimal("30.00")
+    assert (na["totaal_ex"], na["totaal_btw"]) == (Decimal("211.01"), Decimal("18.99"))
@@ -0,0 +1,51 @@
+# tests/test_overzichtaanmaken.py
+from decimal import Decimal
+
+import overzichtaanmaken
+
+def _regel(naam, datum, bedrag, ex, btw, te_ontvangen=None):
+    return {"naam": naam, "datum_dienst": datum, "tijd": "10:00:00", "contant": False, "opmerking": "PGB1",
+            "factuurnummer": None, "datum_factuur": None, "te_ontvangen": te_ontvangen,
+            "bedrag": bedrag, "bedrag_exbtw": ex, "btw": btw}
+
+ROWS = [
+    _regel("Piet de Vries", "2026-01-02", 0.1, 0.08, 0.02),
+    _regel("Jan Jansen", "2026-01-03", 85, 70.25, 14.75, te_ontvangen="85.00"),
+    _regel("  ", "2026-01-03", 999, 825.62, 173.38),
+    _regel("Piet de Vries", "2026-01-04", 0.2, 0.17, 0.03),
+    _regel("Jan Jansen", "2026-01-05", "1085.50", "897.11", "188.39"),
+]
+
+def test_centen_exact():
+    assert overzichtaanmaken.centen([0.1, 0.2, "1085.50", None, 70.25, -0.01]).tolist() == [10, 20, 108550, 0,
+                                                                                          7025, -1]
+
+def test_groepen_op_eerste_voorkomen_en_op_datum():
+    rapport = overzichtaanmaken.bereken(ROWS)
+    assert rapport["namen"] == ["Piet de Vries", "Jan Jansen"]
+    assert [r["datum"] for r in overzichtaanmaken.layout_regels(rapport) if r["naam_client"]] == [
+        "02-01-2026", "04-01-2026", "03-01-2026", "05-01-2026"]
+
+def test_subtotalen_en_totaal_in_centen():
+    rapport = overzichtaanmaken.bereken(ROWS)
+    assert rapport["subtotalen"]["bedrag"].tolist() == [30, 117050]
+    assert rapport["subtotalen"]["btw"].tolist() == [5, 20314]
+    # de regel zonder naam telt niet mee
+    assert rapport["totalen"] == {"bedrag_exbtw": 96761, "btw": 20319, "bedrag": 117080}
+    totaal = list(overzichtaanmaken.layout_regels(rapport))[-1]
+    assert (totaal["datum"], totaal["factuurbedrag"]) == ("TOTAAL", Decimal("1170.80"))
+
+def test_totalen_uit_database_tenzij_ze_afwijken():
+    per_naam = {
+        "Piet de Vries": {"naam": "Piet de Vries", "totaal_ex": 0.25, "totaal_btw": 0.05, "totaal_inc": 0.3},
+        # tussen het lezen van de regels en de totalen gewijzigd
+        "Jan Jansen": {"naam": "Jan Jansen", "totaal_ex": 70.25, "totaal_btw": 14.75, "totaal_inc": 85},
+    }
+    eind = {"totaal_ex": 70.5, "totaal_btw": 14.8, "totaal_inc": 85.3}
+    rapport = overzichtaanmaken.bereken(ROWS, (per_naam, eind))
+    assert rapport["subtotalen"]["bedrag"].tolist() == [30, 117050]
+    assert rapport["totalen"]["bedrag"] == 117080
+
+def test_leeg_overzicht():
+    rapport = overzichtaanmaken.bereken([], ({}, {"totaal_ex": 0, "totaal_btw": 0, "totaal_inc": 0}))
+    assert [r["datum"] for r in overzichtaanmaken.layout_regels(rapport)] == ["TOTAAL"]
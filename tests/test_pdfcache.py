@@ -0,0 +1,63 @@
+# tests/test_pdfcache.py
+from datetime import date
+
+import pytest
+
+import facturatie
+import pdfcache
+
+PLAN = {
+    "client": {"naam": "Jan Jansen", "straat": "Dorpsstraat 1", "postcode": "1234 AB", "woonplaats": "Ergens",
+               "land": "Nederland", "factuurnummer": "2026-001", "deb_nr": "1"},
+    "regels": [{"datum": "05-01-2026", "omschrijving": "consult", "uren": 1, "tarief": 85.0, "bedrag": 85.0}],
+    "totaal_btw": 14.75,
+    "totaal_bedrag": 85.0,
+    "email": "",
+}
+
+@pytest.fixture
+def gerenderd(tmp_path, monkeypatch):
+    """Cache in tmp_path; de PDF-stap schrijft de HTML weg en telt de renders."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(pdfcache, "PDF_CACHE_DIR", str(tmp_path / "cache"))
+    renders = []
+
+    def schrijf_pdfs(taken, workers=None):
+        for html_out, pdf_path in taken:
+            renders.append(html_out)
+            (tmp_path / pdf_path).parent.mkdir(parents=True, exist_ok=True)
+            (tmp_path / pdf_path).write_text(html_out, encoding="utf-8")
+            yield {"pdf_path": pdf_path, "fout": None}
+
+    monkeypatch.setattr(facturatie, "schrijf_pdfs", schrijf_pdfs)
+    return renders
+
+def _vandaag(monkeypatch, dag: date):
+    monkeypatch.setattr(facturatie, "date", type("Vast", (date,), {"today": classmethod(lambda cls: dag)}))
+
+def test_zelfde_dag_uit_de_cache(gerenderd, monkeypatch):
+    _vandaag(monkeypatch, date(2026, 1, 31))
+    facturatie.maak_factuur_pdfs([PLAN])
+    facturatie.maak_factuur_pdfs([PLAN])
+    assert len(gerenderd) == 1
+
+def test_andere_dag_geeft_nieuwe_factuurdatum(gerenderd, monkeypatch):
+    _vandaag(monkeypatch, date(2026, 1, 20))
+    facturatie.maak_factuur_pdfs([PLAN])
+    _vandaag(monkeypatch, date(2026, 1, 31))
+    [resultaat] = facturatie.maak_factuur_pdfs([PLAN])
+    assert len(gerenderd) == 2
+    with open(resultaat["pdf_path"], encoding="utf-8") as f:
+        pdf = f.read()
+    assert "31-01-2026" in pdf and "14-02-2026" in pdf
+    assert "20-01-2026" not in pdf
+
+def test_statistieken_per_run(gerenderd, monkeypatch):
+    _vandaag(monkeypatch, date(2026, 1, 31))
+    facturatie.maak_factuur_pdfs([PLAN])
+    voor = pdfcache.statistieken()
+    facturatie.maak_factuur_pdfs([PLAN])
+    run = pdfcache.statistieken(voor)
+    assert (run["hits"], run["misses"], run["opgeslagen"], run["hit_ratio"]) == (1, 0, 0, 1.0)
+    # de procestellers (metrics) lopen gewoon door
+    assert pdfcache.statistieken()["hits"] == voor["hits"] + 1
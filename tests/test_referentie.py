@@ -0,0 +1,39 @@
+# tests/test_referentie.py
+import pytest
+
+import referentie
+from benchmarks.nepsupabase import NepSupabase
+
+@pytest.fixture
+def nep():
+    referentie.leeg()
+    yield NepSupabase({"clienten": [
+        {"id": "c1", "naam_client": "Jan Jansen", "klant_id": "1", "woonplaats": "Ergens"},
+        {"id": "c2", "naam_client": "Piet de Vries", "klant_id": "2", "woonplaats": "Elders"},
+    ]})
+    referentie.leeg()
+
+def _gevonden(nep, q):
+    return [c["naam_client"] for c in referentie.zoek_clienten(nep, q)]
+
+def test_autocomplete_en_exacte_lookup_uit_dezelfde_index(nep):
+    [jan] = referentie.zoek_clienten(nep, "jansn")
+    assert (jan["id"], jan["woonplaats"]) == ("c1", "Ergens") and jan["score"] > 0
+    assert referentie.clienten_op_naam(nep)["piet de vries"]["klant_id"] == "2"
+
+def test_opslaan_en_verwijderen_werkt_beide_bij(nep):
+    referentie.clienten_op_naam(nep)
+    referentie.bijwerken("clienten", {"id": "c1", "naam_client": "Jan Janssen-Bos", "klant_id": "1"})
+    referentie.bijwerken("clienten", {"id": "c3", "naam_client": "Klaas Bos", "klant_id": "3"})
+    assert _gevonden(nep, "bos") == ["Klaas Bos", "Jan Janssen-Bos"]
+    assert "jan jansen" not in referentie.clienten_op_naam(nep)
+
+    referentie.verwijder("clienten", "c3")
+    assert _gevonden(nep, "bos") == ["Jan Janssen-Bos"]
+    assert set(referentie.clienten_op_naam(nep)) == {"jan janssen-bos", "piet de vries"}
+
+def test_leeg_laadt_opnieuw_uit_de_database(nep):
+    assert _gevonden(nep, "klaas") == []
+    nep.table("clienten").insert({"id": "c3", "naam_client": "Klaas Bos", "klant_id": "3"}).execute()
+    referentie.leeg()
+    assert _gevonden(nep, "klaas") == ["Klaas Bos"]
@@ -0,0 +1,58 @@
+# tests/test_snelinvoer.py
+from decimal import Decimal
+
+import pytest
+
+import db
+import referentie
+import snelinvoer
+from benchmarks.nepsupabase import NepSupabase
+
+# zo komen regels uit NL Excel: tab bij plakken, ; bij opslaan als CSV
+EXCEL_PLAK = "05-01-2026\tJan Jansen\t10:00\tPGB1\t85,00\n06-01-2026\tPiet de Vries\t11:30\tPGB1\t1.085,50\n"
+EXCEL_CSV = "﻿05-01-2026;Jan Jansen;10:00;PGB1;85,00\r\n06-01-2026;Piet de Vries;11:30;PGB1;1.085,50\r\n"
+
+VERWACHT = [
+    (1, {"datum": "05-01-2026", "naam": "Jan Jansen", "tijd": "10:00", "opmerking": "PGB1", "bedrag": "85,00"}),
+    (2, {"datum": "06-01-2026", "naam": "Piet de Vries", "tijd": "11:30", "opmerking": "PGB1", "bedrag": "1.085,50"}),
+]
+
+@pytest.mark.parametrize("tekst", [EXCEL_PLAK, EXCEL_CSV], ids=["tab", "puntkomma"])
+def test_excel_regels_met_decimale_komma(tekst):
+    assert snelinvoer.lees_regels(tekst) == VERWACHT
+
+def test_excel_plak_met_kopregel():
+    tekst = "Datum\tNaam client\tTijd\tTarief\tBedrag\n" + EXCEL_PLAK
+    assert snelinvoer.lees_regels(tekst) == [(nr + 1, velden) for nr, velden in VERWACHT]
+
+def test_tab_gaat_voor_komma_en_puntkomma():
+    regels = snelinvoer.lees_regels("05-01-2026\tJansen, J.\t10:00\tPGB1;extra\t85,00")
+    assert regels[0][1]["naam"] == "Jansen, J."
+    assert regels[0][1]["opmerking"] == "PGB1;extra"
+    assert regels[0][1]["bedrag"] == "85,00"
+
+def test_komma_alleen_zonder_tab_of_puntkomma():
+    regels = snelinvoer.lees_regels('datum,naam,bedrag\n2026-01-05,Jan Jansen,"85,00"\n')
+    assert regels == [(2, {"datum": "2026-01-05", "naam": "Jan Jansen", "bedrag": "85,00"})]
+
+@pytest.fixture
+def nep():
+    nep = NepSupabase({
+        "clienten": [{"id": "c1", "naam_client": "Jan Jansen", "klant_id": "1"},
+                     {"id": "c2", "naam_client": "Piet de Vries", "klant_id": "2"}],
+        "tarieven": [{"item": "PGB1", "bedrag": 85, "btw_incl_pct": 21}],
+    })
+    db._client = nep
+    referentie.leeg()
+    yield nep
+    db._client = None
+    referentie.leeg()
+
+def test_bulk_invoeren_excel_plak(nep):
+    resultaat = snelinvoer.bulk_invoeren(nep, EXCEL_PLAK, alleen_controleren=True)
+    assert resultaat["fouten"] == []
+    assert [(r["naam"], r["bedrag"], r["ex_btw"], r["btw_21_pct"]) for r in resultaat["regels"]] == [
+        ("Jan Jansen", "85.00", "70.25", "14.75"),
+        ("Piet de Vries", "1085.50", "897.11", "188.39"),
+    ]
+    assert sum(Decimal(r["ex_btw"]) + Decimal(r["btw_21_pct"]) for r in resultaat["regels"]) == Decimal("1170.50")
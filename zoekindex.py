@@ -0,0 +1,88 @@
+# zoekindex.py
+"""
+Trigram-zoekindex op de clientnamen (autocomplete).
+Namen worden genormaliseerd (normaliseer: kleine letters, losse spaties
+samengevoegd) en opgeknipt in trigrammen. Zoeken scoort op trigram-overlap,
+met een bonus voor prefix-treffers, en is daardoor ongevoelig voor spaties en
+kleine tikfouten. De index heeft geen eigen laad- of verloopmoment: referentie
+vult hem vanuit zijn client-index en werkt hem bij, onder zijn eigen lock
+(zoeken gaat via referentie.zoek_clienten).
+"""
+
+import unicodedata
+
+# ---------- CONFIG ----------
+MIN_SCORE = 0.35
+
+_namen = {}       # id -> genormaliseerde naam
+_trigrammen = {}  # id -> set trigrammen
+_postings = {}    # trigram -> set ids
+
+# ---------- NORMALISEREN ----------
+def normaliseer(tekst: str) -> str:
+    """Sleutel voor naamvergelijking, overal in de app dezelfde: kleine letters,
+    losse spaties samengevoegd. Accenten blijven ("José" ≠ "Jose"), net als bij
+    ilike in Postgres en COLLATE NOCASE in de replica."""
+    tekst = unicodedata.normalize("NFC", tekst or "")
+    return " ".join(tekst.lower().split())
+
+def trigrammen(tekst: str) -> set:
+    """Trigrammen per woord, met padding zoals pg_trgm ("  ja", " jan", "jan ")."""
+    grams = set()
+    for woord in normaliseer(tekst).split():
+        w = f"  {woord} "
+        grams.update(w[i:i + 3] for i in range(len(w) - 2))
+    return grams
+
+# ---------- INDEX BIJHOUDEN ----------
+def voeg_toe(client_id, naam: str):
+    verwijder(client_id)
+    grams = trigrammen(naam)
+    _namen[client_id] = normaliseer(naam)
+    _trigrammen[client_id] = grams
+    for g in grams:
+        _postings.setdefault(g, set()).add(client_id)
+
+def verwijder(client_id):
+    for g in _trigrammen.pop(client_id, ()):
+        ids = _postings.get(g)
+        if ids:
+            ids.discard(client_id)
+            if not ids:
+                del _postings[g]
+    _namen.pop(client_id, None)
+
+def leeg():
+    _namen.clear()
+    _trigrammen.clear()
+    _postings.clear()
+
+# ---------- ZOEKEN ----------
+def zoek(q: str, limit: int = 10) -> list:
+    """[(score, id)] voor zoekterm q, hoogste score eerst."""
+    term = normaliseer(q)
+    q_grams = trigrammen(term)
+    if not q_grams:
+        return []
+
+    kandidaten = {}
+    for g in q_grams:
+        for client_id in _postings.get(g, ()):
+            kandidaten[client_id] = kandidaten.get(client_id, 0) + 1
+
+    resultaten = []
+    for client_id, gemeen in kandidaten.items():
+        # aandeel van de zoekterm dat in de naam voorkomt, kortere namen iets hoger
+        score = gemeen / len(q_grams) + 0.2 * gemeen / len(q_grams | _trigrammen[client_id])
+        naam = _namen[client_id]
+        if naam.startswith(term):
+            score += 0.5
+        elif any(w.startswith(term) for w in naam.split()):
+            score += 0.3
+        # korte zoektermen (1-2 letters): alleen prefix-treffers
+        if score >= MIN_SCORE and (len(term) > 2 or naam.startswith(term)
+                                   or any(w.startswith(term) for w in naam.split())):
+            resultaten.append((score, client_id))
+
+    resultaten.sort(key=lambda t: (-t[0], _namen[t[1]]))
+    return resultaten[:limit]